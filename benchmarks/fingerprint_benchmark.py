@@ -0,0 +1,52 @@
+"""Matching a large problem set after every file had lines inserted at the
+top, by line and by fingerprint:
+
+    python -m benchmarks.fingerprint_benchmark --files 1000 --lines 10000
+"""
+import argparse
+import time
+
+from linty_fresh import fingerprint
+from linty_fresh.problem import Problem
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=1000)
+    parser.add_argument('--lines', type=int, default=10000)
+    parser.add_argument('--shift', type=int, default=3)
+    args = parser.parse_args()
+
+    old_sources = {}
+    new_sources = {}
+    existing = set()
+    problems = set()
+    for file_index in range(args.files):
+        path = 'src/module_{}.py'.format(file_index)
+        lines = ['value_{} = compute({})'.format(i, file_index).encode()
+                 for i in range(args.lines)]
+        old_sources[path] = b'\n'.join(lines)
+        new_sources[path] = b'\n'.join([b'# inserted'] * args.shift + lines)
+        for line in range(1, args.lines + 1, 10):
+            existing.add(Problem(path, line, 'E501 line too long'))
+            problems.add(Problem(path, line + args.shift,
+                                 'E501 line too long'))
+
+    start = time.perf_counter()
+    by_line = problems.difference(existing)
+    line_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    by_fingerprint = fingerprint.new_problems(problems, existing, old_sources,
+                                              new_sources)
+    fingerprint_time = time.perf_counter() - start
+
+    print('{} problems'.format(len(problems)))
+    print('by line         {:>8} new  {:>6.2f}s'.format(len(by_line),
+                                                        line_time))
+    print('by fingerprint  {:>8} new  {:>6.2f}s'.format(len(by_fingerprint),
+                                                        fingerprint_time))
+
+
+if __name__ == '__main__':
+    main()
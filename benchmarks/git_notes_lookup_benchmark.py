@@ -0,0 +1,99 @@
+"""Subprocess count and latency of looking up the nearest git note.
+
+Builds a scratch repository with --commits commits, where every
+--note_every'th commit carries a linty_fresh note, and compares one
+`git notes list <sha>` per revision with GitNotesStorageEngine.get_note_ref:
+
+    python -m benchmarks.git_notes_lookup_benchmark --commits 5000
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import tempfile
+import time
+
+from linty_fresh.storage import git_storage_engine
+from linty_fresh.storage.git_storage_engine import (GIT_SUBPROCESS_KWARGS,
+                                                    MAX_REVISIONS, NOTES_REF,
+                                                    GitNotesStorageEngine)
+
+
+def create_repository(commits: int, note_every: int) -> None:
+    subprocess.run(['git', 'init', '-q'], check=True)
+    stream = []
+    for i in range(1, commits + 1):
+        message = f'commit {i}'.encode()
+        stream.append(b'commit refs/heads/master\nmark :%d\n' % i)
+        stream.append(b'committer Linty <linty@example.com> %d +0000\n' % i)
+        stream.append(b'data %d\n%s\n' % (len(message), message))
+    stream.append(b'commit %s\n' % NOTES_REF.encode())
+    stream.append(b'committer Linty <linty@example.com> 0 +0000\n')
+    stream.append(b'data 5\nnotes\n')
+    # Leave the newest MAX_REVISIONS commits without notes so both lookups
+    # have to walk the whole window.
+    for i in range(1, commits - MAX_REVISIONS + 1, note_every):
+        note = b'[]'
+        stream.append(b'N inline :%d\ndata %d\n%s\n' % (i, len(note), note))
+    subprocess.run(['git', 'fast-import', '--quiet'], input=b''.join(stream),
+                   check=True)
+    subprocess.run(['git', 'checkout', '-q', 'master'], check=True)
+
+
+async def legacy_get_note_ref(revisions):
+    for revision in revisions:
+        notes_ref_proc = await asyncio.create_subprocess_exec(
+            'git', 'notes', 'list', revision,
+            **GIT_SUBPROCESS_KWARGS)
+        await notes_ref_proc.wait()
+        if notes_ref_proc.returncode == 0:
+            note_ref = (
+                await notes_ref_proc.stdout.readline()).decode().strip()
+            if note_ref:
+                return note_ref
+
+
+def measure(name, lookup, revisions):
+    spawned = []
+    create_subprocess_exec = asyncio.create_subprocess_exec
+
+    async def counting_create_subprocess_exec(*args, **kwargs):
+        spawned.append(args)
+        return await create_subprocess_exec(*args, **kwargs)
+
+    git_storage_engine.asyncio.create_subprocess_exec = (
+        counting_create_subprocess_exec)
+    try:
+        start = time.perf_counter()
+        note_ref = asyncio.get_event_loop().run_until_complete(
+            lookup(revisions))
+        elapsed = time.perf_counter() - start
+    finally:
+        git_storage_engine.asyncio.create_subprocess_exec = (
+            create_subprocess_exec)
+    print('{:<8} {:>3} subprocesses {:>8.1f} ms'.format(
+        name, len(spawned), elapsed * 1000))
+    return note_ref
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--commits', type=int, default=5000)
+    parser.add_argument('--note_every', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        create_repository(args.commits, args.note_every)
+        revisions = subprocess.run(
+            ['git', 'log', f'-{MAX_REVISIONS + 1}', '--pretty=%H'],
+            stdout=subprocess.PIPE, check=True).stdout.decode().split()
+
+        legacy = measure('legacy', legacy_get_note_ref, revisions)
+        batched = measure('batched', GitNotesStorageEngine().get_note_ref,
+                          revisions)
+        assert legacy == batched
+
+
+if __name__ == '__main__':
+    main()
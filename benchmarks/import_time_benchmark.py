@@ -0,0 +1,30 @@
+"""Import time of the linty_fresh entry points, from ``-X importtime``:
+
+    python -m benchmarks.import_time_benchmark --runs 10
+"""
+import argparse
+import statistics
+
+from tests.test_import_time import run_imports
+
+MODULES = ['linty_fresh.main', 'linty_fresh.client', 'linty_fresh.daemon']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+
+    for module in MODULES:
+        runs = [run_imports('import {}'.format(module))[0]
+                for _ in range(args.runs)]
+        print('{}: {:.1f}ms'.format(module, statistics.median(
+            times[module] for times in runs) / 1000))
+        heaviest = sorted(runs[-1].items(), key=lambda item: -item[1])
+        for name, time in heaviest[1:args.top + 1]:
+            print('    {}: {:.1f}ms'.format(name, time / 1000))
+
+
+if __name__ == '__main__':
+    main()
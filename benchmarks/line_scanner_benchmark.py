@@ -0,0 +1,102 @@
+"""Throughput of the line-based linters on large synthetic logs, where most
+lines are build noise.
+
+Compares scan_lines against matching every line and reading its groupdict,
+as the linters used to:
+
+    python -m benchmarks.line_scanner_benchmark --lines 2000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from linty_fresh.linters import mypy, pylint, swiftlint, xcodebuild
+from linty_fresh.stream import iter_lines
+
+NOISE = [
+    'CompileSwift normal arm64 /Users/ci/src/App/Classes/File{0}.swift '
+    '(in target \'App\' from project \'App\')',
+    '    cd /Users/ci/src/App',
+    '    export PATH=/Applications/Xcode.app/Contents/Developer/usr/bin:'
+    '/usr/local/bin:/usr/bin:/bin',
+    '    /Applications/Xcode.app/Contents/Developer/Toolchains/'
+    'XcodeDefault.xctoolchain/usr/bin/swift-frontend -c -primary-file '
+    '/Users/ci/src/App/Classes/File{0}.swift -target arm64-apple-ios14.0',
+    'Test Case \'-[AppTests.File{0}Tests testExample]\' passed '
+    '(0.012 seconds).',
+    '2023-01-01 12:00:00.000 xcodebuild[1234:5678] Writing result bundle',
+    '************* Module app.module_{0}',
+    '',
+]
+
+PROBLEMS = {
+    mypy: 'src/app/module_{0}.py:{0}: error: Incompatible types in '
+          'assignment',
+    pylint: 'src/app/module_{0}.py:{0}: [C0301(line-too-long), ] Line too '
+            'long (120/100)',
+    swiftlint: '/Users/ci/src/App/Classes/File{0}.swift:{0}:5: warning: Line '
+               'Length Violation: Line should be 120 characters or less',
+    xcodebuild: '/Users/ci/src/App/Classes/File{0}.swift:{0}:21: error: use '
+                'of unresolved identifier \'Foo{0}\'',
+}
+
+LINE_REGEXES = {
+    mypy: mypy.MYPY_LINE_REGEX,
+    pylint: pylint.PYLINT_LINE_REGEX,
+    swiftlint: swiftlint.SWIFTLINT_LINE_REGEX,
+    xcodebuild: xcodebuild.XCODEBUILD_LINE_REGEX,
+}
+
+
+def write_log(path, linter, lines, problem_ratio):
+    problem_every = max(int(1 / problem_ratio), 1)
+    with open(path, 'w') as log:
+        for i in range(lines):
+            if i % problem_every == 0:
+                log.write(PROBLEMS[linter].format(i))
+            else:
+                log.write(NOISE[i % len(NOISE)].format(i))
+            log.write('\n')
+
+
+def match_every_line(lint_file, line_regex):
+    matches = 0
+    for line in iter_lines(lint_file):
+        match = line_regex.match(line)
+        if match:
+            match.groupdict()
+            matches += 1
+    return matches
+
+
+def measure(function, path, *args):
+    with open(path, 'rb') as lint_file:
+        start = time.perf_counter()
+        result = function(lint_file, *args)
+        return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=2000000)
+    parser.add_argument('--problem_ratio', type=float, default=0.01)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for linter in (mypy, pylint, swiftlint, xcodebuild):
+            path = os.path.join(temp_dir, 'lint.txt')
+            write_log(path, linter, args.lines, args.problem_ratio)
+            size = os.path.getsize(path) / 2 ** 20
+            legacy_time, matches = measure(match_every_line, path,
+                                           LINE_REGEXES[linter])
+            scan_time, problems = measure(
+                lambda lint_file: list(linter.parse_stream(lint_file)), path)
+            print('{:<11} {:>7.1f} MiB  {:>7} matches  every line {:>6.2f}s'
+                  '  scan_lines {:>6.2f}s ({} problems)'.format(
+                      linter.__name__.rsplit('.', 1)[-1], size, matches,
+                      legacy_time, scan_time, len(problems)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Nearest mapped line lookups for problems outside of the diff hunks.
+
+Compares the previous linear scan over every mapped line with
+FilePositionMap.nearest on a file with many changed lines:
+
+    python -m benchmarks.nearest_line_benchmark --lines 20000 --problems 5000
+"""
+import argparse
+import random
+import time
+
+from linty_fresh.reporters.position_map import FilePositionMap
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=20000)
+    parser.add_argument('--problems', type=int, default=5000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    file_map = FilePositionMap()
+    line_dict = {}
+    position = 0
+    line = 0
+    for _ in range(args.lines):
+        # Leave gaps so most problems fall outside of the mapped lines.
+        line += random.choice((1, 1, 1, 5))
+        position += 1
+        file_map.add(line, position)
+        line_dict[line] = position
+    problem_lines = [random.randint(0, line + 100)
+                     for _ in range(args.problems)]
+
+    start = time.perf_counter()
+    linear = []
+    for problem_line in problem_lines:
+        closest_line = min(line_dict.keys(),
+                           key=lambda x: abs(x - problem_line))
+        linear.append((closest_line, line_dict[closest_line]))
+    linear_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bisected = [file_map.nearest(problem_line)
+                for problem_line in problem_lines]
+    bisect_time = time.perf_counter() - start
+
+    assert linear == bisected
+    print('{} mapped lines, {} problems'.format(args.lines, args.problems))
+    print('linear scan {:>10.4f}s'.format(linear_time))
+    print('bisect      {:>10.4f}s'.format(bisect_time))
+
+
+if __name__ == '__main__':
+    main()
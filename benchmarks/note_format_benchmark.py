@@ -0,0 +1,48 @@
+"""Size and parse time of stored problem notes in each note format.
+
+    python -m benchmarks.note_format_benchmark --count 100000
+"""
+import argparse
+import time
+
+from linty_fresh.problem import Problem
+from linty_fresh.storage import note_format
+
+
+def build(count, paths, messages):
+    return {Problem('src/' + paths[i % len(paths)], i // len(paths),
+                    messages[i % len(messages)])
+            for i in range(count)}
+
+
+def run(name, problems):
+    start = time.perf_counter()
+    note = note_format.encode_problems(problems, name)
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parsed = note_format.decode_note(note.splitlines())
+    parse_time = time.perf_counter() - start
+    assert parsed == problems
+
+    print('{:<11} size {:>9.1f} KiB  encode {:>6.3f}s  parse {:>6.3f}s'.format(
+        name, len(note) / 2 ** 10, encode_time, parse_time))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--paths', type=int, default=2000)
+    parser.add_argument('--messages', type=int, default=200)
+    args = parser.parse_args()
+    paths = ['module_{}/file_{}.py'.format(i % 97, i)
+             for i in range(args.paths)]
+    messages = ['E{}: something is wrong with this line'.format(i)
+                for i in range(args.messages)]
+    problems = build(args.count, paths, messages)
+    for name in note_format.NOTE_FORMATS:
+        run(name, problems)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Memory and throughput of Problem on a large synthetic problem set.
+
+Compares the slotted Problem against the previous dict-backed
+implementation:
+
+    python -m benchmarks.problem_benchmark --count 1000000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from linty_fresh.problem import Problem
+
+
+class LegacyProblem:
+    def __init__(self, file_path, line, message):
+        self.path = file_path
+        self.line = int(line)
+        self.message = message
+
+    def __hash__(self):
+        return hash((self.path, self.line, self.message))
+
+    def __eq__(self, other):
+        return ((self.path, self.line, self.message) == (other.path,
+                                                         other.line,
+                                                         other.message))
+
+
+def build(problem_class, count, paths):
+    messages = ['E{}: something is wrong'.format(i) for i in range(50)]
+    # Build fresh path strings, as the linters do for every parsed line.
+    return [problem_class(''.join(['src/', paths[i % len(paths)]]),
+                          i // len(paths),
+                          messages[i % len(messages)])
+            for i in range(count)]
+
+
+def run(problem_class, count, paths):
+    gc.collect()
+    start = time.perf_counter()
+    problems = build(problem_class, count, paths)
+    build_time = time.perf_counter() - start
+    del problems
+
+    gc.collect()
+    tracemalloc.start()
+    problems = build(problem_class, count, paths)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    problem_set = set(problems)
+    existing = set(problems[::2])
+    problem_set.difference(existing)
+    set_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Problem.group_by_path_and_line(problem_set)
+    group_time = time.perf_counter() - start
+
+    print('{:<14} memory {:>8.1f} MiB  build {:>6.2f}s  '
+          'set+difference {:>6.2f}s  group {:>6.2f}s'.format(
+              problem_class.__name__, memory / 2 ** 20, build_time,
+              set_time, group_time))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--paths', type=int, default=2000)
+    args = parser.parse_args()
+    paths = ['module_{}/file_{}.py'.format(i % 97, i)
+             for i in range(args.paths)]
+    for problem_class in (LegacyProblem, Problem):
+        run(problem_class, args.count, paths)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Runs linty_fresh jobs in a running ``linty_fresh_daemon``.
+
+``linty_fresh_client`` takes the same arguments as ``linty_fresh``. The job
+runs in the daemon, in this process's working directory and environment,
+and its output and exit status are passed through. Without a daemon, or if
+its socket may belong to another user, the job runs in this process instead.
+
+Only the standard library is imported until then, so a job costs little
+more than a round trip to the daemon.
+"""
+import json
+import os
+import socket
+import stat
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional  # noqa
+
+SOCKET_ENVIRONMENT_VARIABLE = 'LINTY_FRESH_SOCKET'
+TIMEOUT_ENVIRONMENT_VARIABLE = 'LINTY_FRESH_CLIENT_TIMEOUT'
+# Seconds to wait for a job, including any queued ahead of it.
+DEFAULT_TIMEOUT = 1800
+
+
+def get_socket_path() -> str:
+    """Return the daemon's socket, ``$LINTY_FRESH_SOCKET`` if set.
+
+    Otherwise it is in ``$XDG_RUNTIME_DIR``, or in a directory of its own
+    in the temporary directory, as anyone may create files in the latter.
+    """
+    if SOCKET_ENVIRONMENT_VARIABLE in os.environ:
+        return os.environ[SOCKET_ENVIRONMENT_VARIABLE]
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'linty_fresh.sock')
+    return os.path.join(tempfile.gettempdir(),
+                        'linty_fresh-{}'.format(os.getuid()), 'daemon.sock')
+
+
+def check_socket_directory(directory: str) -> None:
+    """Raise ``PermissionError`` if other users could have put a socket in
+    ``directory``."""
+    directory_stat = os.stat(directory)
+    if directory_stat.st_uid not in (os.getuid(), 0):
+        raise PermissionError('{} is owned by another user'.format(directory))
+    # Nobody else may replace another user's files in a sticky directory.
+    sticky = directory_stat.st_mode & stat.S_ISVTX
+    if directory_stat.st_mode & 0o022 and not sticky:
+        raise PermissionError('{} is writable by other users'.format(
+            directory))
+
+
+def check_socket(socket_path: str) -> None:
+    """Raise ``PermissionError`` unless ``socket_path`` is a socket only this
+    user can have created and can connect to, as jobs carry secrets such as
+    ``GITHUB_AUTH_TOKEN``."""
+    check_socket_directory(os.path.dirname(os.path.abspath(socket_path)))
+    socket_stat = os.lstat(socket_path)
+    if not stat.S_ISSOCK(socket_stat.st_mode):
+        raise PermissionError('{} is not a socket'.format(socket_path))
+    if socket_stat.st_uid != os.getuid():
+        raise PermissionError('{} is owned by another user'.format(
+            socket_path))
+    if socket_stat.st_mode & 0o077:
+        raise PermissionError('{} is accessible to other users'.format(
+            socket_path))
+
+
+def get_timeout() -> float:
+    """Return ``$LINTY_FRESH_CLIENT_TIMEOUT``, or ``DEFAULT_TIMEOUT``."""
+    return float(os.environ.get(TIMEOUT_ENVIRONMENT_VARIABLE,
+                                DEFAULT_TIMEOUT))
+
+
+def run_job(argv: List[str], socket_path: Optional[str] = None,
+            timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Run linty_fresh with ``argv`` in the daemon and return its
+    ``exit_code``, ``stdout`` and ``stderr``.
+
+    The daemon runs one job at a time. Raises ``socket.timeout`` if this
+    one hasn't finished within ``timeout`` seconds, ``PermissionError`` if
+    ``socket_path`` may not belong to this user's daemon, and ``OSError``
+    if no daemon listens on it.
+    """
+    socket_path = socket_path or get_socket_path()
+    check_socket(socket_path)
+    request = {
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'env': dict(os.environ),
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(get_timeout() if timeout is None else timeout)
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(request).encode() + b'\n')
+        with connection.makefile('rb') as response_file:
+            response = response_file.readline()
+    if not response:
+        raise Exception('linty_fresh_daemon closed the connection')
+    return json.loads(response.decode())
+
+
+def main():
+    try:
+        response = run_job(sys.argv[1:])
+    except socket.timeout:
+        sys.exit('linty_fresh_daemon did not finish the job within {} '
+                 'seconds; see ${}'.format(get_timeout(),
+                                           TIMEOUT_ENVIRONMENT_VARIABLE))
+    except (ConnectionRefusedError, FileNotFoundError, PermissionError) as e:
+        if isinstance(e, PermissionError):
+            print('Not using linty_fresh_daemon: {}'.format(e),
+                  file=sys.stderr)
+        from linty_fresh import main as linty_fresh_main
+        linty_fresh_main.main()
+        return
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    sys.exit(response['exit_code'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import asyncio
+
+from linty_fresh.storage.git_storage_engine import (MAX_DELTA_CHAIN,
+                                                    GitNotesStorageEngine)
+from linty_fresh.storage.in_process_storage_engine import \
+    InProcessGitNotesStorageEngine
+from linty_fresh.storage.note_format import DEFAULT_NOTE_FORMAT, NOTE_FORMATS
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='Rewrite linty_fresh notes stored as long chains of '
+                    'deltas as full snapshots.')
+    parser.add_argument('--max_chain', type=int,
+                        default=MAX_DELTA_CHAIN // 2,
+                        help='Rewrite notes that are more than this many '
+                             'deltas away from a full snapshot.')
+    parser.add_argument('--in_process_git', default=False,
+                        action='store_true',
+                        help='Read stored problems directly from the git '
+                             'object database.')
+    parser.add_argument('--note_format', type=str,
+                        choices=NOTE_FORMATS, default=DEFAULT_NOTE_FORMAT,
+                        help='Format of the rewritten notes.')
+    return parser
+
+
+async def run_loop(args: argparse.Namespace) -> None:
+    if args.in_process_git:
+        storage_engine = InProcessGitNotesStorageEngine('origin',
+                                                        args.note_format)
+    else:
+        storage_engine = GitNotesStorageEngine('origin', args.note_format)
+    compacted = await storage_engine.compact_notes(args.max_chain)
+    print('Rewrote {} notes.'.format(compacted))
+
+
+def main():
+    args = create_parser().parse_args()
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(run_loop(args))
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
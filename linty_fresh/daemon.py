@@ -0,0 +1,189 @@
+"""A long-running linty_fresh that runs jobs sent by ``linty_fresh_client``.
+
+Jobs are read as single lines of JSON from a Unix domain socket and run with
+warm state: Python and every module are already loaded, one ``aiohttp``
+connector keeps connections to GitHub open between jobs, PR diffs and
+comment pages are cached in memory, and parsed notes are kept by the git
+storage engine.
+
+A job runs in the client's working directory and environment, which are
+process wide, so jobs run one at a time: a slow job holds up every job
+queued behind it, until the clients give up after
+``$LINTY_FRESH_CLIENT_TIMEOUT`` seconds. Jobs whose clients have gone are
+skipped. Connections are only accepted from the user running the daemon.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import socket
+import sys
+import traceback
+from typing import Any, Callable, Dict, List, Optional  # noqa
+
+import aiohttp
+
+from linty_fresh import main as linty_fresh_main
+from linty_fresh.client import check_socket_directory, get_socket_path
+from linty_fresh.reporters.github_cache import (DEFAULT_MAX_MEMORY_ENTRIES,
+                                                MemoryGithubCache)
+from linty_fresh.reporters.github_reporter import GithubReporter
+
+# Requests carry the client's whole environment.
+MAX_REQUEST_SIZE = 2 ** 24
+# Seconds an idle connection to GitHub is kept open.
+KEEPALIVE_TIMEOUT = 60
+
+
+class Daemon:
+    def __init__(self,
+                 max_cache_entries: int = DEFAULT_MAX_MEMORY_ENTRIES) -> None:
+        self.cache = MemoryGithubCache(max_cache_entries)
+        self._connector = None  # type: Optional[aiohttp.BaseConnector]
+        self._lock = asyncio.Lock()
+
+    async def serve(self, socket_path: str) -> None:
+        """Accept jobs on ``socket_path`` until cancelled."""
+        directory = os.path.dirname(os.path.abspath(socket_path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        check_socket_directory(directory)
+        _remove_stale_socket(socket_path)
+        # Only the owner may connect: a job runs with any environment.
+        old_umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(
+                self.handle_connection, socket_path, limit=MAX_REQUEST_SIZE)
+        finally:
+            os.umask(old_umask)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self._connector:
+                await self._connector.close()
+            with contextlib.suppress(OSError):
+                os.remove(socket_path)
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        try:
+            request = json.loads((await reader.readline()).decode())
+            response = await self.run_job(request['argv'], request['cwd'],
+                                          request['env'], reader.at_eof)
+            if response is None:
+                return
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+        except (ValueError, KeyError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def run_job(
+            self, argv: List[str], cwd: str, env: Dict[str, str],
+            abandoned: Optional[Callable[[], bool]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Run linty_fresh with ``argv`` and return its ``exit_code``,
+        ``stdout`` and ``stderr``.
+
+        Returns None without running the job if ``abandoned`` returns true
+        once the jobs ahead of it are done.
+        """
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        async with self._lock:
+            if abandoned and abandoned():
+                return None
+            original_cwd = os.getcwd()
+            original_env = dict(os.environ)
+            try:
+                os.chdir(cwd)
+                os.environ.clear()
+                os.environ.update(env)
+                with contextlib.redirect_stdout(stdout), \
+                        contextlib.redirect_stderr(stderr):
+                    exit_code = await self._run(argv)
+            finally:
+                os.environ.clear()
+                os.environ.update(original_env)
+                os.chdir(original_cwd)
+        return {
+            'exit_code': exit_code,
+            'stdout': stdout.getvalue(),
+            'stderr': stderr.getvalue(),
+        }
+
+    async def _run(self, argv: List[str]) -> int:
+        try:
+            parser = linty_fresh_main.create_parser(argv)
+            parser.prog = 'linty_fresh'
+            args = parser.parse_args(argv)
+            reporters = linty_fresh_main.create_reporters(args)
+            for reporter in reporters:
+                if isinstance(reporter, GithubReporter):
+                    reporter.connector = self._get_connector()
+                    if reporter.cache is None:
+                        reporter.cache = self.cache
+            await linty_fresh_main.run_loop(args, reporters)
+        except SystemExit as e:
+            # Lint errors and bad arguments exit like linty_fresh does.
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            print(e.code, file=sys.stderr)
+            return 1
+        except Exception:
+            traceback.print_exc()
+            return 1
+        return 0
+
+    def _get_connector(self) -> aiohttp.BaseConnector:
+        if self._connector is None:
+            self._connector = aiohttp.TCPConnector(
+                keepalive_timeout=KEEPALIVE_TIMEOUT)
+        return self._connector
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    """Remove the socket of a daemon that is no longer running."""
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        try:
+            connection.connect(socket_path)
+        except ConnectionRefusedError:
+            os.remove(socket_path)
+            return
+    raise Exception('linty_fresh_daemon is already running on {}'.format(
+        socket_path))
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--socket', type=str, default=None,
+                        help='The socket to listen on. Defaults to '
+                             '$LINTY_FRESH_SOCKET, or a socket in '
+                             '$XDG_RUNTIME_DIR or a private directory in the '
+                             'temporary directory.')
+    parser.add_argument('--max_cache_entries', type=int,
+                        default=DEFAULT_MAX_MEMORY_ENTRIES,
+                        help='Number of PR diffs and comment pages kept in '
+                             'memory.')
+    return parser
+
+
+def main():
+    args = create_parser().parse_args()
+    daemon = Daemon(args.max_cache_entries)
+    loop = asyncio.get_event_loop()
+    try:
+        loop.run_until_complete(daemon.serve(args.socket or get_socket_path()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Matching of problems across commits by fingerprint instead of line.
+
+A fingerprint combines a problem's path and message with the source lines
+around it, with whitespace normalized. Editing code above a problem shifts
+its line number but not its fingerprint, so it is still recognised as a
+problem that was already reported. Fingerprints are only compared within one
+run, so they are used directly as the keys of a hash index.
+"""
+import os
+from collections import Counter
+from typing import (Any, Dict, Hashable, Iterable, List, Optional, Set,  # noqa
+                    Tuple)
+
+from linty_fresh.problem import Problem
+
+DEFAULT_FINGERPRINT_CONTEXT = 2
+
+
+def fingerprint(problem: Problem, lines: Optional[List[bytes]],
+                context: int = DEFAULT_FINGERPRINT_CONTEXT) -> Hashable:
+    """Return the fingerprint of ``problem``, given the lines of the file it
+    was found in."""
+    if lines is None or not 0 < problem.line <= len(lines):
+        # Without the source, fall back to matching on the line number.
+        return problem.path, problem.message, problem.line
+    # Runs of whitespace are collapsed so reindenting or reformatting code
+    # around a problem doesn't change its fingerprint. Only the lines in the
+    # window are normalized; most lines of a file are in none.
+    window = b'\n'.join(lines[max(problem.line - 1 - context, 0):
+                              problem.line + context])
+    return problem.path, problem.message, b' '.join(window.split())
+
+
+def shared_paths(problems: Iterable[Any], existing: Iterable[Any]) -> Set[str]:
+    """Return the paths with both new and existing problems, the only ones
+    whose sources are needed to match them."""
+    return _get_paths(problems) & _get_paths(existing)
+
+
+def read_working_tree_files(
+        paths: Iterable[str]) -> Dict[str, Optional[bytes]]:
+    files = {}  # type: Dict[str, Optional[bytes]]
+    for path in paths:
+        try:
+            with open(os.path.normpath(path), 'rb') as source_file:
+                files[path] = source_file.read()
+        except OSError:
+            files[path] = None
+    return files
+
+
+def new_problems(problems: Set[Any], existing: Set[Any],
+                 existing_sources: Dict[str, Optional[bytes]],
+                 sources: Dict[str, Optional[bytes]],
+                 context: int = DEFAULT_FINGERPRINT_CONTEXT) -> Set[Any]:
+    """Return the problems in ``problems`` that don't match one in
+    ``existing``.
+
+    ``existing_sources`` and ``sources`` hold the files the existing and new
+    problems were found in, for the paths returned by ``shared_paths``. Each
+    existing problem matches at most one new problem. Problems in other
+    paths, and anything that isn't a ``Problem``, are compared exactly.
+    """
+    paths = shared_paths(problems, existing)
+    existing_by_path, _ = _group_by_path(existing, paths)
+    existing_fingerprints = Counter()  # type: Dict[Hashable, int]
+    for path, path_problems in existing_by_path.items():
+        lines = _split_lines(existing_sources.get(path))
+        existing_fingerprints.update([
+            fingerprint(problem, lines, context)
+            for problem in path_problems])
+
+    problems_by_path, other_problems = _group_by_path(problems, paths)
+    result = {problem for problem in other_problems
+              if problem not in existing}
+    for path, path_problems in problems_by_path.items():
+        lines = _split_lines(sources.get(path))
+        for problem in path_problems:
+            key = fingerprint(problem, lines, context)
+            if existing_fingerprints[key]:
+                existing_fingerprints[key] -= 1
+            else:
+                result.add(problem)
+    return result
+
+
+def _get_paths(problems: Iterable[Any]) -> Set[str]:
+    return {problem.path for problem in problems
+            if isinstance(problem, Problem)}
+
+
+def _group_by_path(problems: Iterable[Any], paths: Set[str]
+                   ) -> Tuple[Dict[str, List[Problem]], List[Any]]:
+    """Group the problems in ``paths`` by path, returning everything else
+    separately."""
+    grouped = {path: [] for path in paths}  # type: Dict[str, List[Problem]]
+    other = []
+    for problem in problems:
+        path_problems = (grouped.get(problem.path)
+                         if isinstance(problem, Problem) else None)
+        if path_problems is None:
+            other.append(problem)
+        else:
+            path_problems.append(problem)
+    return grouped, other
+
+
+def _split_lines(source: Optional[bytes]) -> Optional[List[bytes]]:
+    return source.splitlines() if source is not None else None
@@ -0,0 +1,78 @@
+"""Deferred imports, which keep short runs from paying for modules they
+don't use."""
+import importlib
+from types import ModuleType
+from typing import Any, Dict, Iterator, MutableMapping, Optional, Union  # noqa
+
+
+class LazyRegistry(MutableMapping):
+    """Maps names to modules, such as ``main.LINTERS``, importing each module
+    only when it is looked up.
+
+    Entries may be added as modules, or as ``module`` or ``module:attribute``
+    names to import lazily. With ``entry_point_group``, the entry points of
+    installed plugins in that group are added the first time a name that
+    isn't built in is looked up, or the names are listed. Built-in names
+    take precedence.
+    """
+
+    def __init__(self, modules: Dict[str, Union[str, ModuleType]],
+                 entry_point_group: Optional[str] = None) -> None:
+        self._modules = dict(modules)
+        self.builtin_names = list(modules)
+        self.entry_point_group = entry_point_group
+        self._plugins_loaded = entry_point_group is None
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._modules:
+            self._load_plugins()
+        module = self._modules[name]
+        if isinstance(module, str):
+            module_name, _, attribute = module.partition(':')
+            module = importlib.import_module(module_name)
+            for part in attribute.split('.') if attribute else ():
+                module = getattr(module, part)
+            self._modules[name] = module
+        return module
+
+    def __setitem__(self, name: str, module: Union[str, ModuleType]) -> None:
+        self._modules[name] = module
+
+    def __delitem__(self, name: str) -> None:
+        self._load_plugins()
+        del self._modules[name]
+
+    def __iter__(self) -> Iterator[str]:
+        self._load_plugins()
+        return iter(self._modules)
+
+    def __len__(self) -> int:
+        self._load_plugins()
+        return len(self._modules)
+
+    def clear(self) -> None:
+        # Without listing the names, which would look for plugins.
+        self._modules.clear()
+
+    def copy(self) -> 'LazyRegistry':
+        registry = LazyRegistry(self._modules, self.entry_point_group)
+        registry.builtin_names = list(self.builtin_names)
+        registry._plugins_loaded = self._plugins_loaded
+        return registry
+
+    def update(self, *args, **kwargs) -> None:
+        # Copying another registry keeps its modules unimported.
+        if len(args) == 1 and isinstance(args[0], LazyRegistry):
+            self._modules.update(args[0]._modules)
+            args = ()
+        super().update(*args, **kwargs)
+
+    def _load_plugins(self) -> None:
+        if self._plugins_loaded:
+            return
+        self._plugins_loaded = True
+        # Imported here so runs using only built-in names never read the
+        # plugin index.
+        from linty_fresh.plugins import get_entry_points
+        for name, value in get_entry_points(self.entry_point_group).items():
+            self._modules.setdefault(name, value)
@@ -1,24 +1,24 @@
-from typing import Set
-from xml.etree import ElementTree
+import io
+from typing import IO, Iterator, Set
 
 from linty_fresh.problem import Problem
+from linty_fresh.stream import iter_elements
 
 
 def parse(contents: str, pass_warnings: bool, **kwargs) -> Set[Problem]:
-    result = set()  # type: Set[Problem]
-    try:
-        root = ElementTree.fromstring(contents)
-    except ElementTree.ParseError:
-        return result
-    for issue in root.findall('issue'):
-        location = issue.getchildren()[0]
+    return set(parse_stream(io.StringIO(contents), pass_warnings, **kwargs))
+
+
+def parse_stream(stream: IO, pass_warnings: bool,
+                 **kwargs) -> Iterator[Problem]:
+    for issue in iter_elements(stream, 'issue'):
+        location = issue[0]
         if issue.get('severity') == 'Warning' and pass_warnings:
             pass
         else:
-            result.add(Problem(
+            yield Problem(
                 location.get('file'),
                 location.get('line', '0'),
                 '{}: {}'.format(
                     issue.get('summary'),
-                    issue.get('message'))))
-    return result
+                    issue.get('message')))
@@ -1,16 +1,16 @@
-from typing import Set
-from xml.etree import ElementTree
+import io
+from typing import IO, Iterator, Set
 
 from linty_fresh.problem import TestProblem
+from linty_fresh.stream import iter_elements
 
 
 def parse(contents: str, **kwargs) -> Set[TestProblem]:
-    result = set()
-    try:
-        root = ElementTree.fromstring(contents)
-    except ElementTree.ParseError:
-        return result
-    for test in root.findall('test'):
+    return set(parse_stream(io.StringIO(contents), **kwargs))
+
+
+def parse_stream(stream: IO, **kwargs) -> Iterator[TestProblem]:
+    for test in iter_elements(stream, 'test'):
         if test.get('status') == 'FAIL':
             test_group = test.get('name')
             for tr in test.findall('testresult'):
@@ -24,10 +24,9 @@ def parse(contents: str, **kwargs) -> Set[TestProblem]:
                         stack_trace = st.text
                 if stack_trace and message:
                     test_name = tr.get('name')
-                    result.add(TestProblem(
+                    yield TestProblem(
                         test_group,
                         test_name,
                         message,
                         stack_trace
-                    ))
-    return result
+                    )
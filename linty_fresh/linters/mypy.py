@@ -1,21 +1,21 @@
 import re
-from typing import Set
+from typing import Iterator, Set
 
 from linty_fresh.problem import Problem
+from linty_fresh.stream import LineSource, scan_lines
 
 MYPY_LINE_REGEX = re.compile(r'(?P<path>[^:]*):(?P<line>\d*):\s*'
                              r'(?P<code>\w*)\s*:\s*(?P<message>.*)')
+# Found in every line MYPY_LINE_REGEX matches.
+MYPY_CANDIDATE_REGEX = re.compile(r':\d*:')
 
 
 def parse(contents: str, **kwargs) -> Set[Problem]:
-    result = set()  # type: Set[Problem]
-    for line in contents.splitlines():
-        match = MYPY_LINE_REGEX.match(line)
-        if match:
-            groups = match.groupdict()
-            if groups['code'] != 'note':
-                result.add(Problem(groups['path'],
-                                   groups['line'],
-                                   '{}: {}'.format(groups['code'],
-                                                   groups['message'])))
-    return result
+    return set(parse_stream(contents, **kwargs))
+
+
+def parse_stream(lines: LineSource, **kwargs) -> Iterator[Problem]:
+    for match in scan_lines(lines, MYPY_LINE_REGEX, MYPY_CANDIDATE_REGEX):
+        path, line, code, message = match.groups()
+        if code != 'note':
+            yield Problem(path, line, '{}: {}'.format(code, message))
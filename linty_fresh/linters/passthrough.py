@@ -1,4 +1,4 @@
-from typing import Set
+from typing import IO, Iterator, Set
 
 from linty_fresh.problem import Problem
 
@@ -8,3 +8,10 @@ def parse(contents: str, **kwargs) -> Set[Problem]:
         return {Problem('', 0, contents.strip())}
     else:
         return set()
+
+
+def parse_stream(stream: IO, **kwargs) -> Iterator[Problem]:
+    contents = stream.read()
+    if isinstance(contents, bytes):
+        contents = contents.decode()
+    return iter(parse(contents, **kwargs))
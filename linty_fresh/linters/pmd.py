@@ -1,22 +1,21 @@
-from typing import Set
-from xml.etree import ElementTree
+import io
+from typing import IO, Iterator, Set
 
 from linty_fresh.problem import Problem
+from linty_fresh.stream import iter_elements
 
 
 def parse(contents: str, **kwargs) -> Set[Problem]:
-    result = set()  # type: Set[Problem]
-    try:
-        root = ElementTree.fromstring(contents)
-    except ElementTree.ParseError:
-        return result
-    for file in root.findall('file'):
+    return set(parse_stream(io.StringIO(contents), **kwargs))
+
+
+def parse_stream(stream: IO, **kwargs) -> Iterator[Problem]:
+    for file in iter_elements(stream, 'file'):
         file_name = file.get('name')
         for violation in file.findall('violation'):
-            result.add(Problem(
+            yield Problem(
                 file_name,
                 violation.get('beginline'),
                 '{}: {}'.format(
                     violation.get('rule'),
-                    violation.text.strip())))
-    return result
+                    violation.text.strip()))
@@ -1,20 +1,22 @@
 import re
-from typing import Set
+from typing import Iterator, Set
 
 from linty_fresh.problem import Problem
+from linty_fresh.stream import LineSource, scan_lines
 
 PYLINT_LINE_REGEX = re.compile(r'(?P<path>[^:]+):(?P<line>\d+):\s*'
                                r'(?:(?P<column>\d*):)?\s*'
                                r'(?P<message>.*)')
+# Found in every line PYLINT_LINE_REGEX matches.
+PYLINT_CANDIDATE_REGEX = re.compile(r':\d+:')
 
 
 def parse(contents: str, **kwargs) -> Set[Problem]:
-    result = set()  # type: Set[Problem]
-    for line in contents.splitlines():
-        match = PYLINT_LINE_REGEX.match(line)
-        if match:
-            groups = match.groupdict()
-            result.add(Problem(groups['path'],
-                               groups['line'],
-                               groups['message']))
-    return result
+    return set(parse_stream(contents, **kwargs))
+
+
+def parse_stream(lines: LineSource, **kwargs) -> Iterator[Problem]:
+    for match in scan_lines(lines, PYLINT_LINE_REGEX,
+                            PYLINT_CANDIDATE_REGEX):
+        path, line, _, message = match.groups()
+        yield Problem(path, line, message)
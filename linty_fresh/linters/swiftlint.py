@@ -1,21 +1,23 @@
 import os
 import re
-from typing import Set
+from typing import Iterator, Set
 
 from linty_fresh.problem import Problem
+from linty_fresh.stream import LineSource, scan_lines
 
 SWIFTLINT_LINE_REGEX = re.compile(r'(?P<path>[^:]*):(?P<line>\d*):'
                                   r'(?:(?P<column>\d*):)?\s*(?P<level>\w*):'
                                   r'\s*(?P<message>.*)')
+# Found in every line SWIFTLINT_LINE_REGEX matches.
+SWIFTLINT_CANDIDATE_REGEX = re.compile(r':\d*:')
 
 
 def parse(contents: str, **kwargs) -> Set[Problem]:
-    result = set()  # type: Set[Problem]
-    for line in contents.splitlines():
-        match = SWIFTLINT_LINE_REGEX.match(line)
-        if match:
-            groups = match.groupdict()
-            result.add(Problem(os.path.relpath(groups['path']),
-                               groups['line'],
-                               groups['message']))
-    return result
+    return set(parse_stream(contents, **kwargs))
+
+
+def parse_stream(lines: LineSource, **kwargs) -> Iterator[Problem]:
+    for match in scan_lines(lines, SWIFTLINT_LINE_REGEX,
+                            SWIFTLINT_CANDIDATE_REGEX):
+        path, line, _, _, message = match.groups()
+        yield Problem(os.path.relpath(path), line, message)
@@ -1,30 +1,32 @@
 import os
 import re
-from typing import Set
+from typing import Iterator, Set
 
 from linty_fresh.problem import Problem
+from linty_fresh.stream import LineSource, scan_lines
 
 XCODEBUILD_LINE_REGEX = re.compile(
     r'(?P<path>[^:]*):'
-    r'((?P<line>\d*)|(?P<reference>[^:]*)):'
-    r'(?:(?P<column>\d*):)?\s*(?P<level>(error|warn(ing)?|info)):'
+    r'(?:(?P<line>\d*)|(?P<reference>[^:]*)):'
+    r'(?:(?P<column>\d*):)?\s*(?P<level>error|warn(?:ing)?|info):'
     r'\s*(?P<message>.*)',
     re.IGNORECASE,
 )
+# Found in every line XCODEBUILD_LINE_REGEX matches. Starting with a literal
+# colon lets the regex engine skip ahead quickly; ignoring case in the whole
+# pattern would not.
+XCODEBUILD_CANDIDATE_REGEX = re.compile(r':[^\S\n]*(?i:error|warn|info)')
 
 
 def parse(contents: str, **kwargs) -> Set[Problem]:
-    result = set()  # type: Set[Problem]
-    for line in contents.splitlines():
-        match = XCODEBUILD_LINE_REGEX.match(line)
-        if match:
-            groups = match.groupdict()
-            line = groups['line'] or 0
-            message = groups['message']
-            reference = groups['reference']
-            if reference:
-                message = f'{reference}: {message}'
+    return set(parse_stream(contents, **kwargs))
 
-            result.add(Problem(os.path.relpath(groups['path']),
-                               line, message))
-    return result
+
+def parse_stream(lines: LineSource, **kwargs) -> Iterator[Problem]:
+    for match in scan_lines(lines, XCODEBUILD_LINE_REGEX,
+                            XCODEBUILD_CANDIDATE_REGEX):
+        path, line, reference, _, _, message = match.groups()
+        if reference:
+            message = f'{reference}: {message}'
+
+        yield Problem(os.path.relpath(path), line or 0, message)
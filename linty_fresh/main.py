@@ -1,57 +1,180 @@
 import argparse
 import asyncio
+import functools
+import glob
 import sys
-from typing import Any, Dict  # noqa
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set  # noqa
 
-from linty_fresh.linters import (android, buck_unittest, checkstyle, mypy,
-                                 passthrough, pmd, pylint, swiftlint,
-                                 xcodebuild)
-from linty_fresh.reporters import github_reporter
-from linty_fresh.storage.git_storage_engine import GitNotesStorageEngine
+from linty_fresh.fingerprint import (DEFAULT_FINGERPRINT_CONTEXT, new_problems,
+                                     read_working_tree_files, shared_paths)
+from linty_fresh.lazy import LazyRegistry
+from linty_fresh.plugins import LINTER_ENTRY_POINTS, REPORTER_ENTRY_POINTS
+from linty_fresh.reporters.exceptions import HadLintErrorsException
+from linty_fresh.storage import git_storage_engine, sqlite_storage_engine
+from linty_fresh.storage.storage_engine import MAX_REVISIONS
 
-REPORTERS = {
-    'github': github_reporter,
-}  # type: Dict[str, Any]
+# Modules are only imported when a run selects them. Plugins installed by
+# other distributions are only looked for when a name isn't built in.
+REPORTERS = LazyRegistry({
+    'github': 'linty_fresh.reporters.github_reporter',
+}, REPORTER_ENTRY_POINTS)
+
+DEFAULT_REPORTERS = ['github']
 
-LINTERS = {
-    'android': android,
-    'checkstyle': checkstyle,
-    'mypy': mypy,
-    'passthrough': passthrough,
-    'pmd': pmd,
-    'pylint': pylint,
-    'swiftlint': swiftlint,
-    'xcodebuild': xcodebuild,
-    'androidunittest': buck_unittest
+STORAGE_ENGINES = {
+    'git': git_storage_engine,
+    'sqlite': sqlite_storage_engine,
 }  # type: Dict[str, Any]
 
+LINTERS = LazyRegistry({
+    'android': 'linty_fresh.linters.android',
+    'checkstyle': 'linty_fresh.linters.checkstyle',
+    'mypy': 'linty_fresh.linters.mypy',
+    'passthrough': 'linty_fresh.linters.passthrough',
+    'pmd': 'linty_fresh.linters.pmd',
+    'pylint': 'linty_fresh.linters.pylint',
+    'swiftlint': 'linty_fresh.linters.swiftlint',
+    'xcodebuild': 'linty_fresh.linters.xcodebuild',
+    'androidunittest': 'linty_fresh.linters.buck_unittest'
+}, LINTER_ENTRY_POINTS)
+
+
+def get_selected_reporters(argv: Optional[List[str]] = None) -> List[str]:
+    """Return the known reporters ``argv`` selects with ``--reporter``.
 
-def create_parser() -> argparse.ArgumentParser:
+    Only their arguments are registered, so the others are never imported.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--reporter', type=str, nargs='+',
+                        default=DEFAULT_REPORTERS)
+    selected = parser.parse_known_args(argv)[0].reporter
+    return [name for name in dict.fromkeys(selected) if name in REPORTERS]
+
+
+def create_parser(argv: Optional[List[str]] = None) -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
-    parser.add_argument('--reporter', type=str, nargs='+', default=['github'],
+    parser.add_argument('--reporter', type=str, nargs='+',
+                        default=DEFAULT_REPORTERS,
                         help='The reporter to use when reporting errors.')
-    parser.add_argument('--linter', type=str, required=True,
+    parser.add_argument('--linter', type=str, default=None,
                         help='The type of lint file to parse.')
     parser.add_argument('--linter_name', type=str, default=None,
                         help='Override linter name for PR reporting')
     parser.add_argument('--store_problems', default=False, action='store_true',
-                        help='Whether or not to store lint errors as git '
-                             'notes and filter out problems')
-    parser.add_argument('files', type=str, nargs='+',
+                        help='Whether or not to store lint errors and filter '
+                             'out problems stored for earlier commits')
+    parser.add_argument('--storage', type=str, default='git',
+                        choices=sorted(STORAGE_ENGINES),
+                        help='Where problems are stored: git notes shared '
+                             'through origin, or a local SQLite database.')
+    parser.add_argument('--ancestor_depth', type=int, default=MAX_REVISIONS,
+                        help='Number of ancestors searched for stored '
+                             'problems.')
+    parser.add_argument('--target_branch', type=str, default=None,
+                        help='Branch the change will be merged into, such as '
+                             'origin/master. Stored problems are searched '
+                             'for from its merge base with HEAD.')
+    parser.add_argument('files', type=str, nargs='*',
                         help='The lint file being parsed.')
+    parser.add_argument('--lint', type=str, action='append', default=[],
+                        metavar='LINTER:GLOB',
+                        help='Parse the lint files matching GLOB with '
+                             'LINTER. May be repeated to report the '
+                             'problems of several linters in one run.')
     parser.add_argument('--pass-warnings', default=False, action='store_true',
                         help='(ANDROID ONLY) Pass Android linter on warnings.')
     parser.add_argument('--delete_previous_comments', default=False,
                         action='store_true',
                         help='Delete stale linter comments.')
-
-    for name, reporter in REPORTERS.items():
-        reporter.register_arguments(parser)
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of processes used to parse lint files.')
+    parser.add_argument('--match_fingerprints', default=False,
+                        action='store_true',
+                        help='Match stored problems by their message and '
+                             'surrounding source lines rather than by line '
+                             'number, so problems moved by edits above them '
+                             'are not reported again.')
+    parser.add_argument('--fingerprint_context', type=int,
+                        default=DEFAULT_FINGERPRINT_CONTEXT,
+                        help='Number of source lines on each side of a '
+                             'problem included in its fingerprint.')
+    for name in get_selected_reporters(argv):
+        REPORTERS[name].register_arguments(parser)
+    for name, storage_engine in STORAGE_ENGINES.items():
+        storage_engine.register_arguments(parser)
     return parser
 
 
-async def run_loop(args):
-    args = create_parser().parse_args()
+def parse_lint_file(linter: str, lint_file_path: str,
+                    kwargs: Dict[str, Any]) -> Set[Any]:
+    with open(lint_file_path, 'rb') as lint_file:
+        return set(LINTERS[linter].parse_stream(lint_file, **kwargs))
+
+
+def parse_lint_files_serially(linter: str, lint_file_paths: Iterable[str],
+                              kwargs: Dict[str, Any]) -> Set[Any]:
+    problems = set()  # type: Set[Any]
+    for lint_file_path in lint_file_paths:
+        problems.update(parse_lint_file(linter, lint_file_path, kwargs))
+    return problems
+
+
+async def parse_lint_files(linter: str, lint_file_paths: Iterable[str],
+                           jobs: int, kwargs: Dict[str, Any],
+                           executor: Optional[Executor] = None) -> Set[Any]:
+    """Parse the lint files, in ``executor`` if given or else in a pool of
+    ``jobs`` processes."""
+    loop = asyncio.get_event_loop()
+    if jobs <= 1:
+        # A worker thread keeps the event loop free for the network requests
+        # running alongside the parse.
+        return await loop.run_in_executor(None, functools.partial(
+            parse_lint_files_serially, linter, lint_file_paths, kwargs))
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            return await parse_lint_files(linter, lint_file_paths, jobs,
+                                          kwargs, executor)
+    problems = set()  # type: Set[Any]
+    results = await asyncio.gather(*[
+        loop.run_in_executor(executor, functools.partial(
+            parse_lint_file, linter, lint_file_path, kwargs))
+        for lint_file_path in lint_file_paths])
+    for result in results:
+        problems.update(result)
+    return problems
+
+
+def get_lint_files(args: argparse.Namespace) -> Dict[str, List[str]]:
+    """Return the lint files to parse for each linter.
+
+    The files of ``--lint`` pairs are expanded from their globs.
+    """
+    lint_files = {}  # type: Dict[str, List[str]]
+    if args.linter or args.files:
+        if not args.linter or not args.files:
+            raise Exception('--linter and lint files must be given together')
+        lint_files[args.linter] = list(args.files)
+    for pair in args.lint:
+        linter, separator, pattern = pair.partition(':')
+        if not separator or not pattern:
+            raise Exception('--lint {} is not of the form '
+                            'LINTER:GLOB'.format(pair))
+        paths = sorted(glob.glob(pattern, recursive=True))
+        if not paths:
+            raise Exception('No lint files match {}'.format(pattern))
+        lint_files.setdefault(linter, []).extend(paths)
+    if not lint_files:
+        raise Exception('Specify --linter and lint files, or --lint')
+    for linter in lint_files:
+        if linter not in LINTERS:
+            raise Exception('Linter {} is invalid, options are {}'.format(
+                linter, ','.join(list(LINTERS.keys()))
+            ))
+    return lint_files
+
+
+def create_reporters(args: argparse.Namespace) -> List[Any]:
     reporters = []
     for reporter in args.reporter:
         if reporter not in REPORTERS:
@@ -59,38 +182,95 @@ async def run_loop(args):
                 reporter, ','.join(list(REPORTERS.keys()))
             ))
         reporters.append(REPORTERS[reporter].create_reporter(args))
+    return reporters
 
-    problems = set()
-    if args.linter not in LINTERS:
-        raise Exception('Linter {} is invalid, options are {}'.format(
-            args.linter, ','.join(list(LINTERS.keys()))
-        ))
-    linter = LINTERS[args.linter]
-    for lint_file_path in args.files:
-        with open(lint_file_path) as lint_file:
-            problems.update(linter.parse(
-                lint_file.read(), **vars(args)))
-    storage_engine = GitNotesStorageEngine('origin')
 
-    awaitable_array = []
+async def run_loop(args, reporters: Optional[List[Any]] = None):
+    if reporters is None:
+        reporters = create_reporters(args)
 
-    if args.store_problems:
-        awaitable_array.append(storage_engine.store_problems(problems))
-        existing_problems = await storage_engine.get_existing_problems()
-        problems = problems.difference(existing_problems)
-
-    linter_name = args.linter_name or linter
-    awaitable_array.extend([reporter.report(linter_name, problems) for
-                            reporter in
-                            reporters])
+    lint_files = get_lint_files(args)
+    storage_engine = STORAGE_ENGINES[args.storage].create_storage_engine(args)
+
+    executor = None  # type: Optional[Executor]
+    if args.jobs > 1:
+        # Every linter's files are parsed in one pool of worker processes.
+        executor = ProcessPoolExecutor(max_workers=args.jobs)
     try:
-        await asyncio.gather(*awaitable_array)
-    except github_reporter.HadLintErrorsException:
+        await run_linters(args, lint_files, reporters, storage_engine,
+                          executor)
+    finally:
+        if executor:
+            executor.shutdown()
+
+
+async def run_linters(args: argparse.Namespace,
+                      lint_files: Dict[str, List[str]], reporters: List[Any],
+                      storage_engine: Any,
+                      executor: Optional[Executor]) -> None:
+    # Fetching the stored problems, parsing the lint files and each
+    # reporter's own network requests all start now, for every linter;
+    # every step below only waits for the results it needs.
+    problems_futures = {}  # type: Dict[str, asyncio.Future]
+    existing_problems_futures = {}  # type: Dict[str, asyncio.Future]
+    for linter, lint_file_paths in lint_files.items():
+        linter_name = linter
+        if linter == args.linter:
+            linter_name = args.linter_name or linter
+        if args.store_problems:
+            existing_problems_futures[linter_name] = asyncio.ensure_future(
+                storage_engine.get_existing_problems(linter_name))
+        problems_futures[linter_name] = asyncio.ensure_future(
+            parse_lint_files(linter, lint_file_paths, args.jobs, vars(args),
+                             executor))
+
+    async def get_new_problems(linter_name: str) -> Set[Any]:
+        problems = await problems_futures[linter_name]
+        if not args.store_problems:
+            return problems
+        existing_problems = await existing_problems_futures[linter_name]
+        if not args.match_fingerprints:
+            return problems.difference(existing_problems)
+        paths = shared_paths(problems, existing_problems)
+        existing_sources = await storage_engine.get_existing_sources(
+            paths, linter_name)
+        return new_problems(problems, existing_problems, existing_sources,
+                            read_working_tree_files(paths),
+                            args.fingerprint_context)
+
+    async def store_problems() -> None:
+        # The store writes the notes ref the fetches read, so it never
+        # starts before they have finished. Every linter's problems are
+        # stored at once.
+        await asyncio.gather(*existing_problems_futures.values())
+        await storage_engine.store_linter_problems({
+            linter_name: await problems_future
+            for linter_name, problems_future in problems_futures.items()})
+
+    awaitable_array = []
+    for linter_name in problems_futures:
+        new_problems_future = asyncio.ensure_future(
+            get_new_problems(linter_name))
+        awaitable_array.extend(
+            reporter.report(linter_name, new_problems_future)
+            for reporter in reporters)
+    if args.store_problems:
+        awaitable_array.append(store_problems())
+
+    # Let the stored problems be written even if a reporter fails.
+    results = await asyncio.gather(*awaitable_array, return_exceptions=True)
+    had_lint_errors = False
+    for result in results:
+        if isinstance(result, HadLintErrorsException):
+            had_lint_errors = True
+        elif isinstance(result, BaseException):
+            raise result
+    if had_lint_errors:
         sys.exit(1)
 
 
 def main():
-    args = create_parser().parse_args()
+    args = create_parser(sys.argv[1:]).parse_args()
     loop = asyncio.get_event_loop()
     loop.run_until_complete(run_loop(args))
     loop.close()
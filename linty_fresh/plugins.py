@@ -0,0 +1,135 @@
+"""Discovery of linters and reporters installed by other distributions.
+
+A distribution adds a linter by declaring an entry point in the
+``linty_fresh.linters`` group, or a reporter in ``linty_fresh.reporters``,
+that names a module (or ``module:attribute``) with the same functions as
+the built-in ones::
+
+    [options.entry_points]
+    linty_fresh.linters =
+        eslint = acme_linty_fresh.eslint
+
+Reading the metadata of every installed distribution is slow, so the entry
+points are kept in an index in the user's cache directory, one for each
+interpreter and environment. The index is rebuilt when ``sys.path`` changes, or when a distribution is installed in or
+removed from one of its directories that held distributions.
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List  # noqa
+
+LINTER_ENTRY_POINTS = 'linty_fresh.linters'
+REPORTER_ENTRY_POINTS = 'linty_fresh.reporters'
+ENTRY_POINT_GROUPS = (LINTER_ENTRY_POINTS, REPORTER_ENTRY_POINTS)
+INDEX_VERSION = 1
+METADATA_SUFFIXES = ('.dist-info', '.egg-info')
+
+
+def get_index_path() -> str:
+    default = os.path.join(os.path.expanduser('~'), '.cache')
+    cache_home = os.environ.get('XDG_CACHE_HOME') or default
+    # Virtual environments and interpreters sharing the cache directory
+    # each keep their own index instead of overwriting one another's.
+    interpreter = hashlib.sha1('{}\0{}'.format(
+        sys.prefix, sys.executable).encode()).hexdigest()[:12]
+    return os.path.join(cache_home, 'linty_fresh',
+                        'plugins-{}.json'.format(interpreter))
+
+
+def get_entry_points(group: str) -> Dict[str, str]:
+    """Return the names and values of the entry points in ``group``."""
+    return _get_index().get(group, {})
+
+
+def get_metadata_paths() -> List[str]:
+    """Return the entries of ``sys.path`` holding installed distributions.
+
+    Other entries, such as the working directory, are left out of the
+    index's key, as files are written to them all the time.
+    """
+    metadata_paths = []
+    for path in sys.path:
+        try:
+            names = os.listdir(path or os.curdir)
+        except OSError:
+            continue
+        if any(name.endswith(METADATA_SUFFIXES) for name in names):
+            metadata_paths.append(path)
+    return metadata_paths
+
+
+def get_distributions_key(metadata_paths: List[str]) -> List[Any]:
+    """Identify the installed distributions without reading their metadata.
+
+    Installing or removing a distribution adds or removes its metadata
+    directory, which changes the modification time of its directory on
+    ``sys.path``.
+    """
+    key = [INDEX_VERSION, sys.version, sys.path]  # type: List[Any]
+    for path in metadata_paths:
+        try:
+            key.append([path, os.stat(path or os.curdir).st_mtime_ns])
+        except OSError:
+            key.append([path, None])
+    return key
+
+
+def _get_index() -> Dict[str, Dict[str, str]]:
+    index_path = get_index_path()
+    try:
+        with open(index_path) as index_file:
+            index = json.load(index_file)
+        if index['key'] == get_distributions_key(index['metadata_paths']):
+            return index['entry_points']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    # The key is taken first, so distributions installed while the entry
+    # points are read make the next run read them again.
+    metadata_paths = get_metadata_paths()
+    key = get_distributions_key(metadata_paths)
+    entry_points = _read_entry_points()
+    _write_index(index_path, {'key': key, 'metadata_paths': metadata_paths,
+                              'entry_points': entry_points})
+    return entry_points
+
+
+def _read_entry_points() -> Dict[str, Dict[str, str]]:
+    try:
+        from importlib import metadata
+    except ImportError:
+        # Python < 3.8 has the backport instead.
+        import importlib_metadata as metadata  # type: ignore
+    all_entry_points = metadata.entry_points()
+    entry_points = {}  # type: Dict[str, Dict[str, str]]
+    for group in ENTRY_POINT_GROUPS:
+        if hasattr(all_entry_points, 'select'):
+            selected = all_entry_points.select(group=group)
+        else:
+            # Python < 3.10 returns a dict of groups.
+            selected = all_entry_points.get(group, ())
+        entry_points[group] = {entry_point.name: entry_point.value
+                               for entry_point in selected}
+    return entry_points
+
+
+def _write_index(index_path: str, index: Dict[str, Any]) -> None:
+    # Written to a temporary file and renamed into place, as concurrent runs
+    # may rebuild the index at the same time.
+    directory = os.path.dirname(index_path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp')
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'w') as temp_file:
+            json.dump(index, temp_file)
+        os.replace(temp_path, index_path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
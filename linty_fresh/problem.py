@@ -1,18 +1,52 @@
 import itertools
+import sys
 from collections import OrderedDict
 
 
+def _intern(value: str) -> str:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 class Problem:
+    # Problems are immutable so their hash can be computed once; runs with
+    # millions of problems hash and compare them constantly.
+    __slots__ = ('path', 'line', 'message', '_hash')
+
     def __init__(self, file_path: str, line: str, message: str) -> None:
-        self.path = file_path
-        self.line = int(line)
-        self.message = message
+        path = _intern(file_path)
+        line = int(line)
+        set_attr = object.__setattr__
+        set_attr(self, 'path', path)
+        set_attr(self, 'line', line)
+        set_attr(self, 'message', message)
+        set_attr(self, '_hash', hash((path, line, message)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __reduce__(self):
+        return Problem, (self.path, self.line, self.message)
 
     def __hash__(self):
-        return hash((self.path, self.line, self.message))
+        return self._hash
 
     def __eq__(self, other):
-        return ((self.path, self.line, self.message) == (other.path, other.line, other.message))
+        if self is other:
+            return True
+        if not isinstance(other, Problem):
+            return NotImplemented
+        if self._hash != other._hash:
+            return False
+        return ((self.path, self.line, self.message) == (other.path,
+                                                         other.line,
+                                                         other.message))
+
+    def __repr__(self):
+        return 'Problem({!r}, {!r}, {!r})'.format(
+            self.path, self.line, self.message)
 
     def to_json(self):
         return OrderedDict({
@@ -38,18 +72,38 @@ class Problem:
 
 
 class TestProblem:
+    __slots__ = ('test_group', 'test_name', 'message', 'stack_trace', '_hash')
+
     def __init__(self, test_group: str, test_name: str, message: str,
                  stack_trace: str) -> None:
-        self.test_group = test_group.strip()
-        self.test_name = test_name.strip()
-        self.message = message.strip()
-        self.stack_trace = stack_trace.strip()
+        set_attr = object.__setattr__
+        set_attr(self, 'test_group', _intern(test_group.strip()))
+        set_attr(self, 'test_name', test_name.strip())
+        set_attr(self, 'message', message.strip())
+        set_attr(self, 'stack_trace', stack_trace.strip())
+        set_attr(self, '_hash', hash((self.test_group, self.test_name,
+                                      self.message, self.stack_trace)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __reduce__(self):
+        return TestProblem, (self.test_group, self.test_name, self.message,
+                             self.stack_trace)
 
     def __hash__(self):
-        return hash((self.test_group, self.test_name, self.message,
-                    self.stack_trace))
+        return self._hash
 
     def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, TestProblem):
+            return NotImplemented
+        if self._hash != other._hash:
+            return False
         return ((self.test_group,
                  self.test_name,
                  self.message,
@@ -58,6 +112,10 @@ class TestProblem:
                                        other.message,
                                        other.stack_trace))
 
+    def __repr__(self):
+        return 'TestProblem({!r}, {!r}, {!r}, {!r})'.format(
+            self.test_group, self.test_name, self.message, self.stack_trace)
+
     def to_json(self):
         return OrderedDict({
             'test_group': self.test_group,
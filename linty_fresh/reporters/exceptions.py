@@ -0,0 +1,4 @@
+class HadLintErrorsException(Exception):
+    """Raised by a reporter that reported problems, so linty_fresh exits
+    with an error. Kept apart from the reporters so it can be caught
+    without importing them."""
@@ -0,0 +1,176 @@
+import collections
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple  # noqa
+
+from linty_fresh.reporters.position_map import (FilePositionMap,
+                                                dump_position_map,
+                                                load_position_map)
+
+DEFAULT_MAX_CACHE_SIZE = 256 * 2 ** 20
+DEFAULT_MAX_MEMORY_ENTRIES = 1024
+POSITION_MAP_SUFFIX = '.positions'
+MESSAGES_SUFFIX = '.messages'
+CACHE_SUFFIXES = (POSITION_MAP_SUFFIX, MESSAGES_SUFFIX)
+
+CachedMessages = NamedTuple('CachedMessages', [
+    ('etag', str),
+    ('link', Optional[str]),
+    ('messages', List[Any]),
+])
+
+
+class GithubCache:
+    """On-disk cache of PR diffs and comment pages shared between runs.
+
+    Entries are written to a temporary file and renamed into place, so any
+    number of linty_fresh processes on one host can share a directory. Least
+    recently used entries are evicted once the directory grows past
+    ``max_size`` bytes.
+    """
+
+    def __init__(self, directory: str,
+                 max_size: int = DEFAULT_MAX_CACHE_SIZE) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def get_position_map(self, organization: str, repo: str, pr: int,
+                         commit: str) -> Optional[Dict[str, FilePositionMap]]:
+        data = self._read(self._get_path(POSITION_MAP_SUFFIX, organization,
+                                         repo, pr, commit))
+        if data is None:
+            return None
+        try:
+            return load_position_map(data)
+        except ValueError:
+            return None
+
+    def set_position_map(self, organization: str, repo: str, pr: int,
+                         commit: str,
+                         position_map: Dict[str, FilePositionMap]) -> None:
+        self._write(self._get_path(POSITION_MAP_SUFFIX, organization, repo,
+                                   pr, commit),
+                    dump_position_map(position_map))
+
+    def get_messages(self, url: str) -> Optional[CachedMessages]:
+        data = self._read(self._get_path(MESSAGES_SUFFIX, url))
+        if data is None:
+            return None
+        try:
+            return CachedMessages(**json.loads(data.decode()))
+        except (ValueError, TypeError):
+            return None
+
+    def set_messages(self, url: str, etag: str, link: Optional[str],
+                     messages: List[Any]) -> None:
+        self._write(self._get_path(MESSAGES_SUFFIX, url),
+                    json.dumps(CachedMessages(etag, link,
+                                              messages)._asdict()).encode())
+
+    def _get_path(self, suffix: str, *key: Any) -> str:
+        digest = hashlib.sha256(
+            '\0'.join(str(part) for part in key).encode()).hexdigest()
+        return os.path.join(self.directory, digest + suffix)
+
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        try:
+            with open(path, 'rb') as cache_file:
+                data = cache_file.read()
+            # The modification time doubles as the last access time for
+            # eviction.
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def _write(self, path: str, data: bytes) -> None:
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory,
+                                             prefix='.tmp')
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(CACHE_SUFFIXES):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Another process already evicted it.
+                pass
+            total_size -= size
+
+
+class MemoryGithubCache(GithubCache):
+    """Cache of PR diffs and comment pages kept in memory, for a
+    long-running process such as linty_fresh_daemon.
+
+    Entries are kept parsed. The least recently used are evicted once there
+    are more than ``max_entries``.
+    """
+
+    def __init__(self,
+                 max_entries: int = DEFAULT_MAX_MEMORY_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict(
+        )  # type: collections.OrderedDict[Tuple[Any, ...], Any]
+
+    def get_position_map(self, organization: str, repo: str, pr: int,
+                         commit: str) -> Optional[Dict[str, FilePositionMap]]:
+        return self._get((POSITION_MAP_SUFFIX, organization, repo, pr,
+                          commit))
+
+    def set_position_map(self, organization: str, repo: str, pr: int,
+                         commit: str,
+                         position_map: Dict[str, FilePositionMap]) -> None:
+        self._set((POSITION_MAP_SUFFIX, organization, repo, pr, commit),
+                  position_map)
+
+    def get_messages(self, url: str) -> Optional[CachedMessages]:
+        return self._get((MESSAGES_SUFFIX, url))
+
+    def set_messages(self, url: str, etag: str, link: Optional[str],
+                     messages: List[Any]) -> None:
+        # Copied, as callers may go on to change their list.
+        self._set((MESSAGES_SUFFIX, url),
+                  CachedMessages(etag, link, list(messages)))
+
+    def _get(self, key: Tuple[Any, ...]) -> Any:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key: Tuple[Any, ...], value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
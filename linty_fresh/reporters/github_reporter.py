@@ -1,29 +1,35 @@
 import argparse
 import asyncio
+import inspect
 import json
 import os
 import re
-from collections import defaultdict
-from typing import Any, Dict, List, MutableMapping, Optional, Set, TypeVar
-
-import aiohttp
+import sys
+import urllib.parse
+from typing import (TYPE_CHECKING, Any, Awaitable, Callable, Dict, Hashable,
+                    Iterable, List, Optional, Set, Tuple, TypeVar, Union)
 
 from linty_fresh.problem import Problem, TestProblem
+from linty_fresh.reporters.exceptions import HadLintErrorsException
+from linty_fresh.reporters.github_cache import (DEFAULT_MAX_CACHE_SIZE,
+                                                GithubCache)
+from linty_fresh.reporters.position_map import (FilePositionMap,
+                                                create_position_map)
+from linty_fresh.reporters.request_scheduler import (
+    DEFAULT_REQUEST_CONCURRENCY, RequestScheduler)
+
+if TYPE_CHECKING:
+    import aiohttp  # noqa
 
 PR_URL_REGEX = re.compile(r'https?://.*?github.com/'
                           r'(?:repos/)?'
                           r'(?P<organization>[^/]*)/'
                           r'(?P<repo>[^/]*)/pulls?/'
                           r'(?P<pr_number>\d*)')
-HUNK_REGEX = re.compile(r'@@ \-\d+,\d+ \+(\d+),\d+ @@')
-FILE_START_REGEX = re.compile(r'\+\+\+ b/(.*)')
 LINK_REGEX = re.compile(r'<(?P<url>.+)>; rel="(?P<rel>\w+)"')
-NEW_FILE_SECTION_START = 'diff --git a'
 MAX_LINT_ERROR_REPORTS = 10
-
-
-class HadLintErrorsException(Exception):
-    pass
+MAX_REVIEW_LINT_ERROR_REPORTS = 100
+DEFAULT_FETCH_CONCURRENCY = 8
 
 
 class ExistingGithubMessage:
@@ -57,35 +63,78 @@ class GithubReporter:
                  repo: str,
                  pr_number: int,
                  commit: str,
-                 delete_previous_comments: bool) -> None:
+                 delete_previous_comments: bool,
+                 fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+                 request_concurrency: int = DEFAULT_REQUEST_CONCURRENCY,
+                 batch_review: bool = False,
+                 cache: Optional[GithubCache] = None,
+                 connector: Optional['aiohttp.BaseConnector'] = None) -> None:
         self.auth_token = auth_token
         self.organization = organization
         self.repo = repo
         self.pr = pr_number
         self.commit = commit
         self.delete_previous_comments = delete_previous_comments
+        self.fetch_concurrency = fetch_concurrency
+        self.request_concurrency = request_concurrency
+        self.batch_review = batch_review
+        self.cache = cache
+        # A connector shared with other reporters keeps its connections
+        # open when the reporter's session is closed.
+        self.connector = connector
+        # A review is a single request however many comments it holds, so
+        # far more inline comments can be posted in batch mode.
+        self.max_lint_error_reports = (MAX_REVIEW_LINT_ERROR_REPORTS
+                                       if batch_review
+                                       else MAX_LINT_ERROR_REPORTS)
+        # State of the reports running at the same time, see _session.
+        self._session_users = 0
+        self._session_context = None  # type: Optional[aiohttp.ClientSession]
+        self._client_session = None  # type: Optional[asyncio.Future]
+        self._shared_requests = None  # type: Optional[Dict[Hashable, asyncio.Future]]
+        self._scheduler = None  # type: Optional[RequestScheduler]
 
     async def report(self, linter_name: str,
-                     problems: List[GenericProblem]) -> None:
-        if not problems:
-            grouped_problems = {}
-        elif isinstance(list(problems)[0], TestProblem):
-            grouped_problems = TestProblem.group_by_group(problems)
-        else:
-            grouped_problems = Problem.group_by_path_and_line(problems)
-
-        headers = {
-            'Authorization': f'token {self.auth_token}',
-        }
-        async with aiohttp.ClientSession(headers=headers) as client_session:
-            (line_map, existing_messages, message_ids) = await asyncio.gather(
-                self.create_line_to_position_map(client_session),
+                     problems: Union[Iterable[GenericProblem],
+                                     Awaitable[Iterable[GenericProblem]]]
+                     ) -> None:
+        """Comment on the PR about ``problems``.
+
+        ``problems`` may also be an awaitable, such as the future of a lint
+        file that is still being parsed. The diff and the existing comments
+        are then fetched while it completes.
+
+        Reports for several linters running at the same time share a client
+        session, the diff and the existing comments, and their requests go
+        through one scheduler, so they are limited together.
+        """
+        async with self._session() as client_session:
+            pr_state = asyncio.gather(
+                self._share_request(('diff',),
+                                    self.create_line_to_position_map,
+                                    client_session),
                 self.get_existing_pr_messages(client_session, linter_name),
                 self.get_existing_issue_message_ids(client_session,
                                                     linter_name))
+            if inspect.isawaitable(problems):
+                try:
+                    problems = await problems
+                except BaseException:
+                    pr_state.cancel()
+                    raise
+            (line_map, existing_messages, message_ids) = await pr_state
+
+            if not problems:
+                grouped_problems = {}
+            elif isinstance(next(iter(problems)), TestProblem):
+                grouped_problems = TestProblem.group_by_group(problems)
+            else:
+                grouped_problems = Problem.group_by_path_and_line(problems)
+
             lint_errors = 0
             review_comment_awaitable = []
-            pr_url = self._get_pr_url()
+            scheduler = self._scheduler
+            inline_comments = []  # type: List[Dict[str, Any]]
             no_matching_line_number = []
             for location, problems_for_line in grouped_problems:
                 message_for_line = [f'{linter_name} says:', '']
@@ -96,10 +145,7 @@ class GithubReporter:
                 line_number = location[1]
                 position = line_map.get(path, {}).get(line_number, None)
                 if position is None and path in line_map:
-                    file_map = line_map[path]
-                    closest_line = min(file_map.keys(),
-                                       key=lambda x: abs(x - line_number))
-                    position = file_map[closest_line]
+                    _, position = line_map[path].nearest(line_number)
                     message_for_line.append('(From line {})'.format(
                         line_number))
                 message_for_line.append('```')
@@ -116,43 +162,46 @@ class GithubReporter:
                                                   message))
                     except KeyError:
                         lint_errors += 1
-                        if lint_errors <= MAX_LINT_ERROR_REPORTS:
-                            data = json.dumps({
+                        if lint_errors <= self.max_lint_error_reports:
+                            inline_comments.append({
                                 'body': message,
-                                'commit_id': self.commit,
                                 'path': path,
                                 'position': position,
-                            }, sort_keys=True)
-                            review_comment_awaitable.append(
-                                client_session.post(pr_url, data=data))
+                            })
                 else:
                     no_matching_line_number.append((location,
                                                     problems_for_line))
 
-            if lint_errors > MAX_LINT_ERROR_REPORTS:
+            reported = 0
+            if inline_comments:
+                inline_awaitables, reported = (
+                    await self._submit_inline_comments(
+                        client_session, scheduler, linter_name,
+                        inline_comments))
+                review_comment_awaitable.extend(inline_awaitables)
+
+            if lint_errors > reported:
                 message = """{} says:
 
 Too many lint errors to report inline!  {} lines have a problem.
 Only reporting the first {}.""".format(
-                    linter_name, lint_errors, MAX_LINT_ERROR_REPORTS)
+                    linter_name, lint_errors, reported)
                 data = json.dumps({
                     'body': message
                 })
                 review_comment_awaitable.append(
-                    asyncio.ensure_future(client_session.post(
-                        self._get_issue_url(),
-                        data=data)))
+                    scheduler.request(client_session.post,
+                                      self._get_issue_url(), data=data))
 
             if self.delete_previous_comments:
                 for message_id in message_ids:
-                    review_comment_awaitable.append(
-                        asyncio.ensure_future(client_session.delete(
-                            self._get_delete_issue_comment_url(message_id))))
+                    review_comment_awaitable.append(scheduler.request(
+                        client_session.delete,
+                        self._get_delete_issue_comment_url(message_id)))
                 for message in existing_messages:
-                    review_comment_awaitable.append(
-                        asyncio.ensure_future(client_session.delete(
-                            self._get_delete_pr_comment_url(
-                                message.comment_id))))
+                    review_comment_awaitable.append(scheduler.request(
+                        client_session.delete,
+                        self._get_delete_pr_comment_url(message.comment_id)))
 
             if no_matching_line_number:
                 no_matching_line_messages = []
@@ -173,8 +222,8 @@ Only reporting the first {}.""".format(
                     'body': message
                 })
                 review_comment_awaitable.append(
-                    asyncio.ensure_future(client_session.post(
-                        self._get_issue_url(), data=data)))
+                    scheduler.request(client_session.post,
+                                      self._get_issue_url(), data=data))
 
             responses = await asyncio.gather(
                 *review_comment_awaitable
@@ -185,14 +234,109 @@ Only reporting the first {}.""".format(
             if lint_errors > 0:
                 raise HadLintErrorsException()
 
-    async def create_line_to_position_map(
-        self, client_session: aiohttp.ClientSession
-    ) -> MutableMapping[str, Dict[int, int]]:
-        result = defaultdict(dict)  # type: MutableMapping[str, Dict[int, int]]
-        current_file = ''
-        position = -1
-        right_line_number = -1
+    def _session(self) -> '_SessionUse':
+        """Open a client session, or join the one opened by the reports
+        already running. The last report to finish closes it."""
+        return _SessionUse(self)
+
+    async def _join_session(self) -> 'aiohttp.ClientSession':
+        # Imported here, so building the argument parser doesn't load it.
+        import aiohttp
+        if not self._session_users:
+            headers = {
+                'Authorization': f'token {self.auth_token}',
+            }
+            self._session_context = aiohttp.ClientSession(
+                headers=headers, connector=self.connector,
+                connector_owner=self.connector is None)
+            self._client_session = asyncio.ensure_future(
+                self._session_context.__aenter__())
+            self._shared_requests = {}
+            self._scheduler = RequestScheduler(self.request_concurrency)
+        self._session_users += 1
+        try:
+            return await self._client_session
+        except BaseException:
+            await self._leave_session()
+            raise
+
+    async def _leave_session(self) -> None:
+        self._session_users -= 1
+        if not self._session_users:
+            self._shared_requests = None
+            self._scheduler = None
+            session_context = self._session_context
+            self._session_context = None
+            await session_context.__aexit__(None, None, None)
+
+    def _share_request(self, key: Hashable,
+                       request: Callable[..., Awaitable[Any]],
+                       *args: Any) -> Awaitable[Any]:
+        """Make ``request`` once for all the reports sharing the session.
+
+        A report that is cancelled doesn't cancel the request for the
+        others.
+        """
+        if self._shared_requests is None:
+            return request(*args)
+        if key not in self._shared_requests:
+            self._shared_requests[key] = asyncio.ensure_future(
+                request(*args))
+        return asyncio.shield(self._shared_requests[key])
+
+    async def _submit_inline_comments(
+        self,
+        client_session: 'aiohttp.ClientSession',
+        scheduler: RequestScheduler,
+        linter_name: str,
+        inline_comments: List[Dict[str, Any]]
+    ) -> Tuple[List[Awaitable['aiohttp.ClientResponse']], int]:
+        """Post inline comments, returning any requests still to be awaited
+        and the number of comments posted.
+
+        In batch review mode every comment goes out as one pull request
+        review. If GitHub rejects the review only the first
+        ``MAX_LINT_ERROR_REPORTS`` comments are posted one by one instead.
+        """
+        if self.batch_review:
+            data = json.dumps({
+                'body': '{} says: found problems on {} lines.'.format(
+                    linter_name, len(inline_comments)),
+                'comments': inline_comments,
+                'commit_id': self.commit,
+                'event': 'COMMENT',
+            }, sort_keys=True)
+            import aiohttp
+            try:
+                response = await scheduler.request(
+                    client_session.post, self._get_review_url(), data=data)
+            except aiohttp.ClientError as e:
+                reason = str(e)
+            else:
+                if response.status < 300:
+                    response.close()
+                    return [], len(inline_comments)
+                reason = '{}: {}'.format(response.status,
+                                         await response.text())
+                response.close()
+            inline_comments = inline_comments[:MAX_LINT_ERROR_REPORTS]
+            print('GitHub rejected the review of {} ({}), posting {} '
+                  'comments instead.'.format(linter_name, reason,
+                                             len(inline_comments)),
+                  file=sys.stderr)
+
+        pr_url = self._get_pr_url()
+        return [
+            scheduler.request(client_session.post, pr_url,
+                              data=json.dumps(dict(comment,
+                                                   commit_id=self.commit),
+                                              sort_keys=True))
+            for comment in inline_comments
+        ], len(inline_comments)
 
+    async def create_line_to_position_map(
+        self, client_session: 'aiohttp.ClientSession'
+    ) -> Dict[str, FilePositionMap]:
         headers = {
             'Accept': 'application/vnd.github.diff',
         }
@@ -201,31 +345,22 @@ Only reporting the first {}.""".format(
                    organization=self.organization,
                    repo=self.repo,
                    pr=self.pr))
+        if self.cache:
+            position_map = self.cache.get_position_map(
+                self.organization, self.repo, self.pr, self.commit)
+            if position_map is not None:
+                return position_map
+
         async with client_session.get(url, headers=headers) as response:
-            # Collect the entire response before reading it. If you iterate
-            # over lines instead, very long lines cause exceptions
-            content = b''
-            async for chunk in response.content.iter_any():
-                content += chunk
-
-            for line in content.splitlines():
-                line = line.decode()
-                file_match = FILE_START_REGEX.match(line)
-                if file_match:
-                    current_file = file_match.groups()[0].strip()
-                    right_line_number = -1
-                    position = -1
-
-                if current_file and not file_match:
-                    position += 1
-                    hunk_match = HUNK_REGEX.match(line)
-                    if hunk_match:
-                        right_line_number = int(hunk_match.groups()[0]) - 1
-                    elif not line.startswith('-'):
-                        right_line_number += 1
-                        result[current_file][right_line_number] = position
-
-        return result
+            # Parse the diff chunk by chunk. Iterating over lines with
+            # aiohttp raises on very long lines.
+            position_map = await create_position_map(
+                response.content.iter_any())
+
+        if self.cache:
+            self.cache.set_position_map(self.organization, self.repo, self.pr,
+                                        self.commit, position_map)
+        return position_map
 
     def _get_pr_url(self) -> str:
         return ('https://api.github.com/repos/'
@@ -234,6 +369,13 @@ Only reporting the first {}.""".format(
                     repo=self.repo,
                     pr=self.pr))
 
+    def _get_review_url(self) -> str:
+        return ('https://api.github.com/repos/'
+                '{organization}/{repo}/pulls/{pr}/reviews'.format(
+                    organization=self.organization,
+                    repo=self.repo,
+                    pr=self.pr))
+
     def _get_issue_url(self) -> str:
         return ('https://api.github.com/repos/'
                 '{organization}/{repo}/issues/{pr}/comments'.format(
@@ -256,7 +398,7 @@ Only reporting the first {}.""".format(
                     comment_id=comment_id))
 
     async def get_existing_issue_message_ids(
-        self, client_session: aiohttp.ClientSession, linter_name: str
+        self, client_session: 'aiohttp.ClientSession', linter_name: str
     ) -> Set[str]:
         url = self._get_issue_url()
         messages_json = await self._fetch_message_json_from_url(
@@ -269,7 +411,7 @@ Only reporting the first {}.""".format(
         return message_ids
 
     async def get_existing_pr_messages(
-        self, client_session: aiohttp.ClientSession, linter_name: str
+        self, client_session: 'aiohttp.ClientSession', linter_name: str
     ) -> Set[ExistingGithubMessage]:
         url = self._get_pr_url()
         existing_messages = set()  # type: Set[ExistingGithubMessage]
@@ -289,37 +431,127 @@ Only reporting the first {}.""".format(
 
         return existing_messages
 
-    @staticmethod
     async def _fetch_message_json_from_url(
-            client_session, url, linter_name
-    ) -> [Any]:
-        messages_json = []
-        async with client_session.get(url) as response:
+            self, client_session, url, linter_name
+    ) -> List[Any]:
+        # Every linter's comments are on the same pages.
+        return await self._share_request(
+            ('messages', url), self._fetch_all_messages, client_session, url)
+
+    async def _fetch_all_messages(self, client_session, url) -> List[Any]:
+        first_page, link = await self._fetch_message_page(client_session, url)
+        # Later pages are added to a new list, so the cached first page is
+        # left as it is.
+        messages_json = list(first_page)
+        next_url = self._find_link_url(link, 'next')
+        last_url = self._find_link_url(link, 'last')
+
+        page_urls = self._get_page_urls(next_url, last_url)
+        if page_urls and self.fetch_concurrency > 1:
+            semaphore = asyncio.Semaphore(self.fetch_concurrency)
+
+            async def fetch_page(page_url: str) -> List[Any]:
+                async with semaphore:
+                    messages, _ = await self._fetch_message_page(
+                        client_session, page_url)
+                    return messages
+
+            for messages in await asyncio.gather(
+                    *[fetch_page(page_url) for page_url in page_urls]):
+                messages_json.extend(messages)
+        else:
+            while next_url:
+                messages, link = await self._fetch_message_page(
+                    client_session, next_url)
+                messages_json.extend(messages)
+                next_url = self._find_link_url(link, 'next')
+
+        return messages_json
+
+    async def _fetch_message_page(
+            self, client_session, url
+    ) -> Tuple[List[Any], Optional[str]]:
+        """Fetch one page of messages, returning it with its Link header.
+
+        With a cache, the request is made conditional on the cached ETag and
+        the cached page is reused when GitHub answers 304 Not Modified.
+        """
+        cached = self.cache.get_messages(url) if self.cache else None
+        kwargs = {}  # type: Dict[str, Any]
+        if cached:
+            kwargs['headers'] = {'If-None-Match': cached.etag}
+        async with client_session.get(url, **kwargs) as response:
             response = response  # type: aiohttp.ClientResponse
+            if cached and response.status == 304:
+                return cached.messages, cached.link
             messages = json.loads(await response.text())
-            messages_json += messages
-            next_url = GithubReporter._find_next_url(response)
+            link = response.headers.get('link')
+            etag = response.headers.get('ETag')
+        if self.cache and etag:
+            self.cache.set_messages(url, etag, link, messages)
+        return messages, link
 
-        if next_url:
-            messages_json += await GithubReporter._fetch_message_json_from_url(
-                client_session, next_url, linter_name)
+    @staticmethod
+    def _find_link_url(link_header: Optional[str],
+                       rel: str) -> Optional[str]:
+        if link_header:
+            for link in link_header.split(','):
+                match = LINK_REGEX.match(link.strip())
+                if match and match.group('rel') == rel:
+                    return match.group('url')
+        return None
 
-        return messages_json
+    @staticmethod
+    def _get_page_urls(next_url: Optional[str],
+                       last_url: Optional[str]) -> List[str]:
+        """Expand the next and last page links into every remaining page URL.
+
+        Returns an empty list when the links don't use numbered pages.
+        """
+        if not next_url or not last_url:
+            return []
+        next_page = GithubReporter._get_page_number(next_url)
+        last_page = GithubReporter._get_page_number(last_url)
+        if next_page is None or last_page is None:
+            return []
+
+        split_url = urllib.parse.urlsplit(next_url)
+        query = urllib.parse.parse_qsl(split_url.query)
+        page_urls = []
+        for page in range(next_page, last_page + 1):
+            page_query = [(key, str(page) if key == 'page' else value)
+                          for key, value in query]
+            page_urls.append(urllib.parse.urlunsplit(split_url._replace(
+                query=urllib.parse.urlencode(page_query))))
+        return page_urls
 
     @staticmethod
-    def _find_next_url(response: aiohttp.ClientResponse) -> str:
-        if 'link' in response.headers:
-            links = response.headers['link'].split(',')
-            for link in links:
-                match = LINK_REGEX.match(link)
-                if match and match.group('rel') == 'next':
-                    return match.group('url')
+    def _get_page_number(url: str) -> Optional[int]:
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+        pages = query.get('page')
+        if pages and pages[0].isdigit():
+            return int(pages[0])
+        return None
 
     @staticmethod
     def _is_linter_message(text: str, linter_name: str) -> bool:
         return text.startswith(f'{linter_name} says:')
 
 
+class _SessionUse:
+    """A report's use of its reporter's client session, as an async context
+    manager."""
+
+    def __init__(self, reporter: GithubReporter) -> None:
+        self.reporter = reporter
+
+    async def __aenter__(self) -> 'aiohttp.ClientSession':
+        return await self.reporter._join_session()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.reporter._leave_session()
+
+
 def register_arguments(parser: argparse.ArgumentParser) -> None:
     parser.add_argument('--pr_url',
                         type=str,
@@ -327,6 +559,31 @@ def register_arguments(parser: argparse.ArgumentParser) -> None:
     parser.add_argument('--commit',
                         type=str,
                         help='The commit being linted.')
+    parser.add_argument('--fetch_concurrency',
+                        type=int,
+                        default=DEFAULT_FETCH_CONCURRENCY,
+                        help='How many pages of existing comments to fetch '
+                             'from GitHub at once. 1 fetches them one at a '
+                             'time.')
+    parser.add_argument('--request_concurrency',
+                        type=int,
+                        default=DEFAULT_REQUEST_CONCURRENCY,
+                        help='How many comments to post or delete at once.')
+    parser.add_argument('--batch_review',
+                        default=False,
+                        action='store_true',
+                        help='Post all inline comments as a single pull '
+                             'request review.')
+    parser.add_argument('--github_cache_dir',
+                        type=str,
+                        default=None,
+                        help='Directory used to cache PR diffs and comments '
+                             'between runs. May be shared by concurrent '
+                             'runs.')
+    parser.add_argument('--github_cache_max_size',
+                        type=int,
+                        default=DEFAULT_MAX_CACHE_SIZE,
+                        help='Maximum size of the cache directory in bytes.')
 
 
 def create_reporter(args: Any) -> GithubReporter:
@@ -337,6 +594,9 @@ def create_reporter(args: Any) -> GithubReporter:
     if not auth_token:
         raise Exception('Environment Variable $GITHUB_AUTH_TOKEN must be set '
                         'to use the github reporter.')
+    cache = None
+    if args.github_cache_dir:
+        cache = GithubCache(args.github_cache_dir, args.github_cache_max_size)
     match = PR_URL_REGEX.match(args.pr_url)
     if match:
         groups = match.groupdict()
@@ -345,7 +605,11 @@ def create_reporter(args: Any) -> GithubReporter:
                               groups['repo'],
                               int(groups['pr_number']),
                               args.commit,
-                              args.delete_previous_comments)
+                              args.delete_previous_comments,
+                              args.fetch_concurrency,
+                              args.request_concurrency,
+                              args.batch_review,
+                              cache)
     else:
         raise Exception("{} doesn't appear to be a valid github pr url".format(
             args.pr_url
@@ -0,0 +1,183 @@
+import re
+import struct
+from array import array
+from bisect import bisect_right
+from typing import (AsyncIterable, AsyncIterator, Dict, Iterator, Optional,
+                    Tuple)
+
+HUNK_REGEX = re.compile(rb'@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@')
+FILE_START_PREFIX = b'+++ b/'
+NEW_FILE_SECTION_START = b'diff --git a'
+POSITION_MAP_MAGIC = b'LFPM1'
+
+
+class FilePositionMap:
+    """Maps line numbers in the new version of a file to diff positions.
+
+    Consecutive context and added lines map to consecutive positions, so they
+    are stored as runs of ``(first line, first position, length)`` rather than
+    one entry per line.
+    """
+    __slots__ = ('_lines', '_positions', '_lengths')
+
+    def __init__(self) -> None:
+        self._lines = array('i')
+        self._positions = array('i')
+        self._lengths = array('i')
+
+    def add(self, line: int, position: int) -> None:
+        # Diffs list hunks in line order, so runs are appended already sorted.
+        if self._lines:
+            length = self._lengths[-1]
+            next_line = self._lines[-1] + length
+            next_position = self._positions[-1] + length
+            if (line, position) == (next_line, next_position):
+                self._lengths[-1] = length + 1
+                return
+        self._lines.append(line)
+        self._positions.append(position)
+        self._lengths.append(1)
+
+    def get(self, line: int, default: Optional[int] = None) -> Optional[int]:
+        index = bisect_right(self._lines, line) - 1
+        if index >= 0:
+            offset = line - self._lines[index]
+            if offset < self._lengths[index]:
+                return self._positions[index] + offset
+        return default
+
+    def nearest(self, line: int) -> Optional[Tuple[int, int]]:
+        """Return ``(closest line, position)`` for the mapped line nearest
+        to ``line``, preferring the lower line on a tie."""
+        index = bisect_right(self._lines, line) - 1
+        best = None  # type: Optional[Tuple[int, int]]
+        if index >= 0:
+            first_line = self._lines[index]
+            closest = min(line, first_line + self._lengths[index] - 1)
+            best = closest, self._positions[index] + closest - first_line
+        if index + 1 < len(self._lines):
+            next_line = self._lines[index + 1]
+            if best is None or next_line - line < line - best[0]:
+                best = next_line, self._positions[index + 1]
+        return best
+
+    def keys(self) -> Iterator[int]:
+        for line, length in zip(self._lines, self._lengths):
+            yield from range(line, line + length)
+
+    def __getitem__(self, line: int) -> int:
+        position = self.get(line)
+        if position is None:
+            raise KeyError(line)
+        return position
+
+    def __contains__(self, line: int) -> bool:
+        return self.get(line) is not None
+
+    def __len__(self) -> int:
+        return sum(self._lengths)
+
+
+async def _iter_chunk_lines(
+    chunks: AsyncIterable[bytes]
+) -> AsyncIterator[bytes]:
+    pending = bytearray()
+    async for chunk in chunks:
+        lines = chunk.split(b'\n')
+        if len(lines) == 1:
+            pending += chunk
+            continue
+        pending += lines[0]
+        yield bytes(pending)
+        for line in lines[1:-1]:
+            yield line
+        pending = bytearray(lines[-1])
+    if pending:
+        yield bytes(pending)
+
+
+async def create_position_map(
+    chunks: AsyncIterable[bytes]
+) -> Dict[str, FilePositionMap]:
+    """Build a per-file position map from a unified diff.
+
+    ``chunks`` is the raw diff as arbitrarily sized byte chunks; it is parsed
+    as it arrives and never joined into a single buffer.
+    """
+    result = {}  # type: Dict[str, FilePositionMap]
+    file_map = None  # type: Optional[FilePositionMap]
+    current_file = ''
+    position = -1
+    right_line_number = -1
+
+    async for line in _iter_chunk_lines(chunks):
+        if line.startswith(FILE_START_PREFIX):
+            current_file = line[len(FILE_START_PREFIX):].decode().strip()
+            file_map = None
+            right_line_number = -1
+            position = -1
+        elif line.startswith(NEW_FILE_SECTION_START):
+            current_file = ''
+        elif current_file:
+            position += 1
+            hunk_match = line.startswith(b'@@') and HUNK_REGEX.match(line)
+            if hunk_match:
+                right_line_number = int(hunk_match.group(1)) - 1
+            elif not line.startswith((b'-', b'\\')):
+                right_line_number += 1
+                if file_map is None:
+                    file_map = result.setdefault(current_file,
+                                                 FilePositionMap())
+                file_map.add(right_line_number, position)
+
+    return result
+
+
+def dump_position_map(position_map: Dict[str, FilePositionMap]) -> bytes:
+    """Serialize a position map to a compact binary form.
+
+    The runs are written as raw native ``array`` data, so the result is only
+    meant to be read back on the same host, e.g. from a local cache.
+    """
+    result = bytearray(POSITION_MAP_MAGIC)
+    result += struct.pack('=I', len(position_map))
+    for path, file_map in position_map.items():
+        encoded_path = path.encode()
+        result += struct.pack('=II', len(encoded_path), len(file_map._lines))
+        result += encoded_path
+        result += file_map._lines.tobytes()
+        result += file_map._positions.tobytes()
+        result += file_map._lengths.tobytes()
+    return bytes(result)
+
+
+def load_position_map(data: bytes) -> Dict[str, FilePositionMap]:
+    """Read a position map written by ``dump_position_map``.
+
+    Raises ``ValueError`` if ``data`` is not a valid position map.
+    """
+    if not data.startswith(POSITION_MAP_MAGIC):
+        raise ValueError('Not a position map')
+    view = memoryview(data)
+    offset = len(POSITION_MAP_MAGIC)
+    try:
+        file_count, = struct.unpack_from('=I', view, offset)
+        offset += 4
+        result = {}  # type: Dict[str, FilePositionMap]
+        for _ in range(file_count):
+            path_length, run_count = struct.unpack_from('=II', view, offset)
+            offset += 8
+            path = bytes(view[offset:offset + path_length]).decode()
+            offset += path_length
+            file_map = FilePositionMap()
+            for runs in (file_map._lines, file_map._positions,
+                         file_map._lengths):
+                size = run_count * runs.itemsize
+                if offset + size > len(view):
+                    raise ValueError('Truncated position map')
+                runs.frombytes(view[offset:offset + size])
+                offset += size
+            result[path] = file_map
+    except struct.error as e:
+        raise ValueError('Truncated position map') from e
+    return result
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
+
+if TYPE_CHECKING:
+    import aiohttp  # noqa
+
+DEFAULT_REQUEST_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+MAX_RETRY_DELAY = 60.0
+THROTTLED_STATUSES = (403, 429)
+
+
+class RequestScheduler:
+    """Runs GitHub requests through a bounded pool and backs off when
+    GitHub reports that we are being rate limited.
+
+    A throttled response pauses every request going through the scheduler,
+    not just the one that was throttled, since GitHub's limits apply to the
+    token as a whole.
+    """
+
+    def __init__(self,
+                 concurrency: int = DEFAULT_REQUEST_CONCURRENCY,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF) -> None:
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max(concurrency, 1))
+        self._resume_at = 0.0
+
+    async def request(self,
+                      method: Callable[..., Awaitable['aiohttp.ClientResponse']],
+                      url: str,
+                      **kwargs: Any) -> 'aiohttp.ClientResponse':
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                await self._wait_for_rate_limit()
+                response = await method(url, **kwargs)
+                delay = self._get_retry_delay(response, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    self._pause(self._get_reset_delay(response))
+                    return response
+                response.close()
+                self._pause(delay)
+            attempt += 1
+
+    async def _wait_for_rate_limit(self) -> None:
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _pause(self, delay: Optional[float]) -> None:
+        if delay is not None:
+            self._resume_at = max(self._resume_at,
+                                  time.monotonic() + min(delay,
+                                                         MAX_RETRY_DELAY))
+
+    def _get_retry_delay(self, response: 'aiohttp.ClientResponse',
+                         attempt: int) -> Optional[float]:
+        if response.status not in THROTTLED_STATUSES:
+            return None
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        reset_delay = self._get_reset_delay(response)
+        if reset_delay is not None:
+            return reset_delay
+        if response.status == 403:
+            # A plain 403 is a permissions problem, not a rate limit.
+            return None
+        return self.backoff * 2 ** attempt
+
+    @staticmethod
+    def _get_reset_delay(
+            response: 'aiohttp.ClientResponse') -> Optional[float]:
+        if response.headers.get('X-RateLimit-Remaining') != '0':
+            return None
+        try:
+            reset = float(response.headers['X-RateLimit-Reset'])
+        except (KeyError, ValueError):
+            return None
+        return max(reset - time.time(), 0.0)
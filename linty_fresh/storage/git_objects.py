@@ -0,0 +1,572 @@
+"""Minimal pure-Python access to a git object database.
+
+This covers just enough of git to read and append notes without spawning
+``git``: loose objects, version 2 pack indexes with offset and reference
+deltas, loose and packed refs, alternates and linked worktrees. Anything
+outside of that raises ``GitObjectError`` so callers can fall back to the
+``git`` binary.
+"""
+import datetime
+import glob
+import hashlib
+import heapq
+import mmap
+import os
+import re
+import struct
+import tempfile
+import time
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple  # noqa
+
+OBJ_COMMIT = 1
+OBJ_TREE = 2
+OBJ_BLOB = 3
+OBJ_TAG = 4
+OBJ_OFS_DELTA = 6
+OBJ_REF_DELTA = 7
+TYPE_NAMES = {
+    OBJ_COMMIT: b'commit',
+    OBJ_TREE: b'tree',
+    OBJ_BLOB: b'blob',
+    OBJ_TAG: b'tag',
+}
+TYPES_BY_NAME = {name: object_type
+                 for object_type, name in TYPE_NAMES.items()}
+PACK_INDEX_MAGIC = b'\377tOc'
+TREE_MODE = b'40000'
+BLOB_MODE = b'100644'
+NOTES_APPEND_MESSAGE = b"Notes added by 'git notes append'\n"
+SHA_REGEX = re.compile(r'^[0-9a-f]{40}$')
+CONFIG_SECTION_REGEX = re.compile(
+    r'^\s*\[\s*([\w.-]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]\s*(.*)$')
+CONFIG_VALUE_REGEX = re.compile(r'^\s*([A-Za-z][\w-]*)\s*(?:=\s*(.*?))?\s*$')
+
+TreeEntry = NamedTuple('TreeEntry', [
+    ('mode', bytes),
+    ('name', bytes),
+    ('sha', str),
+])
+Commit = NamedTuple('Commit', [
+    ('tree', str),
+    ('parents', List[str]),
+    ('timestamp', int),
+])
+
+
+class GitObjectError(Exception):
+    pass
+
+
+def strip_space(message: bytes) -> bytes:
+    """Normalise a message the way ``git stripspace`` does: trailing
+    whitespace and leading/trailing blank lines removed, runs of blank lines
+    collapsed and a final newline added."""
+    lines = []  # type: List[bytes]
+    blank = False
+    for line in message.split(b'\n'):
+        line = line.rstrip()
+        if not line:
+            blank = bool(lines)
+            continue
+        if blank:
+            lines.append(b'')
+            blank = False
+        lines.append(line)
+    return b''.join(line + b'\n' for line in lines)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    def read_size(offset: int) -> Tuple[int, int]:
+        size = 0
+        shift = 0
+        while True:
+            byte = delta[offset]
+            offset += 1
+            size |= (byte & 0x7f) << shift
+            shift += 7
+            if not byte & 0x80:
+                return size, offset
+
+    base_size, offset = read_size(0)
+    result_size, offset = read_size(offset)
+    if base_size != len(base):
+        raise GitObjectError('Delta base size mismatch')
+    result = bytearray()
+    while offset < len(delta):
+        opcode = delta[offset]
+        offset += 1
+        if opcode & 0x80:
+            copy_offset = 0
+            copy_size = 0
+            for i in range(4):
+                if opcode & (1 << i):
+                    copy_offset |= delta[offset] << (8 * i)
+                    offset += 1
+            for i in range(3):
+                if opcode & (0x10 << i):
+                    copy_size |= delta[offset] << (8 * i)
+                    offset += 1
+            result += base[copy_offset:copy_offset + (copy_size or 0x10000)]
+        elif opcode:
+            result += delta[offset:offset + opcode]
+            offset += opcode
+        else:
+            raise GitObjectError('Invalid delta opcode')
+    if len(result) != result_size:
+        raise GitObjectError('Delta result size mismatch')
+    return bytes(result)
+
+
+class PackFile:
+    def __init__(self, index_path: str) -> None:
+        with open(index_path, 'rb') as index_file:
+            self._index = mmap.mmap(index_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+        with open(index_path[:-len('.idx')] + '.pack', 'rb') as pack_file:
+            self._pack = mmap.mmap(pack_file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        version = struct.unpack_from('>I', self._index, 4)[0]
+        if self._index[:4] != PACK_INDEX_MAGIC or version != 2:
+            raise GitObjectError(f'Unsupported pack index {index_path}')
+        count = struct.unpack_from('>I', self._index, 8 + 255 * 4)[0]
+        self._shas_offset = 8 + 256 * 4
+        self._offsets_offset = self._shas_offset + count * 24
+        self._large_offsets_offset = self._offsets_offset + count * 4
+
+    def find(self, sha: bytes) -> Optional[int]:
+        """Return the offset of ``sha`` in the pack, if it is there."""
+        first = sha[0]
+        low = 0
+        if first:
+            low = struct.unpack_from('>I', self._index, 4 + first * 4)[0]
+        high = struct.unpack_from('>I', self._index, 8 + first * 4)[0]
+        while low < high:
+            middle = (low + high) // 2
+            start = self._shas_offset + middle * 20
+            candidate = self._index[start:start + 20]
+            if candidate < sha:
+                low = middle + 1
+            elif candidate > sha:
+                high = middle
+            else:
+                offset = struct.unpack_from(
+                    '>I', self._index, self._offsets_offset + middle * 4)[0]
+                if offset & 0x80000000:
+                    large_index = offset & 0x7fffffff
+                    offset = struct.unpack_from(
+                        '>Q', self._index,
+                        self._large_offsets_offset + large_index * 8)[0]
+                return offset
+        return None
+
+    def read(self, offset: int,
+             repository: 'GitRepository') -> Tuple[int, bytes]:
+        pack = self._pack
+        entry_offset = offset
+        byte = pack[offset]
+        object_type = (byte >> 4) & 7
+        offset += 1
+        # Skip the inflated size; inflating until the end of the zlib
+        # stream doesn't need it.
+        while byte & 0x80:
+            byte = pack[offset]
+            offset += 1
+
+        if object_type == OBJ_OFS_DELTA:
+            byte = pack[offset]
+            offset += 1
+            distance = byte & 0x7f
+            while byte & 0x80:
+                byte = pack[offset]
+                offset += 1
+                distance = ((distance + 1) << 7) | (byte & 0x7f)
+            base_type, base = self.read(entry_offset - distance, repository)
+            return base_type, apply_delta(base, self._inflate(offset))
+        if object_type == OBJ_REF_DELTA:
+            base_type, base = repository.read_object(
+                pack[offset:offset + 20].hex())
+            return base_type, apply_delta(base, self._inflate(offset + 20))
+        if object_type not in TYPE_NAMES:
+            raise GitObjectError(f'Unknown pack object type {object_type}')
+        return object_type, self._inflate(offset)
+
+    def _inflate(self, offset: int) -> bytes:
+        decompressor = zlib.decompressobj()
+        result = []
+        while not decompressor.eof:
+            chunk = self._pack[offset:offset + 65536]
+            if not chunk:
+                raise GitObjectError('Truncated pack')
+            result.append(decompressor.decompress(chunk))
+            offset += 65536
+        return b''.join(result)
+
+
+class GitRepository:
+    def __init__(self, git_dir: str, common_dir: str) -> None:
+        self.git_dir = git_dir
+        self.common_dir = common_dir
+        self.config = self._read_config()
+        if self.config.get('extensions.objectformat', 'sha1') != 'sha1':
+            raise GitObjectError('Only sha1 repositories are supported')
+        self.object_dirs = self._find_object_dirs()
+        self._packs = None  # type: Optional[List[PackFile]]
+
+    @staticmethod
+    def discover(path: str = '.') -> 'GitRepository':
+        path = os.path.abspath(path)
+        while True:
+            dot_git = os.path.join(path, '.git')
+            if os.path.isdir(dot_git):
+                git_dir = dot_git
+                break
+            if os.path.isfile(dot_git):
+                with open(dot_git) as dot_git_file:
+                    content = dot_git_file.read().strip()
+                if not content.startswith('gitdir:'):
+                    raise GitObjectError(f'Unrecognised {dot_git}')
+                git_dir = os.path.join(path, content[len('gitdir:'):].strip())
+                break
+            parent = os.path.dirname(path)
+            if parent == path:
+                raise GitObjectError('Not a git repository')
+            path = parent
+
+        common_dir = git_dir
+        commondir_path = os.path.join(git_dir, 'commondir')
+        if os.path.isfile(commondir_path):
+            with open(commondir_path) as commondir_file:
+                common_dir = os.path.join(git_dir,
+                                          commondir_file.read().strip())
+        return GitRepository(os.path.normpath(git_dir),
+                             os.path.normpath(common_dir))
+
+    def read_object(self, sha: str) -> Tuple[int, bytes]:
+        for object_dir in self.object_dirs:
+            path = os.path.join(object_dir, sha[:2], sha[2:])
+            try:
+                with open(path, 'rb') as object_file:
+                    raw = zlib.decompress(object_file.read())
+            except FileNotFoundError:
+                continue
+            except (OSError, zlib.error) as e:
+                raise GitObjectError(f'Unreadable object {sha}') from e
+            header, _, data = raw.partition(b'\0')
+            type_name, _, _ = header.partition(b' ')
+            if type_name not in TYPES_BY_NAME:
+                raise GitObjectError(f'Unknown object type for {sha}')
+            return TYPES_BY_NAME[type_name], data
+
+        binary_sha = bytes.fromhex(sha)
+        for pack in self._get_packs():
+            offset = pack.find(binary_sha)
+            if offset is not None:
+                return pack.read(offset, self)
+        raise GitObjectError(f'Missing object {sha}')
+
+    def write_object(self, object_type: int, data: bytes) -> str:
+        raw = b'%s %d\0%s' % (TYPE_NAMES[object_type], len(data), data)
+        sha = hashlib.sha1(raw).hexdigest()
+        directory = os.path.join(self.object_dirs[0], sha[:2])
+        path = os.path.join(directory, sha[2:])
+        if os.path.exists(path):
+            return sha
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='tmp_obj_')
+        try:
+            with os.fdopen(fd, 'wb') as object_file:
+                object_file.write(zlib.compress(raw))
+            os.chmod(temp_path, 0o444)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        return sha
+
+    def read_commit(self, sha: str) -> Commit:
+        object_type, data = self.read_object(sha)
+        if object_type != OBJ_COMMIT:
+            raise GitObjectError(f'{sha} is not a commit')
+        tree = ''
+        parents = []
+        timestamp = 0
+        for line in data.split(b'\n\n', 1)[0].split(b'\n'):
+            key, _, value = line.partition(b' ')
+            if key == b'tree':
+                tree = value.decode()
+            elif key == b'parent':
+                parents.append(value.decode())
+            elif key == b'committer':
+                timestamp = int(value.rsplit(b' ', 2)[-2])
+        return Commit(tree, parents, timestamp)
+
+    def read_tree(self, sha: str) -> List[TreeEntry]:
+        object_type, data = self.read_object(sha)
+        if object_type != OBJ_TREE:
+            raise GitObjectError(f'{sha} is not a tree')
+        entries = []
+        offset = 0
+        while offset < len(data):
+            space = data.index(b' ', offset)
+            null = data.index(b'\0', space)
+            entries.append(TreeEntry(data[offset:space],
+                                     data[space + 1:null],
+                                     data[null + 1:null + 21].hex()))
+            offset = null + 21
+        return entries
+
+    def write_tree(self, entries: List[TreeEntry]) -> str:
+        def sort_key(entry: TreeEntry) -> bytes:
+            return entry.name + (b'/' if entry.mode == TREE_MODE else b'')
+
+        return self.write_object(OBJ_TREE, b''.join(
+            b'%s %s\0%s' % (entry.mode, entry.name, bytes.fromhex(entry.sha))
+            for entry in sorted(entries, key=sort_key)))
+
+    def read_path(self, commit: str, path: str) -> Optional[bytes]:
+        """Return the content of the file at ``path`` in ``commit``, or
+        ``None`` if there is no such file."""
+        sha = self.read_commit(commit).tree
+        mode = TREE_MODE
+        for name in path.encode().split(b'/'):
+            if mode != TREE_MODE:
+                return None
+            for entry in self.read_tree(sha):
+                if entry.name == name:
+                    mode, sha = entry.mode, entry.sha
+                    break
+            else:
+                return None
+        object_type, data = self.read_object(sha)
+        if object_type != OBJ_BLOB:
+            return None
+        return data
+
+    def resolve_ref(self, name: str) -> Optional[str]:
+        for _ in range(5):
+            base_dir = self.git_dir if name == 'HEAD' else self.common_dir
+            try:
+                with open(os.path.join(base_dir, name)) as ref_file:
+                    value = ref_file.read().strip()
+            except FileNotFoundError:
+                return self._read_packed_refs().get(name)
+            if value.startswith('ref:'):
+                name = value[len('ref:'):].strip()
+            elif SHA_REGEX.match(value):
+                return value
+            else:
+                raise GitObjectError(f'Unrecognised ref {name}')
+        raise GitObjectError(f'Symbolic ref loop at {name}')
+
+    def update_ref(self, name: str, new_sha: str,
+                   old_sha: Optional[str]) -> None:
+        """Point ``name`` at ``new_sha`` if it still points at ``old_sha``,
+        using git's lock file protocol."""
+        path = os.path.join(self.common_dir, name)
+        lock_path = path + '.lock'
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                         0o666)
+        except FileExistsError as e:
+            raise GitObjectError(f'{name} is locked') from e
+        try:
+            with os.fdopen(fd, 'w') as lock_file:
+                if self.resolve_ref(name) != old_sha:
+                    raise GitObjectError(f'{name} was updated concurrently')
+                lock_file.write(new_sha + '\n')
+            os.replace(lock_path, path)
+        except BaseException:
+            os.remove(lock_path)
+            raise
+
+    def log(self, skip: int, count: int, start: str = 'HEAD') -> List[str]:
+        """Commits reachable from ``start`` newest first, like
+        ``git log --skip=<skip> -<count> --pretty=%H``."""
+        head = self.resolve_ref(start)
+        if not head:
+            return []
+        result = []  # type: List[str]
+        order = 0
+        queue = [(-self.read_commit(head).timestamp, order, head)]
+        seen = {head}
+        while queue and len(result) < skip + count:
+            _, _, sha = heapq.heappop(queue)
+            result.append(sha)
+            for parent in self.read_commit(sha).parents:
+                if parent in seen:
+                    continue
+                seen.add(parent)
+                try:
+                    timestamp = self.read_commit(parent).timestamp
+                except GitObjectError:
+                    # Parents of a shallow clone's boundary are missing.
+                    continue
+                order += 1
+                heapq.heappush(queue, (-timestamp, order, parent))
+        return result[skip:]
+
+    def find_note(self, notes_ref: str, sha: str) -> Optional[str]:
+        notes_commit = self.resolve_ref(notes_ref)
+        if not notes_commit:
+            return None
+        return self._find_note_in_tree(self.read_commit(notes_commit).tree,
+                                       sha)
+
+    def append_note(self, notes_ref: str, sha: str, message: bytes) -> None:
+        """Append ``message`` to the note on ``sha``, producing the same
+        note content as ``git notes append -F``."""
+        identity = self._get_identity()
+        old_commit = self.resolve_ref(notes_ref)
+        old_tree = self.read_commit(old_commit).tree if old_commit else None
+
+        content = strip_space(message)
+        existing = (self._find_note_in_tree(old_tree, sha)
+                    if old_tree else None)
+        if existing:
+            old_content = self.read_object(existing)[1]
+            if old_content and content:
+                content = old_content + b'\n' + content
+            else:
+                content = old_content or content
+        blob = self.write_object(OBJ_BLOB, content)
+        tree = self._set_tree_note(old_tree, sha, blob)
+
+        commit = [b'tree %s\n' % tree.encode()]
+        if old_commit:
+            commit.append(b'parent %s\n' % old_commit.encode())
+        commit.append(b'author %s\n' % identity)
+        commit.append(b'committer %s\n' % identity)
+        commit.append(b'\n')
+        commit.append(NOTES_APPEND_MESSAGE)
+        new_commit = self.write_object(OBJ_COMMIT, b''.join(commit))
+        self.update_ref(notes_ref, new_commit, old_commit)
+
+    def _find_note_in_tree(self, tree: str, sha: str) -> Optional[str]:
+        # Notes trees fan out into directories named after leading pairs of
+        # hex digits once they grow large.
+        for entry in self.read_tree(tree):
+            name = entry.name.decode()
+            if entry.mode == TREE_MODE:
+                if len(sha) > 2 and name == sha[:2]:
+                    return self._find_note_in_tree(entry.sha, sha[2:])
+            elif name == sha:
+                return entry.sha
+        return None
+
+    def _set_tree_note(self, tree: Optional[str], sha: str,
+                       blob: str) -> str:
+        entries = self.read_tree(tree) if tree else []
+        for index, entry in enumerate(entries):
+            if entry.mode == TREE_MODE and entry.name == sha[:2].encode():
+                entries[index] = entry._replace(
+                    sha=self._set_tree_note(entry.sha, sha[2:], blob))
+                return self.write_tree(entries)
+        entries = [entry for entry in entries
+                   if entry.name != sha.encode()]
+        entries.append(TreeEntry(BLOB_MODE, sha.encode(), blob))
+        return self.write_tree(entries)
+
+    def _get_identity(self) -> bytes:
+        config = dict(self._read_global_config())
+        config.update(self.config)
+        name = config.get('user.name')
+        email = config.get('user.email')
+        if not name or not email:
+            raise GitObjectError('No committer identity configured')
+        offset = datetime.datetime.now().astimezone().strftime('%z')
+        return '{} <{}> {} {}'.format(name, email, int(time.time()),
+                                      offset).encode()
+
+    def _get_packs(self) -> List[PackFile]:
+        if self._packs is None:
+            self._packs = []
+            for object_dir in self.object_dirs:
+                for index_path in sorted(glob.glob(
+                        os.path.join(object_dir, 'pack', '*.idx'))):
+                    self._packs.append(PackFile(index_path))
+        return self._packs
+
+    def _find_object_dirs(self) -> List[str]:
+        object_dirs = [os.path.join(self.common_dir, 'objects')]
+        index = 0
+        while index < len(object_dirs):
+            alternates = os.path.join(object_dirs[index], 'info',
+                                      'alternates')
+            if os.path.isfile(alternates):
+                with open(alternates) as alternates_file:
+                    for line in alternates_file:
+                        line = line.strip()
+                        if line and not line.startswith('#'):
+                            object_dirs.append(os.path.normpath(
+                                os.path.join(object_dirs[index], line)))
+            index += 1
+        return object_dirs
+
+    def _read_packed_refs(self) -> Dict[str, str]:
+        refs = {}  # type: Dict[str, str]
+        try:
+            with open(os.path.join(self.common_dir,
+                                   'packed-refs')) as packed_refs:
+                for line in packed_refs:
+                    if line.startswith(('#', '^')):
+                        continue
+                    fields = line.split()
+                    if len(fields) == 2:
+                        refs[fields[1]] = fields[0]
+        except FileNotFoundError:
+            pass
+        return refs
+
+    def _read_config(self) -> Dict[str, str]:
+        return read_config(os.path.join(self.common_dir, 'config'))
+
+    @staticmethod
+    def _read_global_config() -> Dict[str, str]:
+        config = {}  # type: Dict[str, str]
+        xdg_home = os.getenv('XDG_CONFIG_HOME') or os.path.join(
+            os.path.expanduser('~'), '.config')
+        for path in (os.path.join(xdg_home, 'git', 'config'),
+                     os.path.expanduser('~/.gitconfig')):
+            config.update(read_config(path))
+        return config
+
+
+def read_config(path: str) -> Dict[str, str]:
+    """Read the simple ``section.key = value`` entries of a git config file.
+
+    Includes, multi-valued keys and escape sequences are not supported; the
+    last value of a key wins.
+    """
+    config = {}  # type: Dict[str, str]
+    section = ''
+    try:
+        with open(path) as config_file:
+            lines = config_file.readlines()
+    except OSError:
+        return config
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped.startswith(('#', ';')):
+            continue
+        section_match = CONFIG_SECTION_REGEX.match(line)
+        if section_match:
+            name, subsection, line = section_match.groups()
+            section = name.lower()
+            if subsection is not None:
+                section += '.' + subsection
+            if not line.strip():
+                continue
+        value_match = CONFIG_VALUE_REGEX.match(line.split('#')[0]
+                                               .split(';')[0])
+        if value_match and section:
+            key, value = value_match.groups()
+            value = 'true' if value is None else value
+            if len(value) >= 2 and value[0] == value[-1] == '"':
+                value = value[1:-1]
+            config[f'{section}.{key.lower()}'] = value
+    return config
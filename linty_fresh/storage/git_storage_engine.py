@@ -1,12 +1,42 @@
+import argparse
 import asyncio
-import json
+import collections
+import fcntl
+import os
 import tempfile
-from typing import Set
+import time
+from typing import (Dict, FrozenSet, Iterable, List, NamedTuple,  # noqa
+                    Optional, Set, Tuple)
 
 from linty_fresh.problem import Problem
+from linty_fresh.storage.note_format import (DEFAULT_NOTE_FORMAT,
+                                             NOTE_FORMAT_COMPRESSED,
+                                             NOTE_FORMATS, Delta, encode_delta,
+                                             encode_problems, parse_note)
+from linty_fresh.storage.storage_engine import (MAX_REVISIONS, StorageEngine,
+                                                get_git_dir,
+                                                get_last_revisions, read_files)
 
-MAX_REVISIONS = 10
+# Longest chain of delta notes written before a full snapshot is stored
+# again. Readers give up on deeper chains.
+MAX_DELTA_CHAIN = 8
 NOTES_REF = 'refs/notes/linty_fresh'
+# The remote notes are fetched here and merged into NOTES_REF.
+REMOTE_NOTES_REF = 'refs/notes/linty_fresh-remote'
+# cat_sort_uniq keeps every distinct line of both sides of a conflicting
+# note; each line of a note is read on its own.
+NOTES_MERGE_STRATEGY = 'cat_sort_uniq'
+MAX_PUSH_ATTEMPTS = 5
+# Number of parsed notes kept in memory, which saves long-running processes
+# such as linty_fresh_daemon reading and decompressing the same notes again.
+MAX_PARSED_NOTES = 256
+# Fetch bookkeeping lives in this directory inside the git directory.
+STATE_DIRECTORY = 'linty_fresh'
+FETCH_LOCK = 'notes_fetch.lock'
+FETCH_STAMP = 'notes_fetch'
+# Partial fetches go through this copy of the remote, which git records as a
+# promisor remote, so that fetches from the remote itself stay complete.
+PARTIAL_FETCH_REMOTE = 'linty_fresh-{}'
 GIT_SUBPROCESS_KWARGS = {
     'stdout': asyncio.subprocess.PIPE,
     'stderr': asyncio.subprocess.DEVNULL,
@@ -15,66 +45,389 @@ GIT_SUBPROCESS_KWARGS = {
     }
 }
 
+BaseNote = NamedTuple('BaseNote', [
+    ('revision', str),
+    ('note_ref', str),
+    ('problems', Set[Problem]),
+    ('depth', int),
+])
 
-class GitNotesStorageEngine:
-    def __init__(self, remote: str = None):
+
+_parsed_notes = collections.OrderedDict(
+)  # type: collections.OrderedDict[str, Tuple[FrozenSet[Problem], List[Delta]]]
+
+
+class GitNotesStorageEngine(StorageEngine):
+    """Stores problems as git notes on ``refs/notes/linty_fresh``, shared
+    through ``remote``. The problems of all linters share one note.
+
+    Existing problems come from the nearest of the ``max_revisions``
+    ancestors that has a note, searched from the merge base with
+    ``target_branch`` if one is given.
+    """
+
+    def __init__(self, remote: str = None,
+                 note_format: str = DEFAULT_NOTE_FORMAT,
+                 fetch_ttl: float = 0, partial_fetch: bool = False,
+                 max_revisions: int = MAX_REVISIONS,
+                 target_branch: Optional[str] = None):
         self.remote = remote
+        self.note_format = note_format
+        self.fetch_ttl = fetch_ttl
+        self.partial_fetch = partial_fetch
+        self.max_revisions = max_revisions
+        self.target_branch = target_branch
+        self._base_notes = {}  # type: Dict[Tuple[str, ...], Optional[BaseNote]]
+        self._notes_fetch = None  # type: Optional[asyncio.Future]
 
-    async def get_note_ref(self, last_n_revisions) -> None:
-        for line in last_n_revisions:
-            notes_ref_proc = await asyncio.create_subprocess_exec(
-                'git', 'notes', 'list', line.decode().strip(),
-                **GIT_SUBPROCESS_KWARGS)
-            await notes_ref_proc.wait()
-            if notes_ref_proc.returncode == 0:
-                note_ref = (
-                    await notes_ref_proc.stdout.readline()).decode().strip()
-                if note_ref:
-                    return note_ref
-
-    async def get_existing_problems(self) -> Set[Problem]:
-        note_ref = ''
-        result = set()
-        if self.remote:
-            fetch_notes = await asyncio.create_subprocess_exec(
-                'git', 'fetch', self.remote, '{0}:{0}'.format(NOTES_REF),
+    async def get_note_ref(self, revisions: List[str]) -> Optional[str]:
+        """Return the note attached to the first of ``revisions`` that has
+        one."""
+        annotated = await self.get_annotated_revision(revisions)
+        return annotated[1] if annotated else None
+
+    async def get_annotated_revision(
+            self, revisions: List[str]) -> Optional[Tuple[str, str]]:
+        """Return the first of ``revisions`` that has a note, and its note.
+
+        All notes are listed with a single ``git notes list`` and joined
+        against ``revisions`` in memory, instead of asking git about each
+        revision in turn.
+        """
+        wanted = set(revisions)
+        notes = {}  # type: Dict[str, str]
+        notes_proc = await asyncio.create_subprocess_exec(
+            'git', 'notes', 'list',
+            **GIT_SUBPROCESS_KWARGS)
+        async for line in notes_proc.stdout:
+            fields = line.decode().split()
+            if len(fields) == 2 and fields[1] in wanted:
+                notes[fields[1]] = fields[0]
+        await notes_proc.wait()
+        if notes_proc.returncode != 0:
+            return None
+        for revision in revisions:
+            if revision in notes:
+                return revision, notes[revision]
+        return None
+
+    async def get_existing_problems(
+            self, linter: Optional[str] = None) -> Set[Problem]:
+        await self._fetch_notes()
+        self._base_notes.clear()
+        base_note = await self._get_base_note()
+        if base_note:
+            return base_note.problems
+        return set()
+
+    async def get_existing_sources(
+            self, paths: Iterable[str],
+            linter: Optional[str] = None) -> Dict[str, Optional[bytes]]:
+        # Every linter's problems are in the same note.
+        base_note = await self._get_base_note()
+        if not base_note:
+            return {path: None for path in paths}
+        return await self._read_files(base_note.revision, paths)
+
+    async def store_linter_problems(
+            self,
+            problems_by_linter: Dict[Optional[str], Set[Problem]]) -> None:
+        problems = set()  # type: Set[Problem]
+        for linter_problems in problems_by_linter.values():
+            problems.update(linter_problems)
+        content = self._serialize_problems(problems)
+        # Deltas only hold Problems; others, such as TestProblems, are
+        # stored as JSON like encode_problems does.
+        if self.note_format == NOTE_FORMAT_COMPRESSED and all(
+                isinstance(problem, Problem) for problem in problems):
+            base_note = await self._get_base_note()
+            if base_note and base_note.depth < MAX_DELTA_CHAIN:
+                delta = encode_delta(base_note.note_ref,
+                                     problems - base_note.problems,
+                                     base_note.problems - problems)
+                # A delta against a note shared with other linters may
+                # remove more than the snapshot stores.
+                if len(delta) < len(content):
+                    content = delta
+        await self._append_note(content)
+        await self._push_notes()
+
+    async def compact_notes(self, max_chain: int) -> int:
+        """Rewrite every note whose delta chain is longer than ``max_chain``
+        as a full snapshot and return the number of notes rewritten."""
+        await self._fetch_notes()
+        notes_proc = await asyncio.create_subprocess_exec(
+            'git', 'notes', 'list',
+            **GIT_SUBPROCESS_KWARGS)
+        notes, _ = await notes_proc.communicate()
+
+        resolved = {}  # type: Dict[str, Tuple[Set[Problem], int]]
+        compacted = 0
+        for line in notes.decode().splitlines():
+            note_ref, revision = line.split()
+            problems, depth = await self._resolve_note(note_ref, resolved)
+            if depth > max_chain:
+                await self._replace_note(
+                    revision, encode_problems(problems, self.note_format))
+                compacted += 1
+        if compacted:
+            await self._push_notes()
+        return compacted
+
+    async def _get_base_note(self) -> Optional[BaseNote]:
+        """Return the nearest ancestor note, which is both the source of the
+        existing problems and the base for a delta note."""
+        revisions = await self._get_last_revisions()
+        key = tuple(revisions)
+        if key not in self._base_notes:
+            base_note = None
+            annotated = await self.get_annotated_revision(revisions)
+            if annotated:
+                revision, note_ref = annotated
+                problems, depth = await self._resolve_note(note_ref, {})
+                base_note = BaseNote(revision, note_ref, problems, depth)
+            self._base_notes[key] = base_note
+        return self._base_notes[key]
+
+    async def _resolve_note(
+            self, note_ref: str,
+            resolved: Dict[str, Tuple[Set[Problem], int]],
+            max_depth: int = MAX_DELTA_CHAIN) -> Tuple[Set[Problem], int]:
+        """Reconstruct the problems in a note, following its deltas back to
+        full snapshots, and return them with the length of the longest delta
+        chain. Deltas further than ``max_depth`` away from a snapshot are
+        skipped."""
+        if note_ref in resolved:
+            return resolved[note_ref]
+        problems, deltas = await self._parse_note(note_ref)
+        depth = 0
+        for delta in deltas:
+            if max_depth <= 0:
+                continue
+            base, base_depth = await self._resolve_note(delta.base, resolved,
+                                                        max_depth - 1)
+            problems.update((base - delta.removed) | delta.added)
+            depth = max(depth, base_depth + 1)
+        resolved[note_ref] = problems, depth
+        return problems, depth
+
+    async def _parse_note(
+            self, note_ref: str) -> Tuple[Set[Problem], List[Delta]]:
+        # Notes are content addressed, so a parsed note never goes stale.
+        if note_ref in _parsed_notes:
+            _parsed_notes.move_to_end(note_ref)
+            problems, deltas = _parsed_notes[note_ref]
+            return set(problems), deltas
+        content = await self._read_note_content(note_ref)
+        problems, deltas = parse_note(content.splitlines())
+        # An empty note may be a blob a partial fetch hasn't downloaded.
+        if content:
+            _parsed_notes[note_ref] = frozenset(problems), deltas
+            if len(_parsed_notes) > MAX_PARSED_NOTES:
+                _parsed_notes.popitem(last=False)
+        return problems, deltas
+
+    async def _fetch_notes(self) -> None:
+        """Update the local notes ref from the remote, once per engine.
+
+        The linters of a run all read the stored problems through one
+        engine, so they share a single fetch.
+        """
+        if self._notes_fetch is None:
+            self._notes_fetch = asyncio.ensure_future(
+                self._coalesce_fetch())
+        await asyncio.shield(self._notes_fetch)
+
+    async def _coalesce_fetch(self) -> None:
+        """Fetch the notes unless another process just did.
+
+        The fetch is skipped if one that started at most ``fetch_ttl``
+        seconds ago succeeded. Processes sharing a checkout take a lock
+        around the fetch, so while one of them fetches the others wait and
+        then reuse its result.
+        """
+        if not self.remote:
+            return
+        git_dir = await self._get_git_dir()
+        if not git_dir:
+            await self._run_fetch()
+            return
+        state_dir = os.path.join(git_dir, STATE_DIRECTORY)
+        stamp_path = os.path.join(state_dir, FETCH_STAMP)
+        fresh_after = time.time() - self.fetch_ttl
+        if self._read_fetch_stamp(stamp_path) >= fresh_after:
+            return
+        os.makedirs(state_dir, exist_ok=True)
+        with open(os.path.join(state_dir, FETCH_LOCK), 'a') as lock_file:
+            await asyncio.get_event_loop().run_in_executor(
+                None, fcntl.flock, lock_file.fileno(), fcntl.LOCK_EX)
+            if self._read_fetch_stamp(stamp_path) >= fresh_after:
+                return
+            started = time.time()
+            if await self._run_fetch():
+                self._write_fetch_stamp(stamp_path, started)
+
+    async def _run_fetch(self) -> bool:
+        args = ['git', 'fetch', self.remote,
+                '+{}:{}'.format(NOTES_REF, REMOTE_NOTES_REF)]
+        if self.partial_fetch:
+            # Servers that support partial clone only send the notes trees;
+            # git fetches the blobs of the notes that are read on demand.
+            # Other servers ignore the filter.
+            partial_remote = await self._get_partial_fetch_remote()
+            if partial_remote:
+                args[2:3] = ['--filter=blob:none', partial_remote]
+        fetch_notes = await asyncio.create_subprocess_exec(
+            *args,
+            **GIT_SUBPROCESS_KWARGS)
+        await fetch_notes.wait()
+        if fetch_notes.returncode != 0:
+            return False
+        # Notes written locally but not pushed yet survive the fetch.
+        merge_proc = await asyncio.create_subprocess_exec(
+            'git', 'notes', 'merge', '-q', '-s', NOTES_MERGE_STRATEGY,
+            REMOTE_NOTES_REF,
+            **GIT_SUBPROCESS_KWARGS)
+        await merge_proc.wait()
+        return merge_proc.returncode == 0
+
+    async def _get_partial_fetch_remote(self) -> Optional[str]:
+        """Return a remote with the URL of ``remote`` to fetch the notes
+        through.
+
+        A filtered fetch marks the remote it fetches from as a promisor
+        remote and makes its filter the default for later fetches. Keeping
+        that on a remote of our own leaves the user's remote untouched.
+        """
+        url_proc = await asyncio.create_subprocess_exec(
+            'git', 'remote', 'get-url', self.remote,
+            **GIT_SUBPROCESS_KWARGS)
+        url, _ = await url_proc.communicate()
+        if url_proc.returncode != 0:
+            return None
+        partial_remote = PARTIAL_FETCH_REMOTE.format(self.remote)
+        key = 'remote.{}.url'.format(partial_remote)
+        current_proc = await asyncio.create_subprocess_exec(
+            'git', 'config', '--get', key,
+            **GIT_SUBPROCESS_KWARGS)
+        current_url, _ = await current_proc.communicate()
+        if current_url != url:
+            for config in ((key, url.decode().strip()),
+                           ('remote.{}.skipFetchAll'.format(partial_remote),
+                            'true')):
+                config_proc = await asyncio.create_subprocess_exec(
+                    'git', 'config', *config,
+                    **GIT_SUBPROCESS_KWARGS)
+                await config_proc.wait()
+                if config_proc.returncode != 0:
+                    return None
+        return partial_remote
+
+    async def _get_git_dir(self) -> Optional[str]:
+        return await get_git_dir()
+
+    @staticmethod
+    def _read_fetch_stamp(stamp_path: str) -> float:
+        """Return when the last successful fetch started."""
+        try:
+            with open(stamp_path) as stamp_file:
+                return float(stamp_file.read())
+        except (OSError, ValueError):
+            return 0
+
+    @staticmethod
+    def _write_fetch_stamp(stamp_path: str, started: float) -> None:
+        temp_path = '{}.{}'.format(stamp_path, os.getpid())
+        try:
+            with open(temp_path, 'w') as stamp_file:
+                stamp_file.write(repr(started))
+            os.replace(temp_path, stamp_path)
+        except OSError:
+            pass
+
+    async def _push_notes(self) -> None:
+        """Push the notes, merging in notes that other jobs pushed first."""
+        if not self.remote:
+            return
+        for _ in range(MAX_PUSH_ATTEMPTS):
+            push_proc = await asyncio.create_subprocess_exec(
+                'git', 'push', '-q', self.remote, NOTES_REF,
                 **GIT_SUBPROCESS_KWARGS)
-            await fetch_notes.wait()
+            await push_proc.wait()
+            if push_proc.returncode == 0 or not await self._run_fetch():
+                return
 
-        last_n_revisions_proc = await asyncio.create_subprocess_exec(
-            'git', 'log', '--skip=1', f'-{MAX_REVISIONS}',
-            '--pretty=%H',
+    async def _get_last_revisions(self) -> List[str]:
+        return await get_last_revisions(self.max_revisions, self.target_branch)
+
+    async def _read_note_content(self, note_ref: str) -> bytes:
+        notes_proc = await asyncio.create_subprocess_exec(
+            'git', 'show', note_ref,
             **GIT_SUBPROCESS_KWARGS)
+        note, _ = await notes_proc.communicate()
+        if notes_proc.returncode != 0:
+            return b''
+        return note
 
-        note_ref = self.get_note_ref(last_n_revisions_proc.stdout)
+    async def _read_files(self, revision: str,
+                          paths: Iterable[str]) -> Dict[str, Optional[bytes]]:
+        return await read_files(revision, paths)
 
-        await last_n_revisions_proc.wait()
-        if note_ref:
+    async def _append_note(self, content: bytes) -> None:
+        with tempfile.NamedTemporaryFile() as problem_file:
+            problem_file.write(content)
+            problem_file.flush()
             notes_proc = await asyncio.create_subprocess_exec(
-                'git', 'show', note_ref,
+                'git', 'notes', 'append', '-F', problem_file.name,
                 **GIT_SUBPROCESS_KWARGS)
-            async for line in notes_proc.stdout:
-                try:
-                    problems = json.loads(line.decode())
-                    for problem in problems:
-                        result.add(Problem.from_json(problem))
-                except Exception:
-                    pass
             await notes_proc.wait()
-        return result
 
-    async def store_problems(self, problems: Set[Problem]) -> None:
+    async def _replace_note(self, revision: str, content: bytes) -> None:
         with tempfile.NamedTemporaryFile() as problem_file:
-            result = sorted([problem.to_json() for problem in problems],
-                            key=lambda x: str(x))
-            problem_file.write(json.dumps(result).encode())
+            problem_file.write(content)
             problem_file.flush()
             notes_proc = await asyncio.create_subprocess_exec(
-                'git', 'notes', 'append', '-F', problem_file.name,
+                'git', 'notes', 'add', '-f', '-F', problem_file.name,
+                revision,
                 **GIT_SUBPROCESS_KWARGS)
             await notes_proc.wait()
-            if self.remote:
-                push_proc = await asyncio.create_subprocess_exec(
-                    'git', 'push', '-f', '-q', self.remote, NOTES_REF,
-                    **GIT_SUBPROCESS_KWARGS)
-                await push_proc.wait()
+
+    def _serialize_problems(self, problems: Set[Problem]) -> bytes:
+        return encode_problems(problems, self.note_format)
+
+
+def register_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--in_process_git', default=False,
+                        action='store_true',
+                        help='Read and write stored problems directly from '
+                             'the git object database instead of running '
+                             'git for every step.')
+    parser.add_argument('--note_format', type=str,
+                        choices=NOTE_FORMATS, default=DEFAULT_NOTE_FORMAT,
+                        help='Format used when storing problems. compressed '
+                             'notes are smaller and only store what changed '
+                             'since the previous note, but versions of '
+                             'linty_fresh that predate it only read json.')
+    parser.add_argument('--notes_fetch_ttl', type=float, default=0,
+                        help='Skip fetching stored problems if a fetch from '
+                             'this checkout succeeded within this many '
+                             'seconds.')
+    parser.add_argument('--partial_notes_fetch', default=False,
+                        action='store_true',
+                        help='Fetch only the stored problems that are read, '
+                             'if the remote supports partial clone. The '
+                             'notes are fetched through a separate '
+                             '"linty_fresh-origin" remote.')
+
+
+def create_storage_engine(args: argparse.Namespace) -> GitNotesStorageEngine:
+    storage_engine_class = GitNotesStorageEngine
+    if args.in_process_git:
+        # Imported here as the in-process engine builds on this module.
+        from linty_fresh.storage.in_process_storage_engine import \
+            InProcessGitNotesStorageEngine
+        storage_engine_class = InProcessGitNotesStorageEngine
+    return storage_engine_class(
+        'origin', args.note_format, fetch_ttl=args.notes_fetch_ttl,
+        partial_fetch=args.partial_notes_fetch,
+        max_revisions=args.ancestor_depth, target_branch=args.target_branch)
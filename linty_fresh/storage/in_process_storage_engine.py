@@ -0,0 +1,82 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from linty_fresh.storage.git_objects import (OBJ_BLOB, GitObjectError,
+                                             GitRepository)
+from linty_fresh.storage.git_storage_engine import (NOTES_REF,
+                                                    GitNotesStorageEngine)
+
+
+class InProcessGitNotesStorageEngine(GitNotesStorageEngine):
+    """Reads and writes linty_fresh notes straight from the object database.
+
+    Only fetching and pushing notes still spawn ``git``. Whenever the
+    repository uses something ``git_objects`` doesn't understand, the
+    operation falls back to the ``git`` subprocess implementation. Notes
+    written by either engine are identical, so both can be used against the
+    same notes ref.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._repository = None  # type: Optional[GitRepository]
+
+    def _get_repository(self) -> GitRepository:
+        if self._repository is None:
+            self._repository = GitRepository.discover()
+        return self._repository
+
+    async def _get_git_dir(self) -> Optional[str]:
+        try:
+            return self._get_repository().common_dir
+        except (GitObjectError, OSError, ValueError):
+            return await super()._get_git_dir()
+
+    async def get_annotated_revision(
+            self, revisions: List[str]) -> Optional[Tuple[str, str]]:
+        try:
+            repository = self._get_repository()
+            for revision in revisions:
+                note_ref = repository.find_note(NOTES_REF, revision)
+                if note_ref:
+                    return revision, note_ref
+            return None
+        except (GitObjectError, OSError, ValueError):
+            return await super().get_annotated_revision(revisions)
+
+    async def _get_last_revisions(self) -> List[str]:
+        if self.target_branch:
+            # Merge bases are left to git.
+            return await super()._get_last_revisions()
+        try:
+            return self._get_repository().log(1, self.max_revisions)
+        except (GitObjectError, OSError, ValueError):
+            return await super()._get_last_revisions()
+
+    async def _read_note_content(self, note_ref: str) -> bytes:
+        try:
+            object_type, note = self._get_repository().read_object(note_ref)
+            if object_type != OBJ_BLOB:
+                raise GitObjectError(f'{note_ref} is not a blob')
+        except (GitObjectError, OSError, ValueError):
+            return await super()._read_note_content(note_ref)
+        return note
+
+    async def _read_files(self, revision: str,
+                          paths: Iterable[str]) -> Dict[str, Optional[bytes]]:
+        paths = list(paths)
+        try:
+            repository = self._get_repository()
+            return {path: repository.read_path(revision, path)
+                    for path in paths}
+        except (GitObjectError, OSError, ValueError):
+            return await super()._read_files(revision, paths)
+
+    async def _append_note(self, content: bytes) -> None:
+        try:
+            repository = self._get_repository()
+            head = repository.resolve_ref('HEAD')
+            if not head:
+                raise GitObjectError('HEAD does not point at a commit')
+            repository.append_note(NOTES_REF, head, content)
+        except (GitObjectError, OSError, ValueError):
+            await super()._append_note(content)
@@ -0,0 +1,118 @@
+"""Serialization of stored problems in git notes.
+
+Three formats can appear in a note, one per line:
+
+* ``json``: the original format, a JSON list of ``Problem.to_json`` dicts.
+* ``compressed``: ``linty_fresh:2:`` followed by base64 armoured, zlib
+  compressed JSON in which paths and messages are stored once in lookup
+  tables and each problem is three integers.
+* ``delta``: ``linty_fresh:delta:2:<base>:`` followed by the problems added
+  and removed relative to the note blob ``<base>``, encoded like
+  ``compressed``.
+
+Readers accept all of them, so notes written by older versions stay
+readable. Versions before ``compressed`` was added only read ``json``, which
+is still written by default while they may share the notes.
+"""
+import base64
+import json
+import zlib
+from typing import Any, Dict, Iterable, List, NamedTuple, Set, Tuple  # noqa
+
+from linty_fresh.problem import Problem
+
+NOTE_FORMAT_JSON = 'json'
+NOTE_FORMAT_COMPRESSED = 'compressed'
+NOTE_FORMATS = (NOTE_FORMAT_JSON, NOTE_FORMAT_COMPRESSED)
+# Older versions see no stored problems in compressed notes, so they are only
+# written when asked for until the next release.
+DEFAULT_NOTE_FORMAT = NOTE_FORMAT_JSON
+COMPRESSED_NOTE_PREFIX = b'linty_fresh:2:'
+DELTA_NOTE_PREFIX = b'linty_fresh:delta:2:'
+
+Delta = NamedTuple('Delta', [
+    ('base', str),
+    ('added', Set[Problem]),
+    ('removed', Set[Problem]),
+])
+
+
+def encode_problems(problems: Iterable[Any],
+                    note_format: str = DEFAULT_NOTE_FORMAT) -> bytes:
+    problems = list(problems)
+    if note_format == NOTE_FORMAT_JSON or not all(
+            isinstance(problem, Problem) for problem in problems):
+        result = sorted([problem.to_json() for problem in problems],
+                        key=lambda x: str(x))
+        return json.dumps(result).encode()
+
+    return COMPRESSED_NOTE_PREFIX + _compress(problems=problems)
+
+
+def encode_delta(base: str, added: Iterable[Problem],
+                 removed: Iterable[Problem]) -> bytes:
+    """Encode the change from the note blob ``base`` to a new problem set.
+
+    Only ``Problem`` instances can be encoded.
+    """
+    return b''.join([DELTA_NOTE_PREFIX, base.encode(), b':',
+                     _compress(added=added, removed=removed)])
+
+
+def decode_note(lines: Iterable[bytes]) -> Set[Problem]:
+    """Read the problems stored in full in the lines of a note."""
+    return parse_note(lines)[0]
+
+
+def parse_note(lines: Iterable[bytes]) -> Tuple[Set[Problem], List[Delta]]:
+    """Split the lines of a note into the problems stored in full and the
+    deltas that still need their base to be read. Lines that can't be parsed
+    are skipped."""
+    result = set()  # type: Set[Problem]
+    deltas = []  # type: List[Delta]
+    for line in lines:
+        try:
+            if line.startswith(DELTA_NOTE_PREFIX):
+                base, data = line[len(DELTA_NOTE_PREFIX):].split(b':', 1)
+                groups = _decompress(data)
+                deltas.append(Delta(base.decode(), set(groups['added']),
+                                    set(groups['removed'])))
+            elif line.startswith(COMPRESSED_NOTE_PREFIX):
+                result.update(_decompress(
+                    line[len(COMPRESSED_NOTE_PREFIX):])['problems'])
+            else:
+                for problem in json.loads(line.decode()):
+                    result.add(Problem.from_json(problem))
+        except Exception:
+            pass
+    return result, deltas
+
+
+def _compress(**groups: Iterable[Problem]) -> bytes:
+    paths = {}  # type: Dict[str, int]
+    messages = {}  # type: Dict[str, int]
+    payload = {}  # type: Dict[str, Any]
+    for name, problems in groups.items():
+        encoded = []  # type: List[int]
+        for problem in sorted(problems,
+                              key=lambda p: (p.path, p.line, p.message)):
+            encoded.append(paths.setdefault(problem.path, len(paths)))
+            encoded.append(problem.line)
+            encoded.append(messages.setdefault(problem.message,
+                                               len(messages)))
+        payload[name] = encoded
+    payload['paths'] = list(paths)
+    payload['messages'] = list(messages)
+    return base64.b64encode(zlib.compress(
+        json.dumps(payload, separators=(',', ':'), sort_keys=True).encode(),
+        9))
+
+
+def _decompress(data: bytes) -> Dict[str, List[Problem]]:
+    payload = json.loads(zlib.decompress(base64.b64decode(data)))
+    paths = payload.pop('paths')
+    messages = payload.pop('messages')
+    return {name: [Problem(paths[encoded[i]], encoded[i + 1],
+                           messages[encoded[i + 2]])
+                   for i in range(0, len(encoded), 3)]
+            for name, encoded in payload.items()}
@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import contextlib
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Set, Tuple  # noqa
+
+from linty_fresh.problem import Problem
+from linty_fresh.storage.storage_engine import (MAX_REVISIONS, StorageEngine,
+                                                get_git_dir, get_head,
+                                                get_last_revisions, read_files)
+
+DEFAULT_DATABASE_NAME = os.path.join('linty_fresh', 'problems.sqlite3')
+# Seconds to wait for another process's write transaction.
+DATABASE_TIMEOUT = 30
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    commit_sha TEXT NOT NULL,
+    linter TEXT NOT NULL,
+    PRIMARY KEY (commit_sha, linter)
+);
+CREATE TABLE IF NOT EXISTS problems (
+    commit_sha TEXT NOT NULL,
+    linter TEXT NOT NULL,
+    path TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS problems_by_commit
+    ON problems (commit_sha, linter, path);
+'''
+# The candidate revisions are joined against the runs that stored data, and
+# the problems of the nearest one are read through the index, all in one
+# query.
+NEAREST_PROBLEMS_QUERY = '''
+WITH candidates (commit_sha, distance) AS (VALUES {})
+SELECT problems.commit_sha, problems.path, problems.line, problems.message
+FROM problems
+WHERE problems.linter = ? AND problems.commit_sha = (
+    SELECT candidates.commit_sha
+    FROM candidates JOIN runs ON runs.commit_sha = candidates.commit_sha
+    WHERE runs.linter = ?
+    ORDER BY candidates.distance
+    LIMIT 1
+)
+'''
+
+
+class SQLiteStorageEngine(StorageEngine):
+    """Stores problems in a local SQLite database, by commit and linter.
+
+    Nothing is shared with other machines, which suits long-lived CI agents
+    that build the same repository over and over. Only ``Problem`` instances
+    are stored.
+    """
+
+    def __init__(self, path: Optional[str] = None,
+                 max_revisions: int = MAX_REVISIONS,
+                 target_branch: Optional[str] = None) -> None:
+        self.path = path
+        self.max_revisions = max_revisions
+        self.target_branch = target_branch
+        # The revision each linter's existing problems were read from, as
+        # the linters of a run are read at the same time.
+        self._revisions = {}  # type: Dict[str, Optional[str]]
+
+    async def get_existing_problems(
+            self, linter: Optional[str] = None) -> Set[Problem]:
+        revisions = await get_last_revisions(self.max_revisions,
+                                             self.target_branch)
+        if not revisions:
+            return set()
+        database = await self._get_path()
+        rows = await asyncio.get_event_loop().run_in_executor(
+            None, self._query_nearest_problems, database, revisions,
+            linter or '')
+        self._revisions[linter or ''] = rows[0][0] if rows else None
+        return {Problem(path, line, message) for _, path, line, message in rows}
+
+    async def get_existing_sources(
+            self, paths: Iterable[str],
+            linter: Optional[str] = None) -> Dict[str, Optional[bytes]]:
+        revision = self._revisions.get(linter or '')
+        if not revision:
+            return await super().get_existing_sources(paths, linter)
+        return await read_files(revision, paths)
+
+    async def store_linter_problems(
+            self,
+            problems_by_linter: Dict[Optional[str], Set[Problem]]) -> None:
+        head = await get_head()
+        if not head:
+            return
+        database = await self._get_path()
+        await asyncio.get_event_loop().run_in_executor(
+            None, self._insert_problems, database, head, problems_by_linter)
+
+    async def _get_path(self) -> str:
+        if self.path:
+            return self.path
+        git_dir = await get_git_dir()
+        if not git_dir:
+            raise Exception('Not in a git repository, pass --sqlite_path')
+        return os.path.join(git_dir, DEFAULT_DATABASE_NAME)
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(path, timeout=DATABASE_TIMEOUT)
+        # Readers don't block the writer, nor the writer readers.
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        return connection
+
+    @classmethod
+    def _query_nearest_problems(
+            cls, path: str, revisions: List[str],
+            linter: str) -> List[Tuple[str, str, int, str]]:
+        query = NEAREST_PROBLEMS_QUERY.format(
+            ', '.join(['(?, ?)'] * len(revisions)))
+        parameters = []  # type: List[object]
+        for distance, revision in enumerate(revisions):
+            parameters.extend([revision, distance])
+        parameters.extend([linter, linter])
+        with contextlib.closing(cls._connect(path)) as connection:
+            return connection.execute(query, parameters).fetchall()
+
+    @classmethod
+    def _insert_problems(
+            cls, path: str, head: str,
+            problems_by_linter: Dict[Optional[str], Set[Problem]]) -> None:
+        with contextlib.closing(cls._connect(path)) as connection:
+            # A single transaction for every linter; a run stored again
+            # replaces what was stored before.
+            with connection:
+                for linter, problems in problems_by_linter.items():
+                    linter = linter or ''
+                    connection.execute(
+                        'DELETE FROM problems '
+                        'WHERE commit_sha = ? AND linter = ?',
+                        (head, linter))
+                    connection.execute(
+                        'INSERT OR IGNORE INTO runs VALUES (?, ?)',
+                        (head, linter))
+                    connection.executemany(
+                        'INSERT INTO problems VALUES (?, ?, ?, ?, ?)',
+                        [(head, linter, problem.path, problem.line,
+                          problem.message)
+                         for problem in problems
+                         if isinstance(problem, Problem)])
+
+
+def register_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--sqlite_path', type=str, default=None,
+                        help='Database used by --storage sqlite. Defaults to '
+                             '{} in the git directory.'.format(
+                                 DEFAULT_DATABASE_NAME))
+
+
+def create_storage_engine(args: argparse.Namespace) -> SQLiteStorageEngine:
+    return SQLiteStorageEngine(args.sqlite_path, args.ancestor_depth,
+                               args.target_branch)
@@ -0,0 +1,139 @@
+import asyncio
+import os
+from typing import Dict, Iterable, List, Optional, Set  # noqa
+
+from linty_fresh.problem import Problem
+
+MAX_REVISIONS = 10
+GIT_KWARGS = {
+    'stdout': asyncio.subprocess.PIPE,
+    'stderr': asyncio.subprocess.DEVNULL,
+}
+
+
+class StorageEngine:
+    """Keeps the problems found on each commit, so that a later run only
+    reports the problems its changes introduced.
+
+    ``linter`` names the linter the problems came from. Engines may keep the
+    problems of all linters together and ignore it.
+    """
+
+    async def get_existing_problems(
+            self, linter: Optional[str] = None) -> Set[Problem]:
+        """Return the problems stored for the nearest ancestor of ``HEAD``
+        that has any."""
+        raise NotImplementedError
+
+    async def get_existing_sources(
+            self, paths: Iterable[str],
+            linter: Optional[str] = None) -> Dict[str, Optional[bytes]]:
+        """Return the contents of ``paths`` in the revision the existing
+        problems of ``linter`` were stored for, ``None`` for files it doesn't
+        have."""
+        return {path: None for path in paths}
+
+    async def store_problems(self, problems: Set[Problem],
+                             linter: Optional[str] = None) -> None:
+        await self.store_linter_problems({linter: problems})
+
+    async def store_linter_problems(
+            self,
+            problems_by_linter: Dict[Optional[str], Set[Problem]]) -> None:
+        """Store the problems several linters found on ``HEAD`` at once."""
+        raise NotImplementedError
+
+
+async def get_git_dir() -> Optional[str]:
+    git_dir_proc = await asyncio.create_subprocess_exec(
+        'git', 'rev-parse', '--git-common-dir',
+        **GIT_KWARGS)
+    git_dir, _ = await git_dir_proc.communicate()
+    if git_dir_proc.returncode != 0:
+        return None
+    return os.path.abspath(git_dir.decode().strip())
+
+
+async def get_head() -> Optional[str]:
+    head_proc = await asyncio.create_subprocess_exec(
+        'git', 'rev-parse', '--verify', '-q', 'HEAD',
+        **GIT_KWARGS)
+    head, _ = await head_proc.communicate()
+    if head_proc.returncode != 0:
+        return None
+    return head.decode().strip()
+
+
+async def get_merge_base(target: str) -> Optional[str]:
+    merge_base_proc = await asyncio.create_subprocess_exec(
+        'git', 'merge-base', 'HEAD', target,
+        **GIT_KWARGS)
+    merge_base, _ = await merge_base_proc.communicate()
+    if merge_base_proc.returncode != 0:
+        return None
+    return merge_base.decode().strip()
+
+
+async def get_last_revisions(count: int = MAX_REVISIONS,
+                             target: Optional[str] = None) -> List[str]:
+    """Return the ``count`` revisions before ``HEAD``, nearest first.
+
+    With ``target``, up to ``count`` of the commits ``HEAD`` doesn't share
+    with ``target`` come first, followed by their merge base and up to
+    ``count - 1`` of its ancestors: the merge base is usually a commit of
+    the target branch that was linted, however long the branch is. The
+    number of ``git`` calls doesn't depend on ``count``.
+    """
+    merge_base = await get_merge_base(target) if target else None
+    if not merge_base or merge_base == await get_head():
+        last_n_revisions_proc = await asyncio.create_subprocess_exec(
+            'git', 'log', '--skip=1', f'-{count}',
+            '--pretty=%H',
+            **GIT_KWARGS)
+        last_n_revisions, _ = await last_n_revisions_proc.communicate()
+        return last_n_revisions.decode().split()
+
+    # --topo-order walks by generation number when git has a commit-graph,
+    # without reading every commit down to the merge base first.
+    revisions = await _rev_list(count, 'HEAD^@', f'^{merge_base}')
+    return revisions + await _rev_list(count, merge_base)
+
+
+async def _rev_list(count: int, *revisions: str) -> List[str]:
+    rev_list_proc = await asyncio.create_subprocess_exec(
+        'git', 'rev-list', '--topo-order', f'--max-count={count}',
+        *revisions,
+        **GIT_KWARGS)
+    output, _ = await rev_list_proc.communicate()
+    return output.decode().split()
+
+
+async def read_files(revision: str,
+                     paths: Iterable[str]) -> Dict[str, Optional[bytes]]:
+    """Read ``paths`` from ``revision`` with a single ``git cat-file``."""
+    paths = list(paths)
+    cat_file_proc = await asyncio.create_subprocess_exec(
+        'git', 'cat-file', '--batch',
+        stdin=asyncio.subprocess.PIPE,
+        **GIT_KWARGS)
+    output, _ = await cat_file_proc.communicate(''.join(
+        '{}:{}\n'.format(revision, path) for path in paths).encode())
+
+    files = {}  # type: Dict[str, Optional[bytes]]
+    offset = 0
+    for path in paths:
+        header_end = output.find(b'\n', offset)
+        if header_end < 0:
+            files[path] = None
+            continue
+        header = output[offset:header_end].split()
+        offset = header_end + 1
+        if len(header) != 3:
+            # "<object> missing" or "<object> ambiguous"
+            files[path] = None
+            continue
+        size = int(header[2])
+        files[path] = (output[offset:offset + size]
+                       if header[1] == b'blob' else None)
+        offset += size + 1
+    return files
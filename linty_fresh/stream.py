@@ -0,0 +1,123 @@
+import re
+from typing import (IO, TYPE_CHECKING, AnyStr, Iterable, Iterator, Match,
+                    Pattern, Union)
+
+if TYPE_CHECKING:
+    from xml.etree import ElementTree  # noqa
+
+LineSource = Union[str, IO, Iterable[Union[str, bytes]]]
+
+# Lint files are scanned this many bytes or characters at a time.
+SCAN_CHUNK_SIZE = 2 ** 20
+
+
+def iter_lines(source: LineSource) -> Iterator[str]:
+    """Yield the lines of a lint report one at a time.
+
+    ``source`` may be the full report as a string, a text or binary file
+    object, or any iterable of ``str``/``bytes`` lines.  File objects are
+    consumed lazily so large reports never need to be held in memory.
+
+    Lines are split like ``str.splitlines()``, on lone ``\r`` among others,
+    and bytes that aren't UTF-8 are replaced rather than failing the run.
+    """
+    if isinstance(source, str):
+        yield from source.splitlines()
+        return
+    for line in source:
+        if isinstance(line, bytes):
+            line = line.decode(errors='replace')
+        yield from line.splitlines()
+
+
+def scan_lines(source: LineSource, line_regex: Pattern[str],
+               candidate_regex: Pattern[str]) -> Iterator[Match[str]]:
+    """Yield the matches of ``line_regex`` against the lines of a report.
+
+    ``candidate_regex`` must find something within every line that
+    ``line_regex`` matches, never span a newline, and be much cheaper to
+    search for, such as a pattern starting with a literal character.  File
+    objects are searched for it a large chunk at a time, so lines without a
+    candidate are never split out, decoded or matched.  Lines are otherwise
+    split and decoded as by ``iter_lines``.
+    """
+    if isinstance(source, str) or not hasattr(source, 'read'):
+        search = candidate_regex.search
+        match = line_regex.match
+        for line in iter_lines(source):
+            if search(line):
+                line_match = match(line)
+                if line_match:
+                    yield line_match
+        return
+
+    chunk = source.read(SCAN_CHUNK_SIZE)
+    newline = '\n'  # type: Union[str, bytes]
+    carriage_return = '\r'  # type: Union[str, bytes]
+    if isinstance(chunk, bytes):
+        newline = b'\n'
+        carriage_return = b'\r'
+        candidate_regex = re.compile(candidate_regex.pattern.encode(),
+                                     candidate_regex.flags & ~re.UNICODE)
+    rest = chunk[:0]
+    while chunk:
+        # Only the last, incomplete line of each chunk is copied. Files that
+        # end their lines with a lone \r are split there too.
+        buffer = rest + chunk
+        end = max(buffer.rfind(newline), buffer.rfind(carriage_return)) + 1
+        yield from _scan_buffer(buffer, end, line_regex, candidate_regex,
+                                newline)
+        rest = buffer[end:]
+        chunk = source.read(SCAN_CHUNK_SIZE)
+    yield from _scan_buffer(rest, len(rest), line_regex, candidate_regex,
+                            newline)
+
+
+def _scan_buffer(buffer: AnyStr, end: int, line_regex: Pattern[str],
+                 candidate_regex: Pattern[AnyStr],
+                 newline: AnyStr) -> Iterator[Match[str]]:
+    search = candidate_regex.search
+    match = line_regex.match
+    pos = 0
+    while True:
+        candidate = search(buffer, pos, end)
+        if candidate is None:
+            return
+        start = max(buffer.rfind(newline, pos, candidate.start()) + 1, pos)
+        stop = buffer.find(newline, candidate.end(), end)
+        if stop < 0:
+            stop = end
+        line = buffer[start:stop]
+        if isinstance(line, bytes):
+            line = line.decode(errors='replace')
+        # Lone \r and the other separators of str.splitlines() may split it
+        # further.
+        for part in line.splitlines():
+            line_match = match(part)
+            if line_match:
+                yield line_match
+        pos = stop + 1
+
+
+def iter_elements(source: IO,
+                  tag: str) -> Iterator['ElementTree.Element']:
+    """Incrementally parse an XML report, yielding each ``tag`` element.
+
+    Elements are detached from the tree once the caller is done with them so
+    memory stays proportional to a single element rather than the whole
+    document.  A truncated or corrupt document ends iteration at the point of
+    corruption, keeping everything yielded before it.
+    """
+    # Imported here as only the XML linters need it.
+    from xml.etree import ElementTree
+    root = None
+    try:
+        for event, element in ElementTree.iterparse(
+                source, events=('start', 'end')):
+            if root is None:
+                root = element
+            elif event == 'end' and element.tag == tag:
+                yield element
+                root.clear()
+    except ElementTree.ParseError:
+        return
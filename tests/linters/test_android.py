@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from linty_fresh.linters import android
@@ -79,3 +80,14 @@ class AndroidLintTest(unittest.TestCase):
                               'should use '
                               '`android:layout_height="wrap_content"`'),
                       result)
+
+    def test_parse_stream_truncated(self):
+        truncated = test_string[:test_string.index('<issue\n        id="Default')]
+        result = list(android.parse_stream(io.BytesIO(truncated.encode()),
+                                           pass_warnings=False))
+        self.assertEqual([Problem('scripts/run_tests.sh',
+                                  15,
+                                  'ScrollView size validation: This '
+                                  'LinearLayout should use '
+                                  '`android:layout_height="wrap_content"`')],
+                         result)
@@ -42,3 +42,25 @@ class CheckstyleTest(unittest.TestCase):
                               'ShellCheck.SC2034: FOO appears unused. '
                               'Verify it or export it.'),
                       result)
+
+    def test_parse_truncated(self):
+        test_string = """\
+<?xml version='1.0' encoding='UTF-8'?>
+    <checkstyle version='4.3'>
+        <file name='scripts/run&#95;tests.sh' >
+            <error line='31'
+             column='26' severity='info'
+             message='Double quote to prevent globbing and word splitting.'
+             source='ShellCheck.SC2086' />
+        </file>
+        <file name='scripts/setup.sh' >
+            <error
+             line='3'
+"""
+
+        result = checkstyle.parse(test_string)
+        self.assertEqual({Problem('scripts/run_tests.sh',
+                                  31,
+                                  'ShellCheck.SC2086: Double quote to prevent '
+                                  'globbing and word splitting.')},
+                         result)
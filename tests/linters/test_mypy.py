@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from linty_fresh.linters import mypy
@@ -26,3 +27,13 @@ tests/linters/pylint.py:33: error: "module" has no attribute "bar"
                               33,
                               'error: "module" has no attribute "bar"'),
                       result)
+
+    def test_parse_stream(self):
+        stream = io.BytesIO(b'tests/linters/pylint.py: note: ignored\n'
+                            b'tests/linters/pylint.py:42: error: "foo"\r\n')
+
+        result = list(mypy.parse_stream(stream))
+        self.assertEqual([Problem('tests/linters/pylint.py',
+                                  42,
+                                  'error: "foo"')],
+                         result)
@@ -26,3 +26,13 @@ tests/linters/pylint.py:42: [E302] expected 2 blank lines, found 1
                               42,
                               '[E302] expected 2 blank lines, found 1'),
                       result)
+
+    def test_parse_stream(self):
+        lines = ['src/linters/pylint.py:10: [E302] expected 2 blank lines',
+                 '::']
+
+        result = list(pylint.parse_stream(lines))
+        self.assertEqual([Problem('src/linters/pylint.py',
+                                  10,
+                                  '[E302] expected 2 blank lines')],
+                         result)
@@ -1,3 +1,4 @@
+import io
 import os
 import unittest
 
@@ -37,3 +38,14 @@ class SwiftlintTest(unittest.TestCase):
                     'Documentation Comment Violation: '
                     'Needs documentation comment'),
             result)
+
+    def test_parse_stream(self):
+        stream = io.BytesIO(
+            '{}/Classes/SomeController.swift:42: warning: '
+            'Needs documentation comment\n'.format(os.path.curdir).encode())
+
+        result = list(swiftlint.parse_stream(stream))
+        self.assertEqual([Problem('Classes/SomeController.swift',
+                                  42,
+                                  'Needs documentation comment')],
+                         result)
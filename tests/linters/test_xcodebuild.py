@@ -1,3 +1,4 @@
+import io
 import os
 import unittest
 
@@ -67,3 +68,14 @@ class XcodebuildTest(unittest.TestCase):
 
         result = xcodebuild.parse('\n'.join(test_string))
         self.assertEqual(0, len(result))
+
+    def test_parse_stream(self):
+        stream = io.BytesIO(
+            b"<unknown>:0: error: no such file or directory: 'foo.swift'\n"
+            b"Details:  log recorder was sent -stopRecordingWithInfo:\n")
+
+        result = list(xcodebuild.parse_stream(stream))
+        self.assertEqual([Problem('<unknown>',
+                                  0,
+                                  "no such file or directory: 'foo.swift'")],
+                         result)
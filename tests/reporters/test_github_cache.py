@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import call
+
+from linty_fresh.reporters.github_cache import GithubCache, MemoryGithubCache
+from linty_fresh.reporters.github_reporter import (ExistingGithubMessage,
+                                                   GithubReporter)
+
+from ..utils.fake_client_session import FakeClientResponse, FakeClientSession
+from . import test_github_reporter
+
+DIFF_URL = 'https://api.github.com/repos/foo/bar/pulls/12'
+COMMENTS_URL = 'https://api.github.com/repos/foo/bar/pulls/12/comments'
+
+
+class GithubCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = GithubCache(self.temp_dir.name)
+        self.reporter = GithubReporter('TOKEN', 'foo', 'bar', 12, 'abc123',
+                                       False, cache=self.cache)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_position_map_cached_by_commit(self):
+        client_session = FakeClientSession(url_map={
+            (DIFF_URL, 'get'):
+                FakeClientResponse(
+                    test_github_reporter.GithubReporterTest.github_patch)
+        })
+        loop = asyncio.get_event_loop()
+        line_map = loop.run_until_complete(
+            self.reporter.create_line_to_position_map(client_session))
+
+        cached_session = FakeClientSession(url_map={})
+        cached_line_map = loop.run_until_complete(
+            self.reporter.create_line_to_position_map(cached_session))
+
+        self.assertEqual([], cached_session.calls)
+        self.assertEqual(list(line_map), list(cached_line_map))
+        for path, file_map in line_map.items():
+            self.assertEqual(list(file_map.keys()),
+                             list(cached_line_map[path].keys()))
+            for line in file_map.keys():
+                self.assertEqual(file_map[line], cached_line_map[path][line])
+
+        other_commit = GithubReporter('TOKEN', 'foo', 'bar', 12, 'def456',
+                                      False, cache=self.cache)
+        self.assertIsNone(self.cache.get_position_map(
+            'foo', 'bar', 12, other_commit.commit))
+
+    def test_messages_revalidated_with_etag(self):
+        comments = json.dumps([{
+            'id': 1,
+            'path': 'file1',
+            'position': 2,
+            'body': 'linter says: hello'
+        }])
+        client_session = FakeClientSession(url_map={
+            (COMMENTS_URL, 'get'): [
+                FakeClientResponse(comments, headers={'ETag': '"v1"'}),
+                FakeClientResponse('', status=304),
+            ]
+        })
+
+        loop = asyncio.get_event_loop()
+        for _ in range(2):
+            existing_messages = loop.run_until_complete(
+                self.reporter.get_existing_pr_messages(client_session,
+                                                       'linter'))
+            self.assertEqual(
+                {ExistingGithubMessage(1, 'file1', 2, 'linter says: hello')},
+                existing_messages)
+
+        self.assertEqual([
+            call.get(COMMENTS_URL),
+            call.get(COMMENTS_URL, headers={'If-None-Match': '"v1"'}),
+        ], client_session.calls)
+
+    def test_memory_cache_pages_revalidated(self):
+        reporter = GithubReporter('TOKEN', 'foo', 'bar', 12, 'abc123', False,
+                                  cache=MemoryGithubCache())
+        page_2_url = COMMENTS_URL + '?page=2'
+        pages = {COMMENTS_URL: 1, page_2_url: 2}
+        url_map = {}
+        for url, page in pages.items():
+            comments = json.dumps([{
+                'id': page,
+                'path': 'file{}'.format(page),
+                'position': page,
+                'body': 'linter says: page {}'.format(page)
+            }])
+            headers = {'ETag': '"v{}"'.format(page)}
+            if page == 1:
+                headers['link'] = '<{}>; rel="next"'.format(page_2_url)
+            url_map[(url, 'get')] = [
+                FakeClientResponse(comments, headers=headers),
+                FakeClientResponse('', status=304),
+            ]
+        client_session = FakeClientSession(url_map=url_map)
+
+        loop = asyncio.get_event_loop()
+        for _ in range(3):
+            messages = loop.run_until_complete(
+                reporter._fetch_message_json_from_url(client_session,
+                                                      COMMENTS_URL, 'linter'))
+            self.assertEqual([1, 2], [message['id'] for message in messages])
+            # Callers can't change the cached pages.
+            messages.append({'id': 3})
+        self.assertEqual(
+            [1], [message['id'] for message in
+                  reporter.cache.get_messages(COMMENTS_URL).messages])
+
+    def test_corrupt_entries_are_ignored(self):
+        self.cache.set_messages(COMMENTS_URL, '"v1"', None, [])
+        for name in os.listdir(self.temp_dir.name):
+            with open(os.path.join(self.temp_dir.name, name), 'wb') as entry:
+                entry.write(b'garbage')
+
+        self.assertIsNone(self.cache.get_messages(COMMENTS_URL))
+        self.assertIsNone(self.cache.get_position_map('foo', 'bar', 12,
+                                                      'abc123'))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set_messages('sized', 'etag', None, ['x' * 50])
+        entry_size = os.path.getsize(
+            self.cache._get_path('.messages', 'sized'))
+        os.remove(self.cache._get_path('.messages', 'sized'))
+
+        cache = GithubCache(self.temp_dir.name, max_size=3 * entry_size)
+        for i in range(3):
+            cache.set_messages(f'url{i}', 'etag', None, ['x' * 50])
+            path = cache._get_path('.messages', f'url{i}')
+            os.utime(path, (i, i))
+        # Reading url0 makes it the most recently used entry.
+        self.assertIsNotNone(cache.get_messages('url0'))
+
+        cache.set_messages('url3', 'etag', None, ['x' * 50])
+
+        self.assertIsNotNone(cache.get_messages('url0'))
+        self.assertIsNone(cache.get_messages('url1'))
+        self.assertIsNotNone(cache.get_messages('url3'))
@@ -1,4 +1,5 @@
 import asyncio
+import io
 import json
 import textwrap
 import unittest
@@ -9,6 +10,7 @@ from linty_fresh.reporters import github_reporter
 from linty_fresh.reporters.github_reporter import (ExistingGithubMessage,
                                                    GithubReporter,
                                                    HadLintErrorsException)
+from linty_fresh.reporters.request_scheduler import RequestScheduler
 
 from ..utils.fake_client_session import FakeClientResponse, FakeClientSession
 
@@ -51,7 +53,7 @@ class GithubReporterTest(unittest.TestCase):
             + 12 - 12
             ''')
 
-    @patch('linty_fresh.reporters.github_reporter.aiohttp.ClientSession')
+    @patch('aiohttp.ClientSession')
     @patch('os.getenv')
     def test_comment_on_pr(self,
                            mock_getenv,
@@ -172,7 +174,7 @@ class GithubReporterTest(unittest.TestCase):
         self.assertIn(close_enough_comment, fake_client_session.calls)
         self.assertIn(missing_file_call, fake_client_session.calls)
 
-    @patch('linty_fresh.reporters.github_reporter.aiohttp.ClientSession')
+    @patch('aiohttp.ClientSession')
     @patch('os.getenv')
     def test_comment_overflow(self,
                               mock_getenv,
@@ -219,7 +221,37 @@ class GithubReporterTest(unittest.TestCase):
         self.assertEqual(5 + github_reporter.MAX_LINT_ERROR_REPORTS,
                          len(fake_client_session.calls))
 
-    @patch('linty_fresh.reporters.github_reporter.aiohttp.ClientSession')
+    @patch('aiohttp.ClientSession')
+    @patch('os.getenv')
+    def test_problems_future(self,
+                             mock_getenv,
+                             mock_client_session):
+        mock_args, fake_client_session = self.create_mock_pr(
+            mock_getenv,
+            mock_client_session)
+
+        reporter = github_reporter.create_reporter(mock_args)
+
+        problems = [Problem('another_file', x, 'Wat') for x in range(1, 13)]
+        calls_before_parsed = []
+
+        async def parse():
+            await asyncio.sleep(0.01)
+            calls_before_parsed.extend(fake_client_session.calls)
+            return problems
+
+        async_report = reporter.report('unit-test-linter', parse())
+        loop = asyncio.get_event_loop()
+
+        with self.assertRaises(HadLintErrorsException):
+            loop.run_until_complete(async_report)
+
+        # The diff and existing comments were fetched while parsing.
+        self.assertEqual(3, len(calls_before_parsed))
+        self.assertEqual(5 + github_reporter.MAX_LINT_ERROR_REPORTS,
+                         len(fake_client_session.calls))
+
+    @patch('aiohttp.ClientSession')
     @patch('os.getenv')
     def test_do_not_delete_old_comments(self,
                                         mock_getenv,
@@ -267,6 +299,174 @@ class GithubReporterTest(unittest.TestCase):
         self.assertEqual(4 + github_reporter.MAX_LINT_ERROR_REPORTS,
                          len(fake_client_session.calls))
 
+    @patch('aiohttp.ClientSession')
+    @patch('os.getenv')
+    def test_batch_review(self,
+                          mock_getenv,
+                          mock_client_session):
+        mock_args, fake_client_session = self.create_mock_pr(
+            mock_getenv,
+            mock_client_session)
+        fake_client_session.url_map[(
+            'https://api.github.com/repos/foo/bar/pulls/1234/reviews',
+            'post')] = FakeClientResponse('')
+
+        mock_args.batch_review = True
+        mock_args.delete_previous_comments = False
+        reporter = github_reporter.create_reporter(mock_args)
+
+        problems = [Problem('another_file', x, 'Wat') for x in range(1, 13)]
+
+        async_report = reporter.report('unit-test-linter', problems)
+        loop = asyncio.get_event_loop()
+
+        try:
+            loop.run_until_complete(async_report)
+        except HadLintErrorsException:
+            pass
+
+        review_call = call.post(
+            'https://api.github.com/repos/foo/bar/pulls/1234/reviews',
+            headers={
+                'Authorization': 'token MY_TOKEN'
+            },
+            data=json.dumps({
+                'body': 'unit-test-linter says: found problems on 12 lines.',
+                'comments': [{
+                    'body': 'unit-test-linter says:\n\n```\nWat\n```',
+                    'path': 'another_file',
+                    'position': x,
+                } for x in range(1, 13)],
+                'commit_id': 'abc123',
+                'event': 'COMMENT',
+            }, sort_keys=True)
+        )
+
+        self.assertEqual(4, len(fake_client_session.calls))
+        self.assertIn(review_call, fake_client_session.calls)
+
+    @patch('aiohttp.ClientSession')
+    @patch('os.getenv')
+    def test_batch_review_fallback(self,
+                                   mock_getenv,
+                                   mock_client_session):
+        mock_args, fake_client_session = self.create_mock_pr(
+            mock_getenv,
+            mock_client_session)
+        fake_client_session.url_map[(
+            'https://api.github.com/repos/foo/bar/pulls/1234/reviews',
+            'post')] = FakeClientResponse('', status=422)
+
+        mock_args.batch_review = True
+        mock_args.delete_previous_comments = False
+        reporter = github_reporter.create_reporter(mock_args)
+
+        problems = [Problem('another_file', x, 'Wat') for x in range(1, 4)]
+
+        async_report = reporter.report('unit-test-linter', problems)
+        loop = asyncio.get_event_loop()
+
+        try:
+            loop.run_until_complete(async_report)
+        except HadLintErrorsException:
+            pass
+
+        comment_calls = [
+            c for c in fake_client_session.calls
+            if c[0] == 'post' and c[1] == (
+                'https://api.github.com/repos/foo/bar/pulls/1234/comments',)]
+        self.assertEqual(3, len(comment_calls))
+        self.assertEqual(7, len(fake_client_session.calls))
+
+    @patch('sys.stderr', new_callable=io.StringIO)
+    @patch('aiohttp.ClientSession')
+    @patch('os.getenv')
+    def test_batch_review_fallback_is_capped(self,
+                                             mock_getenv,
+                                             mock_client_session,
+                                             mock_stderr):
+        mock_args, fake_client_session = self.create_mock_pr(
+            mock_getenv,
+            mock_client_session)
+        fake_client_session.url_map[(
+            'https://api.github.com/repos/foo/bar/pulls/1234/reviews',
+            'post')] = FakeClientResponse('Validation Failed', status=422)
+
+        mock_args.batch_review = True
+        mock_args.delete_previous_comments = False
+        reporter = github_reporter.create_reporter(mock_args)
+
+        problems = [Problem('another_file', x, 'Wat') for x in range(1, 31)]
+
+        async_report = reporter.report('unit-test-linter', problems)
+        loop = asyncio.get_event_loop()
+
+        try:
+            loop.run_until_complete(async_report)
+        except HadLintErrorsException:
+            pass
+
+        comment_calls = [
+            c for c in fake_client_session.calls
+            if c[0] == 'post' and c[1] == (
+                'https://api.github.com/repos/foo/bar/pulls/1234/comments',)]
+        self.assertEqual(github_reporter.MAX_LINT_ERROR_REPORTS,
+                         len(comment_calls))
+        overflow_call = call.post(
+            'https://api.github.com/repos/foo/bar/issues/1234/comments',
+            headers={
+                'Authorization': 'token MY_TOKEN'
+            },
+            data=json.dumps({
+                'body': 'unit-test-linter says:\n\nToo many lint errors to '
+                        'report inline!  30 lines have a problem.\nOnly '
+                        'reporting the first 10.'
+            }))
+        self.assertIn(overflow_call, fake_client_session.calls)
+        self.assertIn('422: Validation Failed', mock_stderr.getvalue())
+
+    @patch('aiohttp.ClientSession')
+    @patch('os.getenv')
+    def test_concurrent_reports_share_session(self,
+                                              mock_getenv,
+                                              mock_client_session):
+        mock_args, fake_client_session = self.create_mock_pr(
+            mock_getenv,
+            mock_client_session)
+        mock_args.delete_previous_comments = False
+
+        reporter = github_reporter.create_reporter(mock_args)
+
+        async def report_all():
+            return await asyncio.gather(
+                reporter.report('first-linter', [
+                    Problem('another_file', 1, 'Wat')]),
+                reporter.report('second-linter', [
+                    Problem('another_file', 2, 'Wat')]),
+                return_exceptions=True)
+
+        with patch.object(github_reporter, 'RequestScheduler',
+                          wraps=RequestScheduler) as scheduler_class:
+            results = asyncio.get_event_loop().run_until_complete(
+                report_all())
+
+        self.assertEqual(2, len(results))
+        for result in results:
+            self.assertIsInstance(result, HadLintErrorsException)
+        self.assertEqual(1, mock_client_session.call_count)
+        # Both reports' requests are limited and paused together.
+        self.assertEqual(1, scheduler_class.call_count)
+        gets = [c for c in fake_client_session.calls if c[0] == 'get']
+        self.assertEqual(3, len(gets))
+        self.assertEqual(5, len(fake_client_session.calls))
+
+        # The next report opens a new session and fetches everything again.
+        with self.assertRaises(HadLintErrorsException):
+            asyncio.get_event_loop().run_until_complete(reporter.report(
+                'first-linter', [Problem('another_file', 1, 'Wat')]))
+        self.assertEqual(2, mock_client_session.call_count)
+        self.assertEqual(9, len(fake_client_session.calls))
+
     def create_mock_pr(self, mock_getenv, mock_client_session):
         fake_client_session = FakeClientSession(url_map={
             ('https://api.github.com/repos/foo/bar/pulls/1234', 'get'):
@@ -300,6 +500,11 @@ class GithubReporterTest(unittest.TestCase):
         mock_args.pr_url = 'https://github.com/foo/bar/pull/1234'
         mock_args.commit = 'abc123'
         mock_args.delete_previous_comments = True
+        mock_args.fetch_concurrency = github_reporter.DEFAULT_FETCH_CONCURRENCY
+        mock_args.request_concurrency = (
+            github_reporter.DEFAULT_REQUEST_CONCURRENCY)
+        mock_args.batch_review = False
+        mock_args.github_cache_dir = None
         mock_getenv.return_value = 'MY_TOKEN'
         mock_client_session.side_effect = session_init_side_effect
 
@@ -360,3 +565,43 @@ class GithubReporterTest(unittest.TestCase):
         self.assertIn(
             ExistingGithubMessage(2, 'file2', 3, 'linter says: world'),
             existing_messages)
+
+    def test_messages_paging_concurrent(self):
+        reporter = GithubReporter('TOKEN', 'foo', 'bar', 12, 'abc123', False)
+        url = 'https://api.github.com/repos/foo/bar/pulls/12/comments'
+        url_map = {
+            (url, 'get'): FakeClientResponse(
+                json.dumps([{
+                    'id': 1,
+                    'path': 'file1',
+                    'position': 1,
+                    'body': 'linter says: page 1'
+                }], sort_keys=True),
+                headers={
+                    'link': f'<{url}?per_page=1&page=2>; rel="next", '
+                            f'<{url}?per_page=1&page=4>; rel="last"'
+                })
+        }
+        for page in range(2, 5):
+            url_map[(f'{url}?per_page=1&page={page}', 'get')] = (
+                FakeClientResponse(json.dumps([{
+                    'id': page,
+                    'path': f'file{page}',
+                    'position': page,
+                    'body': f'linter says: page {page}'
+                }], sort_keys=True)))
+        client_session = FakeClientSession(url_map=url_map)
+
+        loop = asyncio.get_event_loop()
+        existing_messages = loop.run_until_complete(
+            reporter.get_existing_pr_messages(client_session, 'linter'))
+
+        self.assertEqual(4, len(existing_messages))
+        for page in range(1, 5):
+            self.assertIn(
+                ExistingGithubMessage(page, f'file{page}', page,
+                                      f'linter says: page {page}'),
+                existing_messages)
+        self.assertEqual(4, len(client_session.calls))
+        self.assertIn(call.get(f'{url}?per_page=1&page=4'),
+                      client_session.calls)
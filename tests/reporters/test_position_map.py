@@ -0,0 +1,79 @@
+import asyncio
+import textwrap
+import unittest
+
+from linty_fresh.reporters.position_map import (FilePositionMap,
+                                                create_position_map)
+
+
+async def _chunked(content: bytes, size: int):
+    for start in range(0, len(content), size):
+        yield content[start:start + size]
+
+
+class PositionMapTest(unittest.TestCase):
+    diff = textwrap.dedent('''\
+        diff --git a/some_file b/some_file
+        index abc123..bca321 100644
+        --- a/some_file
+        +++ b/some_file
+        @@ -38,3 +38,4 @@ def foo():
+         38
+         39
+        -DELETED
+        +40
+        @@ -55 +57 @@
+        -DELETED
+        +57
+        \\ No newline at end of file
+        diff --git a/deleted_file b/deleted_file
+        index abc123..bca321 100644
+        --- a/deleted_file
+        +++ b/deleted_file
+        @@ -1,1 +0,0 @@
+        -DELETED
+        ''').encode()
+
+    def create_position_map(self, chunk_size):
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(
+            create_position_map(_chunked(self.diff, chunk_size)))
+
+    def test_create_position_map(self):
+        for chunk_size in (1, 7, len(self.diff)):
+            line_map = self.create_position_map(chunk_size)
+
+            self.assertEqual(['some_file'], list(line_map))
+            file_map = line_map['some_file']
+            self.assertEqual([38, 39, 40, 57], list(file_map.keys()))
+            self.assertEqual(1, file_map[38])
+            self.assertEqual(2, file_map[39])
+            self.assertEqual(4, file_map[40])
+            self.assertEqual(7, file_map[57])
+            self.assertIsNone(file_map.get(41))
+            self.assertNotIn(58, file_map)
+
+    def test_runs(self):
+        file_map = FilePositionMap()
+        for line in range(1, 101):
+            file_map.add(line, line)
+        file_map.add(200, 102)
+
+        self.assertEqual(101, len(file_map))
+        self.assertEqual(2, len(file_map._lines))
+        self.assertEqual(50, file_map[50])
+        self.assertEqual(102, file_map[200])
+        self.assertIsNone(file_map.get(150))
+        with self.assertRaises(KeyError):
+            file_map[0]
+
+    def test_nearest(self):
+        file_map = FilePositionMap()
+        for line, position in ((10, 1), (11, 2), (12, 3), (20, 5), (30, 7)):
+            file_map.add(line, position)
+
+        for line in range(0, 40):
+            expected_line = min(file_map.keys(), key=lambda x: abs(x - line))
+            self.assertEqual((expected_line, file_map[expected_line]),
+                             file_map.nearest(line))
+        self.assertIsNone(FilePositionMap().nearest(1))
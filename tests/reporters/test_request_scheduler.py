@@ -0,0 +1,93 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import call
+
+from linty_fresh.reporters.request_scheduler import RequestScheduler
+
+from ..utils.fake_client_session import FakeClientResponse, FakeClientSession
+
+URL = 'https://api.github.com/repos/foo/bar/issues/12/comments'
+
+
+class RequestSchedulerTest(unittest.TestCase):
+    def run_requests(self, scheduler, method, count):
+        async def run_all():
+            return await asyncio.gather(*[
+                scheduler.request(method, URL, data=str(i))
+                for i in range(count)])
+
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(run_all())
+
+    def test_bounded_concurrency(self):
+        in_flight = []
+        max_in_flight = []
+
+        async def fake_request(url, **kwargs):
+            in_flight.append(url)
+            max_in_flight.append(len(in_flight))
+            await asyncio.sleep(0)
+            in_flight.pop()
+            return FakeClientResponse('')
+
+        self.run_requests(RequestScheduler(concurrency=3), fake_request, 20)
+        self.assertEqual(3, max(max_in_flight))
+
+    def test_retry_after(self):
+        client_session = FakeClientSession(url_map={
+            (URL, 'post'): [
+                FakeClientResponse('', status=403,
+                                   headers={'Retry-After': '0'}),
+                FakeClientResponse('', status=429),
+                FakeClientResponse('', status=201),
+            ]
+        })
+
+        responses = self.run_requests(
+            RequestScheduler(concurrency=1, backoff=0), client_session.post, 1)
+
+        self.assertEqual([201], [response.status for response in responses])
+        self.assertEqual([call.post(URL, data='0')] * 3,
+                         client_session.calls)
+
+    def test_rate_limit_exhausted(self):
+        client_session = FakeClientSession(url_map={
+            (URL, 'post'): [
+                FakeClientResponse('', status=403, headers={
+                    'X-RateLimit-Remaining': '0',
+                    'X-RateLimit-Reset': str(int(time.time()) - 1),
+                }),
+                FakeClientResponse('', status=201),
+            ]
+        })
+
+        responses = self.run_requests(
+            RequestScheduler(concurrency=2), client_session.post, 2)
+
+        self.assertEqual([201, 201],
+                         [response.status for response in responses])
+        self.assertEqual(3, len(client_session.calls))
+
+    def test_gives_up_after_max_retries(self):
+        client_session = FakeClientSession(url_map={
+            (URL, 'delete'): FakeClientResponse('', status=429),
+        })
+
+        responses = self.run_requests(
+            RequestScheduler(max_retries=2, backoff=0),
+            client_session.delete, 1)
+
+        self.assertEqual(429, responses[0].status)
+        self.assertEqual(3, len(client_session.calls))
+
+    def test_forbidden_is_not_retried(self):
+        client_session = FakeClientSession(url_map={
+            (URL, 'post'): FakeClientResponse('', status=403),
+        })
+
+        responses = self.run_requests(RequestScheduler(), client_session.post,
+                                      1)
+
+        self.assertEqual(403, responses[0].status)
+        self.assertEqual(1, len(client_session.calls))
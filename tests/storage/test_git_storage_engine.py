@@ -0,0 +1,370 @@
+import asyncio
+import fcntl
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from linty_fresh.problem import Problem, TestProblem
+from linty_fresh.storage import git_storage_engine
+from linty_fresh.storage.git_storage_engine import (MAX_DELTA_CHAIN,
+                                                    MAX_REVISIONS,
+                                                    GitNotesStorageEngine)
+from linty_fresh.storage.note_format import (COMPRESSED_NOTE_PREFIX,
+                                             DELTA_NOTE_PREFIX,
+                                             NOTE_FORMAT_COMPRESSED,
+                                             decode_note)
+
+
+class GitNotesStorageEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        self.git('init', '-q')
+        self.git('config', 'user.name', 'Linty Fresh')
+        self.git('config', 'user.email', 'linty@example.com')
+        self.engine = GitNotesStorageEngine()
+        git_storage_engine._parsed_notes.clear()
+
+    def tearDown(self):
+        os.chdir(self.original_cwd)
+        self.temp_dir.cleanup()
+
+    def git(self, *args):
+        return subprocess.run(
+            ('git',) + args, check=True, stdout=subprocess.PIPE,
+            env=dict(os.environ,
+                     GIT_NOTES_REF=git_storage_engine.NOTES_REF)
+        ).stdout.decode().strip()
+
+    def commit(self):
+        self.git('commit', '-q', '--allow-empty', '-m', 'commit')
+        return self.git('rev-parse', 'HEAD')
+
+    def run_async(self, awaitable):
+        return asyncio.get_event_loop().run_until_complete(awaitable)
+
+    def add_remote(self):
+        remote = tempfile.TemporaryDirectory()
+        self.addCleanup(remote.cleanup)
+        self.git('init', '-q', '--bare', remote.name)
+        self.git('-C', remote.name, 'config', 'uploadpack.allowFilter',
+                 'true')
+        self.git('remote', 'add', 'origin', remote.name)
+        return remote.name
+
+    def count_fetches(self):
+        return patch.object(GitNotesStorageEngine, '_run_fetch',
+                            autospec=True,
+                            side_effect=GitNotesStorageEngine._run_fetch)
+
+    def test_no_notes(self):
+        self.commit()
+        self.commit()
+        self.assertEqual(set(), self.run_async(
+            self.engine.get_existing_problems()))
+
+    def test_round_trip(self):
+        problems = {Problem('some_file.py', 1, 'bad'),
+                    Problem('other_file.py', 2, 'worse')}
+        self.commit()
+        self.run_async(self.engine.store_problems(problems))
+        self.commit()
+
+        self.assertEqual(problems, self.run_async(
+            self.engine.get_existing_problems()))
+
+    def test_nearest_annotated_revision(self):
+        self.commit()
+        self.git('notes', 'add', '-m', '[]')
+        self.commit()
+        self.run_async(self.engine.store_problems(
+            {Problem('some_file.py', 1, 'bad')}))
+        annotated = self.git('rev-parse', 'HEAD')
+        for _ in range(3):
+            self.commit()
+
+        revisions = self.git('log', '--pretty=%H').split()
+        note_ref = self.run_async(self.engine.get_note_ref(revisions))
+
+        self.assertEqual(self.git('notes', 'list', annotated), note_ref)
+        self.assertEqual({Problem('some_file.py', 1, 'bad')},
+                         self.run_async(self.engine.get_existing_problems()))
+
+    def test_ancestor_depth(self):
+        self.commit()
+        self.run_async(self.engine.store_problems(
+            {Problem('some_file.py', 1, 'bad')}))
+        for _ in range(MAX_REVISIONS + 1):
+            self.commit()
+
+        self.assertEqual(set(), self.run_async(
+            self.engine.get_existing_problems()))
+        engine = GitNotesStorageEngine(max_revisions=MAX_REVISIONS + 1)
+        self.assertEqual({Problem('some_file.py', 1, 'bad')},
+                         self.run_async(engine.get_existing_problems()))
+
+    def test_target_branch(self):
+        self.commit()
+        self.git('branch', '-M', 'master')
+        self.run_async(self.engine.store_problems(
+            {Problem('some_file.py', 1, 'bad')}))
+        self.git('checkout', '-q', '-b', 'feature')
+        for _ in range(MAX_REVISIONS + 1):
+            self.commit()
+        self.git('checkout', '-q', 'master')
+        self.git('commit', '-q', '--allow-empty', '-m', 'master')
+        self.run_async(self.engine.store_problems(
+            {Problem('some_file.py', 2, 'not an ancestor')}))
+        self.git('checkout', '-q', 'feature')
+
+        self.assertEqual(set(), self.run_async(
+            self.engine.get_existing_problems()))
+        engine = GitNotesStorageEngine(target_branch='master')
+        self.assertEqual({Problem('some_file.py', 1, 'bad')},
+                         self.run_async(engine.get_existing_problems()))
+
+        # On the target branch itself, the search starts from HEAD.
+        self.git('checkout', '-q', 'master')
+        self.commit()
+        self.assertEqual({Problem('some_file.py', 2, 'not an ancestor')},
+                         self.run_async(engine.get_existing_problems()))
+
+    def test_parsed_notes_are_kept(self):
+        history = self.store_history(3)
+        self.assertEqual(history[-1][1], self.run_async(
+            self.engine.get_existing_problems()))
+
+        with patch.object(GitNotesStorageEngine, '_read_note_content',
+                          side_effect=AssertionError) as read_note_content:
+            self.assertEqual(history[-1][1], self.run_async(
+                GitNotesStorageEngine().get_existing_problems()))
+        read_note_content.assert_not_called()
+
+    def test_writes_json_by_default(self):
+        self.commit()
+        self.run_async(self.engine.store_problems(
+            {Problem('some_file.py', 1, 'bad')}))
+
+        self.assertEqual([Problem('some_file.py', 1, 'bad').to_json()],
+                         json.loads(self.git('notes', 'show', 'HEAD')))
+
+    def test_reads_legacy_json_notes(self):
+        self.commit()
+        self.git('notes', 'add', '-m',
+                 '[{"path": "some_file.py", "line": 1, "message": "bad"}]')
+        self.run_async(self.engine.store_problems(
+            {Problem('other_file.py', 2, 'worse')}))
+        self.commit()
+
+        self.assertEqual({Problem('some_file.py', 1, 'bad'),
+                          Problem('other_file.py', 2, 'worse')},
+                         self.run_async(self.engine.get_existing_problems()))
+
+    def test_test_problems_on_top_of_a_note(self):
+        self.commit()
+        self.run_async(GitNotesStorageEngine(
+            note_format=NOTE_FORMAT_COMPRESSED).store_problems(
+                {Problem('some_file.py', 1, 'bad')}))
+        self.commit()
+        test_problems = {TestProblem('SomeTest', 'test_it', 'failed', '')}
+        self.run_async(GitNotesStorageEngine(
+            note_format=NOTE_FORMAT_COMPRESSED).store_problems(
+                test_problems, 'unittest'))
+
+        note = self.git('notes', 'show', 'HEAD').encode()
+        self.assertFalse(note.startswith(DELTA_NOTE_PREFIX))
+        self.assertEqual(
+            [test_problem.to_json() for test_problem in test_problems],
+            json.loads(note.decode()))
+
+    def store_history(self, count):
+        problems = {Problem('some_file.py', line, 'bad')
+                    for line in range(50)}
+        history = []
+        self.commit()
+        for i in range(count):
+            problems = problems - {Problem('some_file.py', i, 'bad')}
+            problems = problems | {Problem('new_file.py', i, 'worse')}
+            self.run_async(GitNotesStorageEngine(
+                note_format=NOTE_FORMAT_COMPRESSED).store_problems(problems))
+            history.append((self.git('rev-parse', 'HEAD'), problems))
+            self.commit()
+        return history
+
+    def test_delta_notes(self):
+        history = self.store_history(3)
+
+        self.assertTrue(self.git('notes', 'show', history[0][0]).encode()
+                        .startswith(COMPRESSED_NOTE_PREFIX))
+        for revision, _ in history[1:]:
+            self.assertTrue(self.git('notes', 'show', revision).encode()
+                            .startswith(DELTA_NOTE_PREFIX))
+        self.assertEqual(history[-1][1], self.run_async(
+            self.engine.get_existing_problems()))
+
+    def test_delta_chain_is_bounded(self):
+        history = self.store_history(MAX_DELTA_CHAIN + 3)
+
+        snapshots = [i for i, (revision, _) in enumerate(history)
+                     if self.git('notes', 'show', revision).encode()
+                     .startswith(COMPRESSED_NOTE_PREFIX)]
+        self.assertEqual([0, MAX_DELTA_CHAIN + 1], snapshots)
+        self.assertEqual(history[-1][1], self.run_async(
+            self.engine.get_existing_problems()))
+
+    def test_compact_notes(self):
+        history = self.store_history(4)
+        self.engine = GitNotesStorageEngine(note_format=NOTE_FORMAT_COMPRESSED)
+
+        self.assertEqual(2, self.run_async(self.engine.compact_notes(1)))
+        notes = [self.git('notes', 'show', revision).encode()
+                 for revision, _ in history]
+        self.assertEqual([COMPRESSED_NOTE_PREFIX, DELTA_NOTE_PREFIX,
+                          COMPRESSED_NOTE_PREFIX, COMPRESSED_NOTE_PREFIX],
+                         [note[:len(COMPRESSED_NOTE_PREFIX)]
+                          if note.startswith(COMPRESSED_NOTE_PREFIX)
+                          else note[:len(DELTA_NOTE_PREFIX)]
+                          for note in notes])
+        for revision, problems in history:
+            self.assertEqual(problems, self.run_async(
+                self.engine._resolve_note(
+                    self.git('notes', 'list', revision), {}))[0])
+        self.assertEqual(0, self.run_async(self.engine.compact_notes(1)))
+
+    def test_fetch_ttl(self):
+        self.add_remote()
+        self.commit()
+        with self.count_fetches() as run_fetch:
+            # The remote has no notes yet, so the fetch fails.
+            self.run_async(GitNotesStorageEngine(
+                'origin', fetch_ttl=60)._fetch_notes())
+            self.git('notes', 'add', '-m', '[]')
+            self.git('push', '-q', 'origin', 'HEAD:refs/heads/master',
+                     git_storage_engine.NOTES_REF)
+            self.run_async(GitNotesStorageEngine(
+                'origin', fetch_ttl=60)._fetch_notes())
+            self.assertEqual(2, run_fetch.call_count)
+
+            self.run_async(GitNotesStorageEngine(
+                'origin', fetch_ttl=60)._fetch_notes())
+            self.assertEqual(2, run_fetch.call_count)
+
+            self.run_async(GitNotesStorageEngine('origin')._fetch_notes())
+            self.assertEqual(3, run_fetch.call_count)
+
+    def test_concurrent_fetches_coalesce(self):
+        self.add_remote()
+        self.commit()
+        self.git('notes', 'add', '-m', '[]')
+        self.git('push', '-q', 'origin', 'HEAD:refs/heads/master',
+                 git_storage_engine.NOTES_REF)
+        state_dir = os.path.join('.git', git_storage_engine.STATE_DIRECTORY)
+        os.makedirs(state_dir)
+
+        async def fetch_while_locked():
+            with open(os.path.join(state_dir,
+                                   git_storage_engine.FETCH_LOCK),
+                      'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                fetches = asyncio.gather(*[
+                    GitNotesStorageEngine('origin')._fetch_notes()
+                    for _ in range(3)])
+                await asyncio.sleep(0.5)
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            await fetches
+
+        with self.count_fetches() as run_fetch:
+            self.run_async(fetch_while_locked())
+        self.assertEqual(1, run_fetch.call_count)
+
+    def test_linters_share_one_fetch(self):
+        self.add_remote()
+        self.commit()
+        self.git('notes', 'add', '-m', '[]')
+        self.git('push', '-q', 'origin', 'HEAD:refs/heads/master',
+                 git_storage_engine.NOTES_REF)
+        engine = GitNotesStorageEngine('origin')
+
+        async def read_problems():
+            await asyncio.gather(*[engine.get_existing_problems(linter)
+                                   for linter in ('pylint', 'mypy', 'eslint')])
+            await engine.get_existing_problems('swiftlint')
+
+        with self.count_fetches() as run_fetch:
+            self.run_async(read_problems())
+        self.assertEqual(1, run_fetch.call_count)
+
+    def test_partial_fetch(self):
+        remote = self.add_remote()
+        old = self.commit()
+        self.git('notes', 'add', '-m', '[]')
+        for _ in range(MAX_REVISIONS):
+            self.commit()
+        self.run_async(self.engine.store_problems(
+            {Problem('some_file.py', 1, 'bad')}))
+        self.commit()
+        self.git('push', '-q', 'origin', 'HEAD:refs/heads/master',
+                 git_storage_engine.NOTES_REF)
+
+        self.git('clone', '-q', '--no-local', remote, 'clone')
+        os.chdir('clone')
+        engine = GitNotesStorageEngine('origin', partial_fetch=True)
+        self.assertEqual({Problem('some_file.py', 1, 'bad')},
+                         self.run_async(engine.get_existing_problems()))
+        missing = [line[1:] for line in self.git(
+            'rev-list', '--objects', '--missing=print',
+            git_storage_engine.NOTES_REF).splitlines()
+            if line.startswith('?')]
+        self.assertEqual([self.git('notes', 'list', old)], missing)
+
+        # The filter is recorded on a remote of linty_fresh's own.
+        config = self.git('config', '--get-regexp', '^remote\\.origin\\.')
+        self.assertEqual(['remote.origin.fetch', 'remote.origin.url'],
+                         sorted(line.split()[0]
+                                for line in config.splitlines()))
+        self.git('fetch', '-q', 'origin')
+        self.assertNotIn('?', self.git('rev-list', '--objects',
+                                       '--missing=print', 'origin/master'))
+
+    def test_concurrent_pushes_merge(self):
+        remote = self.add_remote()
+        commit = self.commit()
+        self.git('push', '-q', 'origin', 'HEAD:refs/heads/master')
+        self.git('clone', '-q', remote, 'clone')
+
+        self.run_async(GitNotesStorageEngine('origin').store_problems(
+            {Problem('some_file.py', 1, 'bad')}))
+        os.chdir('clone')
+        self.git('config', 'user.name', 'Linty Fresh')
+        self.git('config', 'user.email', 'linty@example.com')
+        # This clone hasn't seen the notes pushed above, so its first push
+        # is rejected and has to merge them.
+        self.run_async(GitNotesStorageEngine('origin').store_problems(
+            {Problem('other_file.py', 2, 'worse')}))
+
+        note = self.git('-C', remote, 'notes', 'show', commit)
+        self.assertEqual({Problem('some_file.py', 1, 'bad'),
+                          Problem('other_file.py', 2, 'worse')},
+                         decode_note(note.encode().splitlines()))
+
+    def test_existing_sources(self):
+        os.mkdir('src')
+        with open('src/main.py', 'w') as source_file:
+            source_file.write('old\n')
+        self.git('add', 'src/main.py')
+        self.commit()
+        self.run_async(self.engine.store_problems(
+            {Problem('src/main.py', 1, 'bad')}))
+        with open('src/main.py', 'w') as source_file:
+            source_file.write('new\n')
+        self.git('add', 'src/main.py')
+        self.commit()
+
+        self.assertEqual({'src/main.py': b'old\n', 'src': None,
+                          'missing.py': None},
+                         self.run_async(self.engine.get_existing_sources(
+                             ['src/main.py', 'src', 'missing.py'])))
@@ -0,0 +1,177 @@
+import asyncio
+import glob
+import os
+import random
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from linty_fresh.problem import Problem
+from linty_fresh.storage import git_storage_engine
+from linty_fresh.storage.git_objects import (TYPE_NAMES, GitRepository,
+                                             strip_space)
+from linty_fresh.storage.git_storage_engine import GitNotesStorageEngine
+from linty_fresh.storage.in_process_storage_engine import \
+    InProcessGitNotesStorageEngine
+from linty_fresh.storage.note_format import NOTE_FORMAT_JSON
+
+
+def no_subprocesses(*args, **kwargs):
+    raise AssertionError('Unexpected subprocess: {}'.format(args))
+
+
+class InProcessGitNotesStorageEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        self.git('init', '-q')
+        self.git('config', 'user.name', 'Linty Fresh')
+        self.git('config', 'user.email', 'linty@example.com')
+        self.engine = InProcessGitNotesStorageEngine()
+        git_storage_engine._parsed_notes.clear()
+
+    def tearDown(self):
+        os.chdir(self.original_cwd)
+        self.temp_dir.cleanup()
+
+    def git(self, *args, input=None):
+        return subprocess.run(
+            ('git',) + args, check=True, stdout=subprocess.PIPE, input=input,
+            env=dict(os.environ,
+                     GIT_NOTES_REF=git_storage_engine.NOTES_REF)
+        ).stdout.decode().strip()
+
+    def commit(self, content='content'):
+        with open('file.txt', 'w') as f:
+            f.write(content)
+        self.git('add', 'file.txt')
+        self.git('commit', '-q', '-m', 'commit')
+        return self.git('rev-parse', 'HEAD')
+
+    def run_async(self, awaitable):
+        return asyncio.get_event_loop().run_until_complete(awaitable)
+
+    def test_round_trip_without_git(self):
+        problems = {Problem('some_file.py', 1, 'bad'),
+                    Problem('other_file.py', 2, 'worse')}
+        self.commit()
+        with patch('asyncio.create_subprocess_exec', no_subprocesses):
+            self.run_async(self.engine.store_problems(problems))
+            self.commit('more content')
+            self.assertEqual(problems, self.run_async(
+                self.engine.get_existing_problems()))
+        self.git('fsck', '--strict')
+
+    def test_existing_sources_without_git(self):
+        self.commit('old')
+        self.run_async(self.engine.store_problems(
+            {Problem('file.txt', 1, 'bad')}))
+        self.commit('new')
+        with patch('asyncio.create_subprocess_exec', no_subprocesses):
+            self.assertEqual({'file.txt': b'old', 'file.txt/child': None,
+                              'missing.py': None},
+                             self.run_async(self.engine.get_existing_sources(
+                                 ['file.txt', 'file.txt/child',
+                                  'missing.py'])))
+
+    def test_notes_match_git(self):
+        first = {Problem('some_file.py', 1, 'bad')}
+        second = {Problem('other_file.py', 2, 'worse')}
+        self.commit()
+        subprocess_engine = GitNotesStorageEngine()
+
+        self.run_async(subprocess_engine.store_problems(first))
+        self.run_async(self.engine.store_problems(second))
+        self.run_async(subprocess_engine.store_problems(first))
+        in_process_note = self.git('notes', 'show')
+
+        self.git('notes', 'remove')
+        self.run_async(subprocess_engine.store_problems(first))
+        self.run_async(subprocess_engine.store_problems(second))
+        self.run_async(subprocess_engine.store_problems(first))
+
+        self.assertEqual(self.git('notes', 'show'), in_process_note)
+        self.git('fsck', '--strict')
+
+    def test_packed_objects_and_refs(self):
+        # Large, poorly compressible files that differ by one line, so that
+        # gc stores most of them as deltas.
+        rng = random.Random(0)
+        base = '\n'.join('{:032x}'.format(rng.getrandbits(128))
+                         for _ in range(3000))
+        for i in range(20):
+            self.commit('{}\nchange {}\n'.format(base, i))
+            self.run_async(GitNotesStorageEngine().store_problems(
+                {Problem('some_file.py', line, 'bad {}'.format(i))
+                 for line in range(50)}))
+        self.commit('last')
+        self.git('gc', '-q', '--aggressive')
+        self.assertFalse(os.path.exists('.git/refs/notes/linty_fresh'))
+        pack_index, = glob.glob('.git/objects/pack/*.idx')
+        self.assertIn('chain length', self.git('verify-pack', '-v',
+                                               pack_index))
+
+        repository = GitRepository.discover()
+        objects = self.git('cat-file', '--batch-all-objects',
+                           '--batch-check').splitlines()
+        for line in objects:
+            sha, object_type, _ = line.split()
+            expected = subprocess.run(['git', 'cat-file', object_type, sha],
+                                      stdout=subprocess.PIPE,
+                                      check=True).stdout
+            self.assertEqual((object_type.encode(), expected),
+                             (TYPE_NAMES[repository.read_object(sha)[0]],
+                              repository.read_object(sha)[1]))
+
+        with patch('asyncio.create_subprocess_exec', no_subprocesses):
+            self.assertEqual(
+                {Problem('some_file.py', line, 'bad 19')
+                 for line in range(50)},
+                self.run_async(self.engine.get_existing_problems()))
+
+    def test_fanout_notes_tree(self):
+        self.commit()
+        commits = [self.git('commit-tree', '-m', str(i), 'HEAD^{tree}')
+                   for i in range(300)]
+        stream = ['commit refs/notes/linty_fresh',
+                  'committer Linty <linty@example.com> 0 +0000',
+                  'data 0']
+        for sha in commits:
+            stream.append('N inline {}\ndata 3\n[]\n'.format(sha))
+        self.git('fast-import', '--quiet',
+                 input='\n'.join(stream).encode() + b'\n')
+        # git rewrites the notes tree with fanout directories once it is
+        # this large.
+        self.git('notes', 'append', '-m', '[]', commits[0])
+        self.assertIn('040000 tree',
+                      self.git('ls-tree', 'refs/notes/linty_fresh'))
+
+        repository = GitRepository.discover()
+        repository.append_note('refs/notes/linty_fresh', commits[1],
+                               b'[1]')
+        self.assertEqual('[]\n\n[1]',
+                         self.git('notes', 'show', commits[1]))
+        self.assertEqual(self.git('notes', 'list', commits[2]),
+                         repository.find_note('refs/notes/linty_fresh',
+                                              commits[2]))
+        self.git('fsck', '--strict')
+
+    def test_falls_back_to_git(self):
+        self.commit()
+        with patch.object(GitRepository, 'discover',
+                          side_effect=OSError('unsupported')):
+            self.run_async(InProcessGitNotesStorageEngine(
+                note_format=NOTE_FORMAT_JSON).store_problems(
+                    {Problem('some_file.py', 1, 'bad')}))
+        self.assertEqual('[{"path": "some_file.py", "line": 1, '
+                         '"message": "bad"}]',
+                         self.git('notes', 'show'))
+
+    def test_strip_space(self):
+        for message in (b'\n\n a  \n\n\n\nb\t', b' \n \n', b'[]'):
+            expected = subprocess.run(['git', 'stripspace'], input=message,
+                                      stdout=subprocess.PIPE,
+                                      check=True).stdout
+            self.assertEqual(expected, strip_space(message))
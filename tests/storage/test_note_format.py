@@ -0,0 +1,57 @@
+import json
+import unittest
+
+from linty_fresh.problem import Problem, TestProblem
+from linty_fresh.storage import note_format
+
+
+class NoteFormatTest(unittest.TestCase):
+    def setUp(self):
+        self.problems = {Problem('some_file.py', 1, 'bad'),
+                         Problem('some_file.py', 4, 'bad'),
+                         Problem('other_file.py', 2, 'worse')}
+
+    def test_compressed_round_trip(self):
+        note = note_format.encode_problems(
+            self.problems, note_format.NOTE_FORMAT_COMPRESSED)
+        self.assertTrue(note.startswith(note_format.COMPRESSED_NOTE_PREFIX))
+        self.assertNotIn(b'\n', note)
+        self.assertEqual(self.problems, note_format.decode_note([note]))
+
+    def test_deterministic(self):
+        compressed = note_format.NOTE_FORMAT_COMPRESSED
+        self.assertEqual(note_format.encode_problems(self.problems,
+                                                     compressed),
+                         note_format.encode_problems(
+                             list(reversed(sorted(self.problems, key=str))),
+                             compressed))
+
+    def test_json_round_trip(self):
+        note = note_format.encode_problems(self.problems,
+                                           note_format.NOTE_FORMAT_JSON)
+        self.assertEqual(self.problems,
+                         {Problem.from_json(p) for p in json.loads(note)})
+        self.assertEqual(self.problems, note_format.decode_note([note]))
+
+    def test_mixed_note(self):
+        legacy = json.dumps([Problem('old_file.py', 3, 'old').to_json()])
+        note = b'\n\n'.join([
+            legacy.encode(),
+            note_format.encode_problems(self.problems,
+                                        note_format.NOTE_FORMAT_COMPRESSED),
+            note_format.COMPRESSED_NOTE_PREFIX + b'not base64!',
+            b'garbage',
+        ])
+        self.assertEqual(self.problems | {Problem('old_file.py', 3, 'old')},
+                         note_format.decode_note(note.splitlines()))
+
+    def test_empty(self):
+        note = note_format.encode_problems(set())
+        self.assertEqual(set(), note_format.decode_note([note]))
+
+    def test_test_problems_use_json(self):
+        problems = {TestProblem('group', 'test_it', 'failed', 'stack')}
+        note = note_format.encode_problems(problems,
+                                           note_format.NOTE_FORMAT_COMPRESSED)
+        self.assertEqual([problem.to_json() for problem in problems],
+                         json.loads(note))
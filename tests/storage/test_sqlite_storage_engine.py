@@ -0,0 +1,120 @@
+import asyncio
+import os
+import subprocess
+import tempfile
+import unittest
+
+from linty_fresh.problem import Problem
+from linty_fresh.storage import sqlite_storage_engine
+from linty_fresh.storage.sqlite_storage_engine import SQLiteStorageEngine
+
+
+class SQLiteStorageEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        self.git('init', '-q')
+        self.git('config', 'user.name', 'Linty Fresh')
+        self.git('config', 'user.email', 'linty@example.com')
+        self.engine = SQLiteStorageEngine()
+
+    def tearDown(self):
+        os.chdir(self.original_cwd)
+        self.temp_dir.cleanup()
+
+    def git(self, *args):
+        return subprocess.run(('git',) + args, check=True,
+                              stdout=subprocess.PIPE).stdout.decode().strip()
+
+    def commit(self):
+        self.git('commit', '-q', '--allow-empty', '-m', 'commit')
+        return self.git('rev-parse', 'HEAD')
+
+    def run_async(self, awaitable):
+        return asyncio.get_event_loop().run_until_complete(awaitable)
+
+    def test_no_problems(self):
+        self.commit()
+        self.commit()
+        self.assertEqual(set(), self.run_async(
+            self.engine.get_existing_problems('pylint')))
+
+    def test_problems_by_linter(self):
+        pylint_problems = {Problem('a.py', 1, 'bad'), Problem('b.py', 2, 'bad')}
+        mypy_problems = {Problem('a.py', 3, 'wrong')}
+        self.commit()
+        self.run_async(self.engine.store_linter_problems({
+            'pylint': pylint_problems, 'mypy': mypy_problems}))
+        self.commit()
+        self.run_async(self.engine.store_problems(set(), 'pylint'))
+        self.commit()
+
+        self.assertTrue(os.path.exists(os.path.join(
+            '.git', sqlite_storage_engine.DEFAULT_DATABASE_NAME)))
+        # The empty pylint run is the nearest one with data for pylint.
+        self.assertEqual(set(), self.run_async(
+            self.engine.get_existing_problems('pylint')))
+        self.assertEqual(mypy_problems, self.run_async(
+            self.engine.get_existing_problems('mypy')))
+        self.assertEqual(set(), self.run_async(
+            self.engine.get_existing_problems('swiftlint')))
+
+    def test_store_again_replaces(self):
+        self.commit()
+        self.run_async(self.engine.store_problems(
+            {Problem('a.py', 1, 'bad')}, 'pylint'))
+        self.run_async(self.engine.store_problems(
+            {Problem('a.py', 2, 'bad')}, 'pylint'))
+        self.commit()
+        self.assertEqual({Problem('a.py', 2, 'bad')}, self.run_async(
+            self.engine.get_existing_problems('pylint')))
+
+    def test_existing_sources(self):
+        with open('a.py', 'w') as source_file:
+            source_file.write('x = 1\n')
+        self.git('add', 'a.py')
+        self.commit()
+        self.run_async(self.engine.store_problems(
+            {Problem('a.py', 1, 'bad')}, 'pylint'))
+        self.commit()
+
+        self.run_async(self.engine.get_existing_problems('pylint'))
+        self.assertEqual({'a.py': b'x = 1\n', 'b.py': None}, self.run_async(
+            self.engine.get_existing_sources(['a.py', 'b.py'], 'pylint')))
+
+    def test_existing_sources_by_linter(self):
+        with open('a.py', 'w') as source_file:
+            source_file.write('x = 1\n')
+        self.git('add', 'a.py')
+        self.commit()
+        self.run_async(self.engine.store_problems(
+            {Problem('a.py', 1, 'bad')}, 'pylint'))
+        with open('a.py', 'w') as source_file:
+            source_file.write('x = 2\n')
+        self.git('add', 'a.py')
+        self.commit()
+        self.run_async(self.engine.store_problems(
+            {Problem('a.py', 1, 'wrong')}, 'mypy'))
+        self.commit()
+
+        # The linters of a run are read at the same time.
+        self.run_async(asyncio.gather(
+            self.engine.get_existing_problems('pylint'),
+            self.engine.get_existing_problems('mypy')))
+        self.assertEqual({'a.py': b'x = 1\n'}, self.run_async(
+            self.engine.get_existing_sources(['a.py'], 'pylint')))
+        self.assertEqual({'a.py': b'x = 2\n'}, self.run_async(
+            self.engine.get_existing_sources(['a.py'], 'mypy')))
+        self.assertEqual({'a.py': None}, self.run_async(
+            self.engine.get_existing_sources(['a.py'], 'swiftlint')))
+
+    def test_sqlite_path(self):
+        path = os.path.join(self.temp_dir.name, 'problems.db')
+        engine = SQLiteStorageEngine(path)
+        self.commit()
+        self.run_async(engine.store_problems({Problem('a.py', 1, 'bad')}))
+        self.commit()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual({Problem('a.py', 1, 'bad')}, self.run_async(
+            engine.get_existing_problems()))
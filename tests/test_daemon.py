@@ -0,0 +1,144 @@
+import asyncio
+import os
+import socket
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from linty_fresh import client, main
+from linty_fresh.daemon import Daemon
+from linty_fresh.problem import Problem
+from linty_fresh.reporters.github_reporter import HadLintErrorsException
+
+
+class RecordingReporter:
+    reports = []
+
+    @staticmethod
+    def register_arguments(parser):
+        pass
+
+    @staticmethod
+    def create_reporter(args):
+        return RecordingReporter()
+
+    async def report(self, linter_name, problems):
+        problems = await problems
+        self.reports.append((linter_name, problems, os.getcwd(),
+                             os.environ.get('LINTY_FRESH_TEST')))
+        if problems:
+            raise HadLintErrorsException()
+
+
+class DaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.temp_dir.name, 'daemon.sock')
+        with open(os.path.join(self.temp_dir.name, 'pylint.txt'), 'w') as f:
+            f.write('src/file.py:1: [E302] bad\n')
+        open(os.path.join(self.temp_dir.name, 'empty.txt'), 'w').close()
+        RecordingReporter.reports.clear()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_jobs(self, *argvs):
+        """Serve ``argvs`` from a daemon, sent by the client from the
+        temporary directory, and return the responses."""
+        loop = asyncio.get_event_loop()
+        daemon = Daemon()
+
+        def send_jobs():
+            original_cwd = os.getcwd()
+            os.chdir(self.temp_dir.name)
+            try:
+                with patch.dict(os.environ, {'LINTY_FRESH_TEST': 'job'}):
+                    return [client.run_job(argv, self.socket_path)
+                            for argv in argvs]
+            finally:
+                os.chdir(original_cwd)
+
+        async def serve_jobs():
+            server = asyncio.ensure_future(daemon.serve(self.socket_path))
+            while not os.path.exists(self.socket_path):
+                await asyncio.sleep(0.01)
+            try:
+                return await loop.run_in_executor(None, send_jobs)
+            finally:
+                server.cancel()
+
+        with patch.dict(main.REPORTERS, {'recording': RecordingReporter}):
+            return loop.run_until_complete(serve_jobs())
+
+    def test_jobs(self):
+        responses = self.run_jobs(
+            ['pylint.txt', '--linter', 'pylint', '--reporter', 'recording'],
+            ['empty.txt', '--linter', 'pylint', '--reporter', 'recording'])
+
+        self.assertEqual([1, 0], [response['exit_code']
+                                  for response in responses])
+        self.assertEqual([
+            ('pylint', {Problem('src/file.py', 1, '[E302] bad')},
+             os.path.realpath(self.temp_dir.name), 'job'),
+            ('pylint', set(), os.path.realpath(self.temp_dir.name), 'job'),
+        ], [(linter_name, problems, os.path.realpath(cwd), env)
+            for linter_name, problems, cwd, env
+            in RecordingReporter.reports])
+        self.assertNotEqual(self.temp_dir.name, os.getcwd())
+        self.assertNotIn('LINTY_FRESH_TEST', os.environ)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_errors(self):
+        responses = self.run_jobs(
+            ['--linter', 'pylint', '--no_such_flag'],
+            ['missing.txt', '--linter', 'pylint', '--reporter', 'recording'])
+
+        self.assertEqual(2, responses[0]['exit_code'])
+        self.assertIn('usage:', responses[0]['stderr'])
+        self.assertEqual(1, responses[1]['exit_code'])
+        self.assertIn('missing.txt', responses[1]['stderr'])
+
+    def test_no_daemon(self):
+        with self.assertRaises(FileNotFoundError):
+            client.run_job(['--help'], self.socket_path)
+
+    def listen(self, mode):
+        """Listen on the socket path without accepting jobs."""
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(self.socket_path)
+        os.chmod(self.socket_path, mode)
+        server.listen(1)
+
+    def test_socket_of_other_users(self):
+        self.listen(0o666)
+        with self.assertRaises(PermissionError):
+            client.run_job(['--help'], self.socket_path)
+
+        os.chmod(self.temp_dir.name, 0o777)
+        os.chmod(self.socket_path, 0o600)
+        with self.assertRaises(PermissionError):
+            client.run_job(['--help'], self.socket_path)
+
+    def test_not_a_socket(self):
+        open(self.socket_path, 'w').close()
+        os.chmod(self.socket_path, 0o600)
+        with self.assertRaises(PermissionError):
+            client.run_job(['--help'], self.socket_path)
+
+    def test_timeout(self):
+        self.listen(0o600)
+        with self.assertRaises(socket.timeout):
+            client.run_job(['--help'], self.socket_path, timeout=0.1)
+
+    def test_abandoned_jobs_are_skipped(self):
+        loop = asyncio.get_event_loop()
+        self.assertIsNone(loop.run_until_complete(Daemon().run_job(
+            ['--help'], self.temp_dir.name, {}, lambda: True)))
+
+    def test_default_socket_path(self):
+        with patch.dict(os.environ, {'XDG_RUNTIME_DIR': self.temp_dir.name}):
+            os.environ.pop(client.SOCKET_ENVIRONMENT_VARIABLE, None)
+            self.assertEqual(
+                os.path.join(self.temp_dir.name, 'linty_fresh.sock'),
+                client.get_socket_path())
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+from linty_fresh import fingerprint
+from linty_fresh.problem import Problem, TestProblem
+
+OLD_SOURCE = b'''import os
+
+
+def main():
+    x = 1
+    return os.path.join('a',   'b')
+'''
+
+NEW_SOURCE = b'''import os
+import sys
+
+
+def main():
+    x = 1
+    return os.path.join('a', 'b')
+
+
+def other():
+    x = 1
+    return sys.argv
+'''
+
+
+class FingerprintTest(unittest.TestCase):
+    def new_problems(self, problems, existing, context=1):
+        return fingerprint.new_problems(
+            set(problems), set(existing), {'main.py': OLD_SOURCE},
+            {'main.py': NEW_SOURCE}, context)
+
+    def test_shifted_problem_matches(self):
+        self.assertEqual(set(), self.new_problems(
+            [Problem('main.py', 6, 'unused x')],
+            [Problem('main.py', 5, 'unused x')]))
+
+    def test_other_context_does_not_match(self):
+        self.assertEqual({Problem('main.py', 11, 'unused x')},
+                         self.new_problems(
+                             [Problem('main.py', 6, 'unused x'),
+                              Problem('main.py', 11, 'unused x')],
+                             [Problem('main.py', 5, 'unused x')]))
+
+    def test_each_existing_problem_matches_once(self):
+        self.assertEqual(1, len(self.new_problems(
+            [Problem('main.py', 6, 'unused x'),
+             Problem('main.py', 11, 'unused x')],
+            [Problem('main.py', 5, 'unused x')], context=0)))
+
+    def test_message_must_match(self):
+        self.assertEqual({Problem('main.py', 6, 'x is unused')},
+                         self.new_problems(
+                             [Problem('main.py', 6, 'x is unused')],
+                             [Problem('main.py', 5, 'unused x')]))
+
+    def test_missing_source_matches_lines(self):
+        problems = {Problem('gone.py', 1, 'bad'), Problem('gone.py', 2, 'bad')}
+        self.assertEqual({Problem('gone.py', 2, 'bad')},
+                         fingerprint.new_problems(
+                             problems, {Problem('gone.py', 1, 'bad')},
+                             {'gone.py': None}, {}))
+
+    def test_other_problems_match_exactly(self):
+        test_problem = TestProblem('group', 'test', 'failed', '')
+        self.assertEqual({Problem('other.py', 1, 'bad')},
+                         self.new_problems(
+                             [test_problem, Problem('other.py', 1, 'bad')],
+                             [test_problem]))
+
+    def test_read_working_tree_files(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'main.py')
+            with open(path, 'wb') as source_file:
+                source_file.write(NEW_SOURCE)
+            self.assertEqual({path: NEW_SOURCE, 'missing.py': None},
+                             fingerprint.read_working_tree_files(
+                                 [path, 'missing.py']))
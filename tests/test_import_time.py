@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import unittest
+from typing import Dict, Set, Tuple  # noqa
+
+import linty_fresh
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(linty_fresh.__file__)))
+
+
+def run_imports(statement: str) -> Tuple[Dict[str, int], Set[str]]:
+    """Run ``statement`` in a new interpreter.
+
+    Returns the cumulative import time of the modules imported by import
+    statements in microseconds, as reported by ``-X importtime``, and the
+    names of every module loaded.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         statement + '\nimport sys\nprint("\\n".join(sys.modules))'],
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=ROOT)
+    times = {}  # type: Dict[str, int]
+    for line in result.stderr.decode().splitlines():
+        fields = line.split('|')
+        if line.startswith('import time:') and fields[1].strip().isdigit():
+            times[fields[2].strip()] = int(fields[1])
+    return times, set(result.stdout.decode().split())
+
+
+class ImportTimeTest(unittest.TestCase):
+    def assertNotLoaded(self, prefix: str, modules: Set[str],
+                        times: Dict[str, int]):
+        loaded = sorted(name for name in modules
+                        if name.startswith(prefix))
+        self.assertEqual([], loaded, 'Importing linty_fresh.main took '
+                                     '{}us'.format(times['linty_fresh.main']))
+
+    def test_parser(self):
+        times, modules = run_imports(
+            'from linty_fresh import main\nmain.create_parser()')
+        self.assertNotLoaded('aiohttp.', modules, times)
+        self.assertNotLoaded('linty_fresh.linters', modules, times)
+        self.assertNotLoaded('xml.etree', modules, times)
+
+    def test_selected_linter(self):
+        times, modules = run_imports(
+            'from linty_fresh import main\nmain.LINTERS["pylint"]')
+        self.assertEqual(['linty_fresh.linters', 'linty_fresh.linters.pylint'],
+                         sorted(name for name in modules
+                                if name.startswith('linty_fresh.linters')))
+        self.assertNotLoaded('aiohttp.', modules, times)
+        self.assertNotLoaded('linty_fresh.reporters.github_reporter', modules,
+                             times)
+
+    def test_selected_reporter(self):
+        times, modules = run_imports(
+            'from linty_fresh import main\n'
+            'import types\n'
+            'main.REPORTERS["stdout"] = types.SimpleNamespace(\n'
+            '    register_arguments=lambda parser: None)\n'
+            'main.create_parser(["lint.txt", "--reporter", "stdout"])')
+        self.assertNotLoaded('linty_fresh.reporters.github_reporter', modules,
+                             times)
+
+    def test_client(self):
+        times, modules = run_imports('import linty_fresh.client')
+        self.assertIn('linty_fresh.client', times)
+        self.assertNotIn('asyncio', modules)
+        self.assertNotIn('linty_fresh.main', modules)
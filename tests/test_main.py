@@ -0,0 +1,140 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from linty_fresh import main
+from linty_fresh.problem import Problem
+
+
+class LintFilesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.lint_file_paths = []
+        for i in range(4):
+            path = os.path.join(self.temp_dir.name, f'pylint_{i}.txt')
+            with open(path, 'w') as lint_file:
+                lint_file.write(f'src/file_{i}.py:{i + 1}: [E302] bad\n')
+                lint_file.write('src/shared.py:1: [E303] shared\n')
+            self.lint_file_paths.append(path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
+class ParseLintFilesTest(LintFilesTestCase):
+
+    def test_parse_lint_files_with_jobs(self):
+        loop = asyncio.get_event_loop()
+        serial = loop.run_until_complete(main.parse_lint_files(
+            'pylint', self.lint_file_paths, 1, {}))
+        parallel = loop.run_until_complete(main.parse_lint_files(
+            'pylint', self.lint_file_paths, 2, {}))
+
+        self.assertEqual(5, len(parallel))
+        self.assertEqual(serial, parallel)
+        self.assertIn(Problem('src/file_3.py', 4, '[E302] bad'), parallel)
+        self.assertIn(Problem('src/shared.py', 1, '[E303] shared'), parallel)
+
+
+class FakeStorageEngine:
+    events = []
+
+    @staticmethod
+    def create_storage_engine(args):
+        return FakeStorageEngine()
+
+    async def get_existing_problems(self, linter=None):
+        self.events.append(('fetch started', linter))
+        await asyncio.sleep(0.05)
+        self.events.append('fetch done')
+        return {Problem('src/shared.py', 1, '[E303] shared')}
+
+    async def store_linter_problems(self, problems_by_linter):
+        self.events.append(('store', {
+            linter: len(problems)
+            for linter, problems in problems_by_linter.items()}))
+
+    async def get_existing_sources(self, paths, linter=None):
+        self.events.append(('sources', set(paths)))
+        return {path: b'' for path in paths}
+
+
+class FakeReporter:
+    events = FakeStorageEngine.events
+
+    @staticmethod
+    def create_reporter(args):
+        return FakeReporter()
+
+    async def report(self, linter_name, problems):
+        self.events.append('report started')
+        self.events.append(('report', linter_name, await problems))
+
+
+class RunLoopTest(LintFilesTestCase):
+    def test_run_loop(self):
+        FakeStorageEngine.events.clear()
+        args = main.create_parser().parse_args([
+            '--linter', 'pylint', '--reporter', 'fake', '--store_problems',
+            *self.lint_file_paths])
+
+        with patch.dict(main.REPORTERS, {'fake': FakeReporter}), \
+                patch.dict(main.STORAGE_ENGINES, {'git': FakeStorageEngine}):
+            asyncio.get_event_loop().run_until_complete(main.run_loop(args))
+
+        events = FakeStorageEngine.events
+        self.assertLess(events.index('report started'),
+                        events.index('fetch done'))
+        self.assertIn(('fetch started', 'pylint'), events)
+        self.assertLess(events.index('fetch done'),
+                        events.index(('store', {'pylint': 5})))
+        self.assertIn(('report', 'pylint',
+                       {Problem(f'src/file_{i}.py', i + 1, '[E302] bad')
+                        for i in range(4)}), events)
+
+    def test_run_loop_match_fingerprints(self):
+        FakeStorageEngine.events.clear()
+        args = main.create_parser().parse_args([
+            '--linter', 'pylint', '--reporter', 'fake', '--store_problems',
+            '--match_fingerprints', *self.lint_file_paths])
+
+        with patch.dict(main.REPORTERS, {'fake': FakeReporter}), \
+                patch.dict(main.STORAGE_ENGINES, {'git': FakeStorageEngine}):
+            asyncio.get_event_loop().run_until_complete(main.run_loop(args))
+
+        events = FakeStorageEngine.events
+        self.assertIn(('sources', {'src/shared.py'}), events)
+        self.assertIn(('report', 'pylint',
+                       {Problem(f'src/file_{i}.py', i + 1, '[E302] bad')
+                        for i in range(4)}), events)
+
+    def test_run_loop_several_linters(self):
+        FakeStorageEngine.events.clear()
+        with open(os.path.join(self.temp_dir.name, 'mypy.txt'), 'w') as f:
+            f.write('src/file_0.py:3: error: wrong\n')
+        args = main.create_parser().parse_args([
+            '--reporter', 'fake', '--store_problems', '--jobs', '2',
+            '--lint', 'pylint:' + os.path.join(self.temp_dir.name,
+                                               'pylint_*.txt'),
+            '--lint', 'mypy:' + os.path.join(self.temp_dir.name, 'mypy.txt')])
+
+        with patch.dict(main.REPORTERS, {'fake': FakeReporter}), \
+                patch.dict(main.STORAGE_ENGINES, {'git': FakeStorageEngine}):
+            asyncio.get_event_loop().run_until_complete(main.run_loop(args))
+
+        events = FakeStorageEngine.events
+        self.assertIn(('fetch started', 'pylint'), events)
+        self.assertIn(('fetch started', 'mypy'), events)
+        self.assertIn(('store', {'pylint': 5, 'mypy': 1}), events)
+        self.assertIn(('report', 'mypy',
+                       {Problem('src/file_0.py', 3, 'error: wrong')}), events)
+        self.assertIn(('report', 'pylint',
+                       {Problem(f'src/file_{i}.py', i + 1, '[E302] bad')
+                        for i in range(4)}), events)
+
+    def test_lint_requires_a_linter_and_glob(self):
+        args = main.create_parser().parse_args(['--lint', 'pylint'])
+        with self.assertRaises(Exception):
+            main.get_lint_files(args)
@@ -0,0 +1,143 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from linty_fresh import main, plugins
+from linty_fresh.lazy import LazyRegistry
+from linty_fresh.plugins import LINTER_ENTRY_POINTS, REPORTER_ENTRY_POINTS
+
+
+class PluginsTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.site_dir = os.path.join(self.temp_dir.name, 'site-packages')
+        os.makedirs(self.site_dir)
+        self.install('fake_eslint', 'eslint')
+        patches = [
+            mock.patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(
+                self.temp_dir.name, 'cache')}),
+            mock.patch.object(sys, 'path', [self.site_dir] + sys.path),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def tearDown(self):
+        for name in list(sys.modules):
+            if name.startswith('fake_'):
+                del sys.modules[name]
+
+    def install(self, module: str, name: str,
+                group: str = LINTER_ENTRY_POINTS,
+                source: str = 'def parse_stream(stream):\n    return []\n'):
+        dist_info = os.path.join(self.site_dir,
+                                 '{}-1.0.dist-info'.format(module))
+        os.makedirs(dist_info)
+        with open(os.path.join(dist_info, 'METADATA'), 'w') as f:
+            f.write('Metadata-Version: 2.1\nName: {}\nVersion: 1.0\n'.format(
+                module))
+        with open(os.path.join(dist_info, 'entry_points.txt'), 'w') as f:
+            f.write('[{}]\n{} = {}\n'.format(group, name, module))
+        with open(os.path.join(self.site_dir, module + '.py'), 'w') as f:
+            f.write(source)
+
+    def read_entry_points(self):
+        return mock.patch.object(plugins, '_read_entry_points',
+                                 wraps=plugins._read_entry_points)
+
+    def test_entry_points(self):
+        self.assertEqual({'eslint': 'fake_eslint'},
+                         plugins.get_entry_points(LINTER_ENTRY_POINTS))
+        self.assertEqual({}, plugins.get_entry_points(REPORTER_ENTRY_POINTS))
+        self.assertTrue(os.path.exists(plugins.get_index_path()))
+
+    def test_index_is_reused(self):
+        plugins.get_entry_points(LINTER_ENTRY_POINTS)
+        with self.read_entry_points() as read_entry_points:
+            self.assertEqual({'eslint': 'fake_eslint'},
+                             plugins.get_entry_points(LINTER_ENTRY_POINTS))
+        read_entry_points.assert_not_called()
+
+    def test_index_per_environment(self):
+        plugins.get_entry_points(LINTER_ENTRY_POINTS)
+        index_path = plugins.get_index_path()
+        with mock.patch.object(sys, 'prefix',
+                               os.path.join(self.temp_dir.name, 'venv')):
+            self.assertNotEqual(index_path, plugins.get_index_path())
+            self.assertEqual({'eslint': 'fake_eslint'},
+                             plugins.get_entry_points(LINTER_ENTRY_POINTS))
+        self.assertEqual(2, len(os.listdir(os.path.dirname(index_path))))
+        with self.read_entry_points() as read_entry_points:
+            plugins.get_entry_points(LINTER_ENTRY_POINTS)
+        read_entry_points.assert_not_called()
+
+    def test_index_is_rebuilt_after_install(self):
+        plugins.get_entry_points(LINTER_ENTRY_POINTS)
+        self.install('fake_swiftformat', 'swiftformat')
+        # Installs in quick succession may share a modification time.
+        stat = os.stat(self.site_dir)
+        os.utime(self.site_dir, ns=(stat.st_atime_ns,
+                                    stat.st_mtime_ns + 10 ** 9))
+        with self.read_entry_points() as read_entry_points:
+            self.assertEqual({'eslint': 'fake_eslint',
+                              'swiftformat': 'fake_swiftformat'},
+                             plugins.get_entry_points(LINTER_ENTRY_POINTS))
+        read_entry_points.assert_called_once_with()
+
+    def test_index_is_kept_when_other_paths_change(self):
+        checkout = os.path.join(self.temp_dir.name, 'checkout')
+        os.makedirs(checkout)
+        sys.path.insert(0, checkout)
+        plugins.get_entry_points(LINTER_ENTRY_POINTS)
+        stat = os.stat(checkout)
+        open(os.path.join(checkout, 'pylint.txt'), 'w').close()
+        os.utime(checkout, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        with self.read_entry_points() as read_entry_points:
+            plugins.get_entry_points(LINTER_ENTRY_POINTS)
+        read_entry_points.assert_not_called()
+
+    def test_patching_registry_keeps_plugins_unread(self):
+        registry = LazyRegistry({'pylint': 'linty_fresh.linters.pylint'},
+                                LINTER_ENTRY_POINTS)
+        with mock.patch.object(plugins, '_get_index') as get_index:
+            with mock.patch.dict(registry, {'fake': 'fake_module'}):
+                self.assertEqual('fake_module', registry._modules['fake'])
+        get_index.assert_not_called()
+        self.assertEqual({'pylint': 'linty_fresh.linters.pylint'},
+                         registry._modules)
+
+    def test_registry(self):
+        registry = LazyRegistry({'pylint': 'linty_fresh.linters.pylint'},
+                                LINTER_ENTRY_POINTS)
+        with mock.patch.object(plugins, '_get_index') as get_index:
+            registry['pylint']
+            self.assertIn('pylint', registry.builtin_names)
+        get_index.assert_not_called()
+
+        self.assertEqual(['pylint', 'eslint'], list(registry))
+        self.assertNotIn('fake_eslint', sys.modules)
+        self.assertEqual([], registry['eslint'].parse_stream(None))
+        self.assertIn('fake_eslint', sys.modules)
+
+    def test_builtin_names_win(self):
+        registry = LazyRegistry({'eslint': 'linty_fresh.linters.pylint'},
+                                LINTER_ENTRY_POINTS)
+        self.assertEqual(['eslint'], list(registry))
+        self.assertEqual('linty_fresh.linters.pylint',
+                         registry['eslint'].__name__)
+
+    def test_reporter_arguments(self):
+        self.install('fake_slack', 'slack', REPORTER_ENTRY_POINTS,
+                     'def register_arguments(parser):\n'
+                     '    parser.add_argument("--slack_channel")\n')
+        registry = LazyRegistry({}, REPORTER_ENTRY_POINTS)
+        with mock.patch.object(main, 'REPORTERS', registry):
+            main.create_parser(['lint.txt'])
+            self.assertNotIn('fake_slack', sys.modules)
+            argv = ['--reporter', 'slack', 'lint.txt']
+            args = main.create_parser(argv).parse_args(
+                argv + ['--slack_channel', 'lint'])
+            self.assertEqual('lint', args.slack_channel)
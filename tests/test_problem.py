@@ -0,0 +1,34 @@
+import pickle
+import unittest
+
+from linty_fresh.problem import Problem, TestProblem
+
+
+class ProblemTest(unittest.TestCase):
+    def test_equality_and_hash(self):
+        problem = Problem('some_file.py', '42', 'bad')
+        self.assertEqual(Problem('some_file.py', 42, 'bad'), problem)
+        self.assertEqual(hash(Problem('some_file.py', 42, 'bad')),
+                         hash(problem))
+        self.assertNotEqual(Problem('some_file.py', 43, 'bad'), problem)
+        self.assertNotEqual('some_file.py', problem)
+
+    def test_immutable(self):
+        problem = Problem('some_file.py', 42, 'bad')
+        with self.assertRaises(AttributeError):
+            problem.line = 43
+        with self.assertRaises(AttributeError):
+            problem.extra = 'value'
+
+    def test_path_is_interned(self):
+        first = Problem(''.join(['some_', 'file.py']), 1, 'bad')
+        second = Problem(''.join(['some_file', '.py']), 2, 'bad')
+        self.assertIs(first.path, second.path)
+
+    def test_pickle(self):
+        problem = Problem('some_file.py', 42, 'bad')
+        self.assertEqual(problem, pickle.loads(pickle.dumps(problem)))
+
+        test_problem = TestProblem('group', 'name', 'message', 'trace')
+        self.assertEqual(test_problem,
+                         pickle.loads(pickle.dumps(test_problem)))
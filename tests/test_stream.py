@@ -0,0 +1,76 @@
+import io
+import re
+import unittest
+from unittest import mock
+
+from linty_fresh import stream
+from linty_fresh.stream import scan_lines
+
+LINE_REGEX = re.compile(r'(?P<path>[^:]+):(?P<line>\d+): (?P<message>.*)')
+CANDIDATE_REGEX = re.compile(r':\d+:')
+
+REPORT = ('noise: without a line number\n'
+          'a.py:1: first\r\n'
+          'noise\n'
+          'b.py:22: second\n'
+          ':3: candidate that does not match\n'
+          'c.py:333: last')
+
+
+class ScanLinesTest(unittest.TestCase):
+    def scan(self, source):
+        return [match.groups() for match in
+                scan_lines(source, LINE_REGEX, CANDIDATE_REGEX)]
+
+    def assertScanned(self, source):
+        self.assertEqual([('a.py', '1', 'first'),
+                          ('b.py', '22', 'second'),
+                          ('c.py', '333', 'last')],
+                         self.scan(source))
+
+    def test_sources(self):
+        self.assertScanned(REPORT)
+        self.assertScanned(REPORT.splitlines(True))
+        self.assertScanned(io.StringIO(REPORT))
+        self.assertScanned(io.BytesIO(REPORT.encode()))
+
+    def test_chunk_boundaries(self):
+        for chunk_size in range(1, len(REPORT) + 1):
+            with mock.patch.object(stream, 'SCAN_CHUNK_SIZE', chunk_size):
+                self.assertScanned(io.BytesIO(REPORT.encode()))
+                self.assertScanned(io.StringIO(REPORT))
+
+    def test_noise_is_not_decoded(self):
+        report = b'\xff\xfe binary noise\nd.py:4: \xc3\xa9\n'
+        self.assertEqual([('d.py', '4', '\xe9')],
+                         self.scan(io.BytesIO(report)))
+
+    def test_undecodable_lines_are_replaced(self):
+        report = b'd.py:4: \xff\ne.py:5: fine\n'
+        self.assertEqual([('d.py', '4', '\ufffd'), ('e.py', '5', 'fine')],
+                         self.scan(io.BytesIO(report)))
+        self.assertEqual([('d.py', '4', '\ufffd'), ('e.py', '5', 'fine')],
+                         self.scan(report.splitlines(True)))
+
+    def test_separators(self):
+        report = REPORT.replace('\n', '\r')
+        self.assertScanned(report)
+        self.assertScanned(io.BytesIO(report.encode()))
+        self.assertScanned(io.StringIO(report, newline=''))
+        self.assertScanned(io.BytesIO(REPORT.replace('\n', '\x0c').encode()))
+        self.assertScanned([report.encode()])
+
+    def test_carriage_returns_bound_chunks(self):
+        report = (REPORT + '\n').replace('\n', '\r') * 1000
+        with mock.patch.object(stream, 'SCAN_CHUNK_SIZE', 64), \
+                mock.patch.object(stream, '_scan_buffer',
+                                  wraps=stream._scan_buffer) as scan_buffer:
+            self.assertEqual(3000, len(self.scan(io.BytesIO(report.encode()))))
+        longest_line = max(len(line) for line in REPORT.splitlines())
+        self.assertLessEqual(
+            max(len(c[0][0]) for c in scan_buffer.call_args_list),
+            64 + longest_line)
+
+    def test_empty(self):
+        self.assertEqual([], self.scan(io.BytesIO(b'')))
+        self.assertEqual([], self.scan(''))
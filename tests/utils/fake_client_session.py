@@ -6,8 +6,9 @@ from aiohttp.client import _RequestContextManager
 
 
 class FakeClientResponse:
-    def __init__(self, content, headers=None):
+    def __init__(self, content, headers=None, status=200):
         self.headers = headers or {}
+        self.status = status
         self.content = FakeStreamReader(content)
 
     async def text(self):
@@ -61,7 +62,12 @@ class FakeClientSession:
             raise Exception('Invalid test request: ({}, {})'.format(
                 url, method
             ))
-        return self.url_map.get((url, method))
+        value = self.url_map.get((url, method))
+        if isinstance(value, list):
+            # A list of responses is replayed in order, repeating the last
+            # one, e.g. to throttle the first few requests to a URL.
+            return value.pop(0) if len(value) > 1 else value[0]
+        return value
 
     def get(self, url, *args, **kwargs):
         updated_kwargs = self._update_headers(kwargs)